@@ -0,0 +1,163 @@
+import time
+
+import redis
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.common.redis_client import get_redis
+
+USER_VERSION_KEY = "version:user:{user_id}"
+CATALOG_VERSION_KEY = "version:catalog"
+
+
+def get_version(key, timeout=None):
+    """
+    Return the current value of a version counter, creating it if needed.
+
+    New counters are seeded from the clock, so a counter lost on a cache
+    flush (or expired after `timeout`) never goes back to a value that was
+    handed out before.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key, timeout=None):
+    """
+    Increment a version counter and return the new value.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter has expired or was never created
+        version = time.time_ns()
+        cache.set(key, version, timeout=timeout)
+        return version
+
+
+def get_user_version(user_id):
+    """
+    Version of everything a user has written (participations, completions,
+    profile). Used to validate per-user cached responses.
+    """
+    return get_version(USER_VERSION_KEY.format(user_id=user_id))
+
+
+def bump_user_version(user_id):
+    """
+    Bump the user's write version once the current transaction commits, so a
+    concurrent read can't cache the old data under the new version.
+    """
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    transaction.on_commit(lambda: bump_version(key))
+
+
+def get_catalog_version():
+    """
+    Version of the global catalog (challenges, super challenges, onboarding
+    questions and FAQ). Bumped whenever an admin edits any of them.
+    """
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    transaction.on_commit(lambda: bump_version(CATALOG_VERSION_KEY))
+
+
+# Single-flight caching: on a miss one request recomputes the value while the
+# others serve the stale copy or, on a cold miss, wait for the recomputation
+SINGLE_FLIGHT_LOCK_KEY = "{key}:lock"
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT_TIMEOUT = 2
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+CACHE_STATS_KEY = "stats:cache:{name}"
+# Outcomes counted per cache name
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_STALE = "stale"
+CACHE_COALESCED = "coalesced"
+CACHE_WAIT_TIMEOUT = "wait_timeout"
+
+
+def record_cache_event(name, event):
+    """
+    Count a cache outcome (CACHE_HIT, CACHE_MISS, ...) under `name`. The
+    counters are best effort, a Redis error never fails the request.
+    """
+    try:
+        get_redis().hincrby(CACHE_STATS_KEY.format(name=name), event)
+    except redis.RedisError:
+        pass
+
+
+def get_cache_stats(name):
+    """
+    {event: count} recorded for `name`
+    """
+    stats = get_redis().hgetall(CACHE_STATS_KEY.format(name=name))
+    return {event: int(count) for event, count in stats.items()}
+
+
+def wait_for(check, timeout=SINGLE_FLIGHT_WAIT_TIMEOUT):
+    """
+    Poll `check()` until it returns something other than None, at most
+    `timeout` seconds. Returns the last result.
+    """
+    deadline = time.monotonic() + timeout
+    result = check()
+    while result is None and time.monotonic() < deadline:
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        result = check()
+    return result
+
+
+def get_or_compute(key, compute, timeout, stale_timeout, name):
+    """
+    Return the cached value of `key`, computing it with `compute()` when it
+    is missing or older than `timeout` seconds.
+
+    Only the request that takes the lock recomputes. The others get the
+    stale value, which is kept `stale_timeout` seconds past its expiry, or
+    wait for the new one when there is none. A request that waits too long
+    computes the value itself.
+    """
+    entry = cache.get(key)
+    if entry is not None and entry["expires_at"] > time.time():
+        record_cache_event(name, CACHE_HIT)
+        return entry["value"]
+
+    lock_key = SINGLE_FLIGHT_LOCK_KEY.format(key=key)
+    if cache.add(lock_key, 1, SINGLE_FLIGHT_LOCK_TIMEOUT):
+        record_cache_event(name, CACHE_MISS)
+        try:
+            value = compute()
+            cache.set(
+                key,
+                {"expires_at": time.time() + timeout, "value": value},
+                timeout + stale_timeout,
+            )
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    if entry is not None:
+        record_cache_event(name, CACHE_STALE)
+        return entry["value"]
+
+    def fresh_entry():
+        entry = cache.get(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            return entry
+        return None
+
+    entry = wait_for(fresh_entry)
+    if entry is not None:
+        record_cache_event(name, CACHE_COALESCED)
+        return entry["value"]
+
+    record_cache_event(name, CACHE_WAIT_TIMEOUT)
+    return compute()
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from apps.common.cache import (
+    CACHE_COALESCED,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_STALE,
+    CACHE_STATS_KEY,
+    CACHE_WAIT_TIMEOUT,
+    get_cache_stats,
+)
+from apps.common.redis_client import get_redis
+
+EVENTS = (CACHE_HIT, CACHE_MISS, CACHE_STALE, CACHE_COALESCED, CACHE_WAIT_TIMEOUT)
+
+
+class Command(BaseCommand):
+    help = "Show the hit, miss and coalesced wait counters of the single-flight caches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Clear the counters afterwards"
+        )
+
+    def handle(self, *args, **options):
+        client = get_redis()
+        prefix = CACHE_STATS_KEY.format(name="")
+        keys = sorted(client.scan_iter(match=prefix + "*"))
+        if not keys:
+            self.stdout.write("No cache counters recorded")
+            return
+
+        for key in keys:
+            name = key[len(prefix) :]
+            stats = get_cache_stats(name)
+            total = sum(stats.values())
+            # Requests answered without computing the value themselves
+            cached = sum(
+                stats.get(event, 0)
+                for event in (CACHE_HIT, CACHE_STALE, CACHE_COALESCED)
+            )
+            counts = " ".join(f"{event}={stats.get(event, 0)}" for event in EVENTS)
+            self.stdout.write(f"{name}: {counts} cached={cached / total:.1%}")
+
+        if options["reset"]:
+            client.delete(*keys)
+            self.stdout.write(self.style.SUCCESS("Counters cleared"))
@@ -0,0 +1,43 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.encoding import filepath_to_uri
+
+
+def get_media_base_url(request=None):
+    """
+    Absolute URL media files are served from.
+
+    MEDIA_PUBLIC_BASE_URL (a CDN or the nginx media location) is used when
+    configured. Otherwise the base is built from the request host, once per
+    request.
+    """
+    if settings.MEDIA_PUBLIC_BASE_URL:
+        return settings.MEDIA_PUBLIC_BASE_URL.rstrip("/") + "/"
+
+    if request is None:
+        return default_storage.base_url
+
+    base_url = getattr(request, "_media_base_url", None)
+    if base_url is None:
+        base_url = request.build_absolute_uri(default_storage.base_url)
+        request._media_base_url = base_url
+    return base_url
+
+
+@lru_cache(maxsize=16384)
+def _join_media_url(base_url, name):
+    return base_url + filepath_to_uri(name)
+
+
+def media_url(file, request=None):
+    """
+    Public URL of a stored file (FieldFile or file name), None for an empty
+    field. URLs are memoized per base URL and file name, so rendering a
+    leaderboard or calendar doesn't go through the storage backend per row.
+    """
+    name = getattr(file, "name", file)
+    if not name:
+        return None
+    return _join_media_url(get_media_base_url(request), name)
@@ -0,0 +1,253 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.translation import get_language
+from rest_framework.response import Response
+
+from apps.common.cache import (
+    CATALOG_VERSION_KEY,
+    get_catalog_version,
+    get_or_compute,
+    get_user_version,
+)
+from apps.common.renderers import ORJSONRenderer
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag / Last-Modified headers to a GET endpoint and answers a matching
+    If-None-Match (or If-Modified-Since) with 304 before the queryset is
+    evaluated or serialized.
+
+    The validators are derived from the `updated_at` and row count of
+    `conditional_models`, so they change whenever a row is added, edited or
+    removed. Endpoints that render per-user data set `conditional_per_user`,
+    which mixes the user's write version and the current date into the ETag.
+    Views whose data has a version of its own override `get_etag_parts` (see
+    CatalogCacheMixin).
+    """
+
+    conditional_models: tuple = ()
+    conditional_per_user = False
+
+    def get_model_stats(self):
+        if not hasattr(self, "_model_stats"):
+            stats = []
+            for model in self.conditional_models:
+                if any(field.name == "updated_at" for field in model._meta.fields):
+                    stats.append(
+                        model._base_manager.aggregate(
+                            last_modified=Max("updated_at"), count=Count("pk")
+                        )
+                    )
+                else:
+                    # Auto-created tables (e.g. M2M through models) have no
+                    # timestamps, so only their row count is tracked
+                    stats.append(
+                        {
+                            "last_modified": None,
+                            "count": model._base_manager.count(),
+                        }
+                    )
+            self._model_stats = stats
+        return self._model_stats
+
+    def get_last_modified(self, request):
+        # Per-user data has no timestamp of its own, only the ETag covers it
+        if self.conditional_per_user:
+            return None
+
+        timestamps = [
+            stats["last_modified"]
+            for stats in self.get_model_stats()
+            if stats["last_modified"]
+        ]
+        return max(timestamps) if timestamps else None
+
+    def get_etag_parts(self, request):
+        parts = []
+        for stats in self.get_model_stats():
+            last_modified = stats["last_modified"]
+            parts.append(last_modified.isoformat() if last_modified else "")
+            parts.append(stats["count"])
+        return parts
+
+    def get_etag(self, request):
+        # The host too, as payloads hold absolute media URLs
+        parts = [request.get_host(), request.get_full_path(), get_language()]
+        parts.extend(self.get_etag_parts(request))
+
+        if self.conditional_per_user:
+            parts.extend(
+                [
+                    request.user.pk,
+                    get_user_version(request.user.pk),
+                    timezone.localdate().isoformat(),
+                ]
+            )
+
+        digest = hashlib.md5(":".join(map(str, parts)).encode()).hexdigest()
+        return f'"{digest}"'
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        last_modified = self.get_last_modified(request)
+        last_modified_timestamp = (
+            int(last_modified.timestamp()) if last_modified else None
+        )
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified_timestamp
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified_timestamp:
+                response["Last-Modified"] = http_date(last_modified_timestamp)
+            # Let the client keep a copy but revalidate it on every open
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CatalogCacheMixin:
+    """
+    Caches the serialized payload of a list endpoint whose data is the same
+    for every user, keyed by endpoint, language and full URL.
+
+    Each entry stores the catalog version it was rendered for, and the entry
+    and the current version are read with a single MGET. Saving any catalog
+    model bumps the version, which turns every stored entry into a miss.
+
+    Views that mix per-user fields into the catalog fill them in
+    `finalize_catalog_data`, which runs on every request.
+
+    Listed before ConditionalGetMixin, it validates the ETag with the same
+    catalog version instead of querying the catalog tables.
+    """
+
+    catalog_cache_timeout = 60 * 60 * 24
+
+    def get_catalog_cache_key(self, request):
+        return "catalog:{view}:{language}:{url}".format(
+            view=self.__class__.__name__,
+            language=get_language(),
+            url=request.build_absolute_uri(),
+        )
+
+    def finalize_catalog_data(self, data):
+        return data
+
+    def get_catalog_entry(self, request):
+        """
+        The cached entry (or None) and the current catalog version, read once
+        per request
+        """
+        if not hasattr(self, "_catalog_entry"):
+            key = self.get_catalog_cache_key(request)
+            cached = cache.get_many([key, CATALOG_VERSION_KEY])
+            version = cached.get(CATALOG_VERSION_KEY) or get_catalog_version()
+            self._catalog_entry = cached.get(key), version
+        return self._catalog_entry
+
+    def get_etag_parts(self, request):
+        _, version = self.get_catalog_entry(request)
+        return [version]
+
+    def get_last_modified(self, request):
+        # The catalog version has no timestamp, only the ETag covers it
+        return None
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_catalog_cache_key(request)
+        entry, version = self.get_catalog_entry(request)
+        if entry and entry["version"] == version:
+            data = entry["data"]
+        else:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(
+                key, {"version": version, "data": data}, self.catalog_cache_timeout
+            )
+
+        return Response(self.finalize_catalog_data(data))
+
+
+class UncachedResponse(Exception):
+    """
+    Carries a response that must not be cached out of `get_or_compute`
+    """
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+class SharedCacheMixin:
+    """
+    Caches the payload of an expensive read endpoint whose data is the same
+    for every user, keyed by endpoint, language and full URL.
+
+    Payloads are fresh for `shared_cache_timeout` seconds. Misses go through
+    `get_or_compute`, so when a payload expires one request recomputes it
+    while the concurrent ones get the previous payload, and on a cold miss
+    they wait for the first one instead of all hitting the database. Only
+    200 responses are cached, others are returned as they are.
+    """
+
+    shared_cache_timeout = 60
+    shared_cache_stale_timeout = 60 * 10
+
+    def get_shared_cache_key(self, request):
+        return "shared:{view}:{language}:{url}".format(
+            view=self.__class__.__name__,
+            language=get_language(),
+            url=request.build_absolute_uri(),
+        )
+
+    def get(self, request, *args, **kwargs):
+        get = super().get
+
+        def compute():
+            response = get(request, *args, **kwargs)
+            if response.status_code != 200:
+                raise UncachedResponse(response)
+            return response.data
+
+        try:
+            data = get_or_compute(
+                self.get_shared_cache_key(request),
+                compute,
+                self.shared_cache_timeout,
+                self.shared_cache_stale_timeout,
+                name=self.__class__.__name__,
+            )
+        except UncachedResponse as e:
+            return e.response
+        return Response(data)
+
+
+class RowListMixin:
+    """
+    Fast path for hot list endpoints: the queryset returns `.values()` rows,
+    `serialize_rows` turns a page of them into response dicts and the result
+    is rendered with orjson. `serializer_class` is kept for the API schema.
+    """
+
+    renderer_classes = [ORJSONRenderer]
+
+    def serialize_rows(self, rows):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page))
+
+        return Response(self.serialize_rows(list(queryset)))
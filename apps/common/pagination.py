@@ -0,0 +1,150 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    values = [
+        value.isoformat() if isinstance(value, datetime.date) else value
+        for value in values
+    ]
+    data = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, length):
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (TypeError, ValueError):
+        raise ValidationError({"cursor": "Invalid cursor"})
+    if not isinstance(values, list) or len(values) != length:
+        raise ValidationError({"cursor": "Invalid cursor"})
+    return values
+
+
+def keyset_filter(keyset, values):
+    """
+    Q matching the rows that come after `values` in the `keyset` ordering,
+    a sequence of (field, descending) pairs. None sorts last, like NULLS
+    LAST on the ascending nullable fields the keysets use.
+
+    The first field gets a plain range condition as well, so the database
+    can start the index scan at the cursor instead of filtering from the
+    top. The first field must not be nullable.
+    """
+    after = Q(pk__in=[])
+    equal = Q()
+    for (field, descending), value in zip(keyset, values):
+        if value is None:
+            # Only other NULLs sort with it, and they are ordered by the
+            # following fields
+            equal &= Q(**{f"{field}__isnull": True})
+            continue
+        lookup = "lt" if descending else "gt"
+        beyond = Q(**{f"{field}__{lookup}": value})
+        if not descending:
+            beyond |= Q(**{f"{field}__isnull": True})
+        after |= equal & beyond
+        equal &= Q(**{field: value})
+
+    first_field, first_descending = keyset[0]
+    bound = Q(**{f"{first_field}__{'lte' if first_descending else 'gte'}": values[0]})
+    return bound & after
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination. The cursor holds the sort key of the last row
+    of a page and the next page is read from right after it, so every page
+    costs the same however deep it is, unlike OFFSET.
+
+    The view declares its ordering as `keyset` (or `get_keyset()`),
+    (field, descending) pairs ending with a unique field. Querysets are filtered with
+    `keyset_filter`; other sources (see `RedisLeaderboard`) implement
+    `keyset_page(after, limit)`. The total is only counted when `?count=1`
+    is passed.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    count_query_param = "count"
+    default_limit = settings.REST_FRAMEWORK["PAGE_SIZE"]
+    max_limit = 100
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, 0))
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        keyset = view.get_keyset() if hasattr(view, "get_keyset") else view.keyset
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        after = decode_cursor(cursor, len(keyset)) if cursor else None
+
+        if hasattr(queryset, "keyset_page"):
+            rows = queryset.keyset_page(after, self.limit + 1)
+        else:
+            page = queryset
+            if after is not None:
+                page = page.filter(keyset_filter(keyset, after))
+            rows = list(page[: self.limit + 1])
+
+        self.next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            self.next_cursor = encode_cursor(
+                [self.get_value(rows[-1], field) for field, _ in keyset]
+            )
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            if isinstance(queryset, QuerySet):
+                self.count = queryset.count()
+            else:
+                self.count = len(queryset)
+        return rows
+
+    @staticmethod
+    def get_value(row, field):
+        if isinstance(row, dict):
+            return row[field]
+        return getattr(row, field)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link()}
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "count": {"type": "integer"},
+                "results": schema,
+            },
+        }
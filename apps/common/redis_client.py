@@ -0,0 +1,34 @@
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_client = None
+
+
+def get_redis():
+    """
+    Shared Redis client for data structures that don't fit the cache API
+    (sorted sets, counters). Connections come from the client's pool.
+    """
+    global _client
+    if _client is None:
+        _client = redis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+        )
+    return _client
+
+
+def create_async_redis():
+    """
+    New asyncio Redis client for code running on its own event loop, as
+    clients can't be shared between loops. Close it with `aclose()`.
+    """
+    return redis.asyncio.StrictRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        decode_responses=True,
+    )
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+
+from apps.common.media import media_url
+
+
+class MediaURLField(serializers.ImageField):
+    """
+    Read-only image field rendered through the memoized media URL resolver.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return media_url(value, self.context.get("request"))
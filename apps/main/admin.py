@@ -5,6 +5,8 @@ from django.contrib import admin
 from apps.main.models import (
     Challenge,
     ChallengeAward,
+    HallOfFameEntry,
+    LeaderboardSnapshot,
     SuperChallenge,
     SuperChallengeAward,
     UserAward,
@@ -81,6 +83,20 @@ class ChallengeAwardAdmin(admin.ModelAdmin):
     search_fields = ("challenge__title",)
 
 
+@admin.register(HallOfFameEntry)
+class HallOfFameEntryAdmin(admin.ModelAdmin):
+    list_display = ("user", "challenge", "best_streak", "reached_at")
+    list_filter = ("challenge",)
+    search_fields = ("user__username", "user__first_name", "challenge__title")
+    raw_id_fields = ("user",)
+
+
+@admin.register(LeaderboardSnapshot)
+class LeaderboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("kind", "object_id", "date", "is_final", "total")
+    list_filter = ("kind", "is_final", "date")
+
+
 @admin.register(UserAward)
 class UserAwardAdmin(admin.ModelAdmin):
     list_display = ("user", "challenge_award", "created_at")
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.common.cache import (
+    CATALOG_VERSION_KEY,
+    bump_version,
+    get_catalog_version,
+    get_version,
+)
+
+# The rendered calendar holds absolute media URLs, so it is cached per media
+# base URL (the request host unless MEDIA_PUBLIC_BASE_URL is set)
+CALENDAR_CACHE_KEY = (
+    "calendar:{kind}:{user_id}:{year}-{month:02d}:{language}:{media_base_url}"
+)
+# Bumped when a completion of the month changes, which invalidates its
+# entries for every language and host at once
+CALENDAR_VERSION_KEY = "version:calendar:{kind}:{user_id}:{year}-{month:02d}"
+
+# Past months only change when an admin voids or edits a completion, and
+# those writes delete the entry, so they can stay cached for a long time
+CLOSED_MONTH_TIMEOUT = 60 * 60 * 24 * 30
+OPEN_MONTH_TIMEOUT = 60 * 60
+
+CHALLENGES_CALENDAR = "challenges"
+SUPER_CHALLENGES_CALENDAR = "super"
+
+
+def calendar_cache_key(kind, user_id, year, month, language="", media_base_url=""):
+    return CALENDAR_CACHE_KEY.format(
+        kind=kind,
+        user_id=user_id,
+        year=year,
+        month=month,
+        language=language,
+        media_base_url=media_base_url,
+    )
+
+
+def calendar_version_key(kind, user_id, year, month):
+    return CALENDAR_VERSION_KEY.format(
+        kind=kind, user_id=user_id, year=year, month=month
+    )
+
+
+def calendar_cache_timeout(year, month):
+    today = timezone.localdate()
+    if (year, month) < (today.year, today.month):
+        return CLOSED_MONTH_TIMEOUT
+    return OPEN_MONTH_TIMEOUT
+
+
+def get_cached_calendar(
+    kind, user_id, year, month, build, language="", media_base_url=""
+):
+    """
+    Return the cached calendar of a user's month, rendering it with `build()`
+    on a miss. Entries rendered for an older catalog version (a renamed
+    challenge, a new icon) or before a completion of the month changed count
+    as misses.
+    """
+    key = calendar_cache_key(kind, user_id, year, month, language, media_base_url)
+    version_key = calendar_version_key(kind, user_id, year, month)
+    timeout = calendar_cache_timeout(year, month)
+    cached = cache.get_many([key, CATALOG_VERSION_KEY, version_key])
+    version = [
+        cached.get(CATALOG_VERSION_KEY) or get_catalog_version(),
+        cached.get(version_key) or get_version(version_key, timeout),
+    ]
+
+    entry = cached.get(key)
+    if entry and entry["version"] == version:
+        return entry["data"]
+
+    data = build()
+    cache.set(key, {"version": version, "data": data}, timeout)
+    return data
+
+
+def invalidate_calendar_month(kind, user_id, completed_at):
+    """
+    Invalidate the user's cached calendar of the local month of
+    `completed_at`, for every language and host, once the current
+    transaction commits.
+    """
+    local_date = timezone.localtime(completed_at).date()
+    key = calendar_version_key(kind, user_id, local_date.year, local_date.month)
+    timeout = calendar_cache_timeout(local_date.year, local_date.month)
+    transaction.on_commit(lambda: bump_version(key, timeout))
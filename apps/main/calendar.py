@@ -0,0 +1,159 @@
+import base64
+import datetime
+
+from django.core import signing
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+# Longest span the calendar range endpoints return in one response
+MAX_CALENDAR_RANGE_MONTHS = 12
+
+SYNC_TOKEN_SALT = "apps.main.calendar.sync"
+# A client that is further behind reloads the calendar instead
+MAX_SYNC_CHANGES = 500
+
+
+def parse_month(query_params):
+    """
+    Read `year` and `month` from the query string, defaulting to the current
+    local month.
+    """
+    today = timezone.localdate()
+    try:
+        month = int(query_params.get("month", today.month))
+        year = int(query_params.get("year", today.year))
+    except ValueError:
+        raise ValidationError("Invalid month or year format")
+
+    if not 1 <= month <= 12:
+        raise ValidationError("Month must be between 1 and 12")
+    if not datetime.MINYEAR < year < datetime.MAXYEAR:
+        raise ValidationError("Invalid month or year format")
+    return year, month
+
+
+def parse_month_param(value, name):
+    """
+    Parse a `YYYY-MM` query parameter into a (year, month) pair.
+    """
+    try:
+        parsed = datetime.datetime.strptime(value, "%Y-%m")
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Expected a month in YYYY-MM format"})
+    if parsed.year == datetime.MAXYEAR:
+        raise ValidationError({name: "Expected a month in YYYY-MM format"})
+    return parsed.year, parsed.month
+
+
+def parse_month_span(query_params):
+    """
+    Read the `from` and `to` months (inclusive, `YYYY-MM`) of a calendar range
+    request. `to` defaults to `from`.
+    """
+    start = parse_month_param(query_params.get("from"), "from")
+    end = parse_month_param(query_params.get("to", query_params.get("from")), "to")
+
+    months = (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+    if months < 1:
+        raise ValidationError({"to": "Must not be before `from`"})
+    if months > MAX_CALENDAR_RANGE_MONTHS:
+        raise ValidationError(
+            {"to": f"At most {MAX_CALENDAR_RANGE_MONTHS} months can be requested"}
+        )
+    return start, end
+
+
+def next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_range(year, month, end_year=None, end_month=None):
+    """
+    Half-open [start, end) datetime range covering the given local month, or
+    the months from (year, month) to (end_year, end_month) inclusive.
+
+    Filtering `completed_at__gte=start, completed_at__lt=end` can be answered
+    from an index on `completed_at`, unlike `completed_at__year` /
+    `completed_at__month`, which extract date parts from every row.
+    """
+    if end_year is None:
+        end_year, end_month = year, month
+    current_timezone = timezone.get_current_timezone()
+    start = datetime.datetime(year, month, 1, tzinfo=current_timezone)
+    end = datetime.datetime(
+        *next_month(end_year, end_month), 1, tzinfo=current_timezone
+    )
+    return start, end
+
+
+def completed_in(start, end):
+    """
+    Queryset filter kwargs for active completions inside a month_range.
+    """
+    return {
+        "completed_at__gte": start,
+        "completed_at__lt": end,
+        "is_active": True,
+    }
+
+
+def parse_year(query_params):
+    """
+    Read `year` from the query string, defaulting to the current local year.
+    """
+    try:
+        year = int(query_params.get("year", timezone.localdate().year))
+    except ValueError:
+        raise ValidationError("Invalid year format")
+    if not datetime.MINYEAR < year < datetime.MAXYEAR:
+        raise ValidationError("Invalid year format")
+    return year
+
+
+def days_in_year(year):
+    return datetime.date(year, 12, 31).timetuple().tm_yday
+
+
+def year_bitmaps(rows, year, keys=()):
+    """
+    Pack `(key, completed_at)` rows into one base64 bitmap per key. `keys`
+    get an empty bitmap when they have no rows.
+
+    Bit N (least significant bit first within each byte) is set when the
+    user completed on day N of the year in local time, January 1st being
+    day 0. A year takes 46 bytes, 64 characters of base64.
+    """
+    first_day = datetime.date(year, 1, 1).toordinal()
+    size = (days_in_year(year) + 7) // 8
+
+    bitmaps = {key: bytearray(size) for key in keys}
+    for key, completed_at in rows:
+        bitmap = bitmaps.get(key)
+        if bitmap is None:
+            bitmap = bitmaps[key] = bytearray(size)
+        day = timezone.localtime(completed_at).date().toordinal() - first_day
+        bitmap[day >> 3] |= 1 << (day & 7)
+
+    return {
+        key: base64.b64encode(bitmap).decode("ascii") for key, bitmap in bitmaps.items()
+    }
+
+
+def make_sync_token(user_id, seq):
+    """
+    Opaque token for the calendar state of a user at change sequence `seq`
+    """
+    return signing.dumps([user_id, seq], salt=SYNC_TOKEN_SALT)
+
+
+def parse_sync_token(token, user_id):
+    """
+    Change sequence of a token made by make_sync_token for the same user
+    """
+    try:
+        token_user_id, seq = signing.loads(token, salt=SYNC_TOKEN_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValidationError({"since": "Invalid sync token"})
+    if token_user_id != user_id:
+        raise ValidationError({"since": "Invalid sync token"})
+    return seq
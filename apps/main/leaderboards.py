@@ -0,0 +1,518 @@
+"""
+Challenge and super challenge leaderboards kept in Redis sorted sets.
+
+Each leaderboard is a sorted set of users scored by `leaderboard_score`,
+so a page is a single ZREVRANGE instead of a sort over the participation
+table. Users with equal scores are ordered by ascending id, like the
+database ordering (see `leaderboard_member`). The sets are updated when a
+participation is saved and rebuilt from the database when missing (or by
+the `rebuild_leaderboards` command).
+"""
+import datetime
+import logging
+
+import redis
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from apps.common.cache import (
+    CACHE_COALESCED,
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHE_STALE,
+    CACHE_WAIT_TIMEOUT,
+    SINGLE_FLIGHT_LOCK_KEY,
+    SINGLE_FLIGHT_LOCK_TIMEOUT,
+    record_cache_event,
+    wait_for,
+)
+from apps.common.redis_client import get_redis
+from apps.main.models import (
+    Challenge,
+    LeaderboardSnapshot,
+    LeaderboardSnapshotEntry,
+    SuperChallenge,
+    UserChallenge,
+    UserStats,
+    UserSuperChallenge,
+)
+
+logger = logging.getLogger(__name__)
+
+CHALLENGE = "challenge"
+SUPER_CHALLENGE = "super_challenge"
+
+# v2: members encode the user id (leaderboard_member)
+LEADERBOARD_KEY = "leaderboard:v2:{kind}:{id}"
+# Set while the sorted set is complete. Updates are only applied to complete
+# sets, and the marker expiring makes the next read rebuild the set, which
+# repairs any update lost while Redis was unavailable.
+LEADERBOARD_READY_KEY = "leaderboard:v2:{kind}:{id}:ready"
+LEADERBOARD_READY_TIMEOUT = 60 * 60 * 24
+# Members updated while a rebuild runs, which it re-reads before replacing
+# the set. Holds REBUILDING_MEMBER from the start of the rebuild until it
+# replaces the set.
+LEADERBOARD_PENDING_KEY = "leaderboard:v2:{kind}:{id}:pending"
+LEADERBOARD_PENDING_TIMEOUT = 60 * 10
+REBUILDING_MEMBER = "rebuilding"
+
+# The streak takes the high digits of the score and the tie-breaker the low
+# ones: 10**6 leaves room for any date ordinal
+SCORE_MULTIPLIER = 10**6
+NO_DATE_ORDINAL = SCORE_MULTIPLIER - 1
+
+# Members are MEMBER_BASE - user_id, zero padded to MEMBER_WIDTH digits.
+# Equal scores are ordered by member, so ZREVRANGE returns them by
+# descending member, which is ascending user id
+MEMBER_WIDTH = 19
+MEMBER_BASE = 10**MEMBER_WIDTH - 1
+
+# Keyset pagination orderings (see KeysetPagination) of the live
+# leaderboards, the same as ordered_leaderboard_queryset, and of snapshots
+LEADERBOARD_KEYSET = (
+    ("highest_streak", True),
+    ("last_completion_date", False),
+    ("user_id", False),
+)
+SNAPSHOT_KEYSET = (("rank", False),)
+
+# `order` values of the global leaderboard and the UserStats field each
+# ranks by
+GLOBAL_LEADERBOARD_ORDERS = {
+    "streak": "total_current_streak",
+    "completions": "total_completions",
+}
+
+# Daily snapshots older than this are deleted, final ones are kept
+SNAPSHOT_RETENTION_DAYS = 7
+
+# Name of the rebuild hit / miss counters (see record_cache_event)
+LEADERBOARD_CACHE_NAME = "leaderboard"
+
+# Rows following the cursor (score, member) in ZREVRANGE order, even when
+# the cursor's user has since moved: the cursor's position is found among
+# the members with its score by binary search.
+# ARGV: score, member, limit. Returns a WITHSCORES list.
+PAGE_AFTER_SCRIPT = """
+local lo = redis.call('ZCOUNT', KEYS[1], '(' .. ARGV[1], '+inf')
+local hi = lo + redis.call('ZCOUNT', KEYS[1], ARGV[1], ARGV[1])
+while lo < hi do
+    local mid = math.floor((lo + hi) / 2)
+    if redis.call('ZREVRANGE', KEYS[1], mid, mid)[1] < ARGV[2] then
+        hi = mid
+    else
+        lo = mid + 1
+    end
+end
+return redis.call('ZREVRANGE', KEYS[1], lo, lo + tonumber(ARGV[3]) - 1, 'WITHSCORES')
+"""
+
+# Runs the update atomically with the ready check, and records the member
+# for a rebuild in progress, which would otherwise overwrite the update with
+# the rows it read before
+UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('SADD', KEYS[3], ARGV[1])
+end
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+if ARGV[2] == '' then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+else
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+end
+return 1
+"""
+
+
+class LeaderboardRebuilding(redis.RedisError):
+    """
+    Another request is rebuilding the sorted set and there is no previous
+    one to read
+    """
+
+
+def leaderboard_score(highest_streak, last_completion_date):
+    """
+    Orders by highest streak, then by who reached it first (earlier last
+    completion date). Participations without completions rank last among
+    equal streaks, like NULLS LAST in the database ordering.
+    """
+    if last_completion_date is None:
+        tie_breaker = NO_DATE_ORDINAL
+    else:
+        tie_breaker = last_completion_date.toordinal()
+    return highest_streak * SCORE_MULTIPLIER + (NO_DATE_ORDINAL - tie_breaker)
+
+
+def leaderboard_member(user_id):
+    return str(MEMBER_BASE - int(user_id)).zfill(MEMBER_WIDTH)
+
+
+def user_id_from_member(member):
+    return MEMBER_BASE - int(member)
+
+
+def streak_from_score(score):
+    return int(score) // SCORE_MULTIPLIER
+
+
+def date_from_score(score):
+    ordinal = NO_DATE_ORDINAL - int(score) % SCORE_MULTIPLIER
+    if ordinal == NO_DATE_ORDINAL:
+        return None
+    return datetime.date.fromordinal(ordinal)
+
+
+def leaderboard_queryset(kind, id):
+    """
+    Participations that belong on the leaderboard, the same filters as the
+    database-backed endpoints
+    """
+    if kind == CHALLENGE:
+        return UserChallenge.objects.filter(challenge_id=id, highest_streak__gt=0)
+    return UserSuperChallenge.objects.filter(super_challenge_id=id, is_active=True)
+
+
+def ordered_leaderboard_queryset(kind, id):
+    """
+    leaderboard_queryset in leaderboard order, the same as the sorted sets
+    (LEADERBOARD_KEYSET)
+    """
+    return leaderboard_queryset(kind, id).order_by(
+        "-highest_streak",
+        F("last_completion_date").asc(nulls_last=True),
+        "user_id",
+    )
+
+
+def ranked_ahead_filter(highest_streak, last_completion_date, user_id):
+    """
+    Q matching the participations ordered ahead of the given one by
+    ordered_leaderboard_queryset, whose count is its 0-based rank
+    """
+    ahead = Q(highest_streak__gt=highest_streak)
+    same_streak = Q(highest_streak=highest_streak)
+    if last_completion_date is None:
+        ahead |= same_streak & Q(last_completion_date__isnull=False)
+        same_date = same_streak & Q(last_completion_date__isnull=True)
+    else:
+        ahead |= same_streak & Q(last_completion_date__lt=last_completion_date)
+        same_date = same_streak & Q(last_completion_date=last_completion_date)
+    return ahead | same_date & Q(user_id__lt=user_id)
+
+
+def global_leaderboard_queryset(order):
+    """
+    Users ranked across all challenges by the GLOBAL_LEADERBOARD_ORDERS
+    field, read from the precomputed UserStats rows
+    """
+    field = GLOBAL_LEADERBOARD_ORDERS[order]
+    return UserStats.objects.filter(**{f"{field}__gt": 0}).order_by(
+        f"-{field}", "user_id"
+    )
+
+
+def is_ranked(kind, participation):
+    if kind == CHALLENGE:
+        return participation.highest_streak > 0
+    return participation.is_active
+
+
+def leaderboard_scores(kind, id, user_ids=None):
+    """
+    Sorted set members and scores of the ranked participations, only of
+    `user_ids` when given
+    """
+    queryset = leaderboard_queryset(kind, id)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    rows = queryset.values_list("user_id", "highest_streak", "last_completion_date")
+    return {
+        leaderboard_member(user_id): leaderboard_score(
+            highest_streak, last_completion_date
+        )
+        for user_id, highest_streak, last_completion_date in rows.iterator()
+    }
+
+
+def rebuild_leaderboard(kind, id):
+    """
+    Replace the sorted set with the current database state and return the
+    number of entries.
+
+    Participations saved while the rows are read are recorded by
+    sync_participation in the pending set. They are read again until none
+    are left, and the set is only replaced if no more were recorded
+    meanwhile (WATCH), so no update is lost to the rebuild.
+    """
+    client = get_redis()
+    key = LEADERBOARD_KEY.format(kind=kind, id=id)
+    pending_key = LEADERBOARD_PENDING_KEY.format(kind=kind, id=id)
+
+    pipeline = client.pipeline()
+    pipeline.sadd(pending_key, REBUILDING_MEMBER)
+    pipeline.expire(pending_key, LEADERBOARD_PENDING_TIMEOUT)
+    pipeline.execute()
+
+    scores = leaderboard_scores(kind, id)
+
+    with client.pipeline() as pipeline:
+        while True:
+            try:
+                pipeline.watch(pending_key)
+                members = pipeline.smembers(pending_key) - {REBUILDING_MEMBER}
+                if members:
+                    # Removed before reading, so a member saved again
+                    # afterwards is added back and trips the WATCH
+                    pipeline.unwatch()
+                    client.srem(pending_key, *members)
+                    for member in members:
+                        scores.pop(member, None)
+                    scores.update(
+                        leaderboard_scores(
+                            kind, id, [user_id_from_member(m) for m in members]
+                        )
+                    )
+                    continue
+
+                pipeline.multi()
+                pipeline.delete(key)
+                if scores:
+                    pipeline.zadd(key, scores)
+                pipeline.set(
+                    LEADERBOARD_READY_KEY.format(kind=kind, id=id),
+                    1,
+                    ex=LEADERBOARD_READY_TIMEOUT,
+                )
+                pipeline.delete(pending_key)
+                pipeline.execute()
+                return len(scores)
+            except redis.WatchError:
+                continue
+
+
+def ensure_leaderboard(kind, id):
+    """
+    Rebuild the sorted set unless it is complete. Only one request rebuilds
+    at a time: the others read the previous set while it still exists, or
+    wait for the rebuild. A wait that times out raises LeaderboardRebuilding,
+    a RedisError, so the caller serves the page from the database instead.
+    """
+    client = get_redis()
+    ready_key = LEADERBOARD_READY_KEY.format(kind=kind, id=id)
+    if client.exists(ready_key):
+        record_cache_event(LEADERBOARD_CACHE_NAME, CACHE_HIT)
+        return
+
+    lock_key = SINGLE_FLIGHT_LOCK_KEY.format(
+        key=LEADERBOARD_KEY.format(kind=kind, id=id)
+    )
+    if client.set(lock_key, 1, nx=True, ex=SINGLE_FLIGHT_LOCK_TIMEOUT):
+        record_cache_event(LEADERBOARD_CACHE_NAME, CACHE_MISS)
+        try:
+            rebuild_leaderboard(kind, id)
+        finally:
+            client.delete(lock_key)
+        return
+
+    # The rebuild replaces the set atomically, so the previous one is
+    # consistent until then
+    if client.exists(LEADERBOARD_KEY.format(kind=kind, id=id)):
+        record_cache_event(LEADERBOARD_CACHE_NAME, CACHE_STALE)
+        return
+
+    if wait_for(lambda: client.exists(ready_key) or None):
+        record_cache_event(LEADERBOARD_CACHE_NAME, CACHE_COALESCED)
+        return
+
+    record_cache_event(LEADERBOARD_CACHE_NAME, CACHE_WAIT_TIMEOUT)
+    raise LeaderboardRebuilding(f"Leaderboard {kind} {id} is being rebuilt")
+
+
+def sync_participation(kind, id, user_id, score):
+    """
+    Set the user's score, or remove the user when `score` is None, once the
+    current transaction commits.
+    """
+    keys = [
+        LEADERBOARD_KEY.format(kind=kind, id=id),
+        LEADERBOARD_READY_KEY.format(kind=kind, id=id),
+        LEADERBOARD_PENDING_KEY.format(kind=kind, id=id),
+    ]
+    args = [leaderboard_member(user_id), "" if score is None else score]
+
+    def update():
+        try:
+            get_redis().eval(UPDATE_SCRIPT, len(keys), *keys, *args)
+        except redis.RedisError:
+            # Drop the set, the next read rebuilds it from the database
+            try:
+                get_redis().delete(keys[1])
+            except redis.RedisError as e:
+                # The set stays stale until the ready marker expires
+                logger.warning(f"Leaderboard {kind} {id} not updated: {e}")
+
+    transaction.on_commit(update)
+
+
+class RedisLeaderboard:
+    """
+    Read-only sequence over a leaderboard sorted set, highest score first.
+
+    Supports len() and slicing, so LimitOffsetPagination pages it like a
+    queryset. Slices return rows with LEADERBOARD_FIELDS.
+    """
+
+    def __init__(self, kind, id):
+        self.key = LEADERBOARD_KEY.format(kind=kind, id=id)
+        ensure_leaderboard(kind, id)
+
+    def __len__(self):
+        return get_redis().zcard(self.key)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("RedisLeaderboard only supports slicing")
+        start = index.start or 0
+        stop = len(self) if index.stop is None else index.stop
+        if stop <= start:
+            return []
+
+        entries = get_redis().zrevrange(self.key, start, stop - 1, withscores=True)
+        return self.to_rows(entries)
+
+    def keyset_page(self, after, limit):
+        """
+        Up to `limit` rows following the LEADERBOARD_KEYSET cursor `after`,
+        for KeysetPagination. The sorted set is in the database order, so a
+        cursor resumes at the same row on both, also after the cursor's user
+        has moved. A page costs the same at any depth.
+        """
+        client = get_redis()
+        if after is None:
+            entries = client.zrevrange(self.key, 0, limit - 1, withscores=True)
+            return self.to_rows(entries)
+
+        try:
+            highest_streak, last_completion_date, user_id = after
+            if last_completion_date is not None:
+                last_completion_date = datetime.date.fromisoformat(last_completion_date)
+            score = leaderboard_score(int(highest_streak), last_completion_date)
+            member = leaderboard_member(user_id)
+        except (TypeError, ValueError):
+            raise ValidationError({"cursor": "Invalid cursor"})
+
+        flat = client.eval(PAGE_AFTER_SCRIPT, 1, self.key, score, member, limit)
+        entries = [(flat[i], float(flat[i + 1])) for i in range(0, len(flat), 2)]
+        return self.to_rows(entries)
+
+    @staticmethod
+    def to_rows(entries):
+        return [
+            {
+                "user_id": user_id_from_member(member),
+                "highest_streak": streak_from_score(score),
+                "last_completion_date": date_from_score(score),
+            }
+            for member, score in entries
+        ]
+
+    def around(self, user_id, window):
+        """
+        The user's 0-based rank and score, and the entries from `window`
+        places above to `window` places below them, each with its rank.
+        Returns (None, None, []) when the user is not on the leaderboard.
+        """
+        member = leaderboard_member(user_id)
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.zrevrank(self.key, member)
+        pipeline.zscore(self.key, member)
+        rank, score = pipeline.execute()
+        if rank is None:
+            return None, None, []
+
+        start = max(rank - window, 0)
+        entries = get_redis().zrevrange(self.key, start, rank + window, withscores=True)
+        rows = self.to_rows(entries)
+        for index, row in enumerate(rows):
+            row["rank"] = start + index
+        return rank, score, rows
+
+
+def latest_snapshot(kind, id):
+    """
+    Newest snapshot of a leaderboard. Nothing is taken after a final one, so
+    that is always the newest for an ended super challenge.
+    """
+    return (
+        LeaderboardSnapshot.objects.filter(kind=kind, object_id=id)
+        .order_by("-date")
+        .first()
+    )
+
+
+def take_snapshot(kind, id, date, is_final=False):
+    """
+    Store the current standings of a leaderboard, replacing a snapshot
+    already taken on `date`.
+    """
+    rows = ordered_leaderboard_queryset(kind, id).values_list(
+        "user_id", "highest_streak"
+    )
+    entries = [
+        LeaderboardSnapshotEntry(rank=rank, user_id=user_id, highest_streak=streak)
+        for rank, (user_id, streak) in enumerate(rows.iterator(), 1)
+    ]
+
+    with transaction.atomic():
+        LeaderboardSnapshot.objects.filter(kind=kind, object_id=id, date=date).delete()
+        snapshot = LeaderboardSnapshot.objects.create(
+            kind=kind,
+            object_id=id,
+            date=date,
+            is_final=is_final,
+            total=len(entries),
+        )
+        for entry in entries:
+            entry.snapshot = snapshot
+        LeaderboardSnapshotEntry.objects.bulk_create(entries, batch_size=1000)
+    return snapshot
+
+
+def snapshot_leaderboards(date=None):
+    """
+    Snapshot every leaderboard after the nightly streak update. A super
+    challenge that has ended gets one final snapshot, after which its
+    standings are frozen.
+    """
+    date = date or timezone.localdate()
+    count = 0
+
+    for challenge_id in Challenge.objects.values_list("id", flat=True):
+        take_snapshot(CHALLENGE, challenge_id, date)
+        count += 1
+
+    finalized = set(
+        LeaderboardSnapshot.objects.filter(
+            kind=SUPER_CHALLENGE, is_final=True
+        ).values_list("object_id", flat=True)
+    )
+    for super_challenge_id, end_date in SuperChallenge.objects.values_list(
+        "id", "end_date"
+    ):
+        if super_challenge_id in finalized:
+            continue
+        take_snapshot(
+            SUPER_CHALLENGE, super_challenge_id, date, is_final=end_date < date
+        )
+        count += 1
+
+    LeaderboardSnapshot.objects.filter(
+        is_final=False,
+        date__lt=date - datetime.timedelta(days=SNAPSHOT_RETENTION_DAYS),
+    ).delete()
+    return count
@@ -0,0 +1,195 @@
+import datetime
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from apps.common.renderers import ORJSONRenderer
+from apps.main.models import Challenge, UserChallenge
+from apps.main.row_serializers import (
+    serialize_challenge,
+    serialize_leaderboard_entries,
+    serialize_user_challenge,
+)
+from apps.main.serializers import (
+    ChallengeLeaderboardSerializer,
+    UserChallengeListSerializer,
+)
+from apps.users.cards import make_user_card, user_card_key
+from apps.users.models import User
+
+# The leaderboard reads user cards from the cache: a local one is filled
+# with the benchmark's users instead of the shared cache
+BENCHMARK_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare CPU time of the DRF serializers and the fast .values() path "
+        "used by the user challenge list and leaderboard endpoints. "
+        "Works on in-memory data, no database access is needed."
+    )
+
+    @override_settings(CACHES=BENCHMARK_CACHES)
+    def execute(self, *args, **options):
+        return super().execute(*args, **options)
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        repeat = options["repeat"]
+        request = RequestFactory().get("/")
+        now = timezone.now()
+
+        challenges = [
+            Challenge(
+                id=challenge_id,
+                title=f"Challenge {challenge_id}",
+                icon=f"challenge_icons/{challenge_id}.png",
+                video_instruction_url="https://example.com/video",
+                start_time=datetime.time(5, 0),
+                end_time=datetime.time(6, 0),
+                created_at=now,
+                updated_at=now,
+            )
+            for challenge_id in range(1, 11)
+        ]
+        challenge_rows = [
+            {
+                "id": challenge.id,
+                "title": challenge.title,
+                "icon": challenge.icon.name,
+                "video_instruction_url": challenge.video_instruction_url,
+                "video_instruction_title": None,
+                "start_time": challenge.start_time,
+                "end_time": challenge.end_time,
+                "created_at": now,
+                "updated_at": now,
+                "rules": None,
+            }
+            for challenge in challenges
+        ]
+
+        users = [
+            User(
+                id=user_id,
+                first_name=f"First {user_id}",
+                last_name=f"Last {user_id}",
+                telegram_username=f"user_{user_id}",
+                telegram_photo=f"telegram_photos/{user_id}.jpg",
+            )
+            for user_id in range(1, rows + 1)
+        ]
+        user_challenges = [
+            UserChallenge(
+                id=index,
+                user=user,
+                challenge=challenges[index % len(challenges)],
+                current_streak=index % 40,
+                highest_streak=index % 60,
+                total_completions=index % 90,
+                last_completion_date=now.date(),
+                started_at=now,
+            )
+            for index, user in enumerate(users, 1)
+        ]
+        user_challenge_rows = [
+            {
+                "id": user_challenge.id,
+                "challenge_id": user_challenge.challenge.id,
+                "current_streak": user_challenge.current_streak,
+                "highest_streak": user_challenge.highest_streak,
+                "total_completions": user_challenge.total_completions,
+                "last_completion_date": user_challenge.last_completion_date,
+                "started_at": user_challenge.started_at,
+            }
+            for user_challenge in user_challenges
+        ]
+        leaderboard_rows = [
+            {
+                "highest_streak": user_challenge.highest_streak,
+                "user_id": user_challenge.user.id,
+            }
+            for user_challenge in user_challenges
+        ]
+        cache.set_many({user_card_key(user.id): make_user_card(user) for user in users})
+
+        def fast_user_challenges():
+            serialized = {
+                row["id"]: serialize_challenge(row, request) for row in challenge_rows
+            }
+            return [
+                serialize_user_challenge(row, serialized[row["challenge_id"]])
+                for row in user_challenge_rows
+            ]
+
+        self.compare(
+            "User challenge list",
+            rows,
+            repeat,
+            lambda: UserChallengeListSerializer(
+                user_challenges, many=True, context={"request": request}
+            ).data,
+            fast_user_challenges,
+        )
+        self.compare(
+            "Leaderboard",
+            rows,
+            repeat,
+            lambda: ChallengeLeaderboardSerializer(
+                user_challenges, many=True, context={"request": request}
+            ).data,
+            lambda: serialize_leaderboard_entries(leaderboard_rows, request),
+        )
+
+    def compare(self, name, rows, repeat, drf_serialize, fast_serialize):
+        drf_serialize_time, data = self.measure(drf_serialize, repeat)
+        drf_render_time, _ = self.measure(lambda: JSONRenderer().render(data), repeat)
+        fast_serialize_time, data = self.measure(fast_serialize, repeat)
+        fast_render_time, _ = self.measure(
+            lambda: ORJSONRenderer().render(data), repeat
+        )
+
+        per_thousand = 1000 / rows
+        drf_total = (drf_serialize_time + drf_render_time) * per_thousand
+        fast_total = (fast_serialize_time + fast_render_time) * per_thousand
+
+        self.stdout.write(self.style.NOTICE(f"{name} (CPU ms per 1,000 rows)"))
+        self.stdout.write(
+            f"  ModelSerializer + JSONRenderer: {drf_total:8.2f} "
+            f"(serialize {drf_serialize_time * per_thousand:.2f}, "
+            f"render {drf_render_time * per_thousand:.2f})"
+        )
+        self.stdout.write(
+            f"  .values() rows + ORJSONRenderer: {fast_total:8.2f} "
+            f"(serialize {fast_serialize_time * per_thousand:.2f}, "
+            f"render {fast_render_time * per_thousand:.2f})"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"  saved {drf_total - fast_total:.2f} ms "
+                f"({drf_total / fast_total:.1f}x faster)"
+            )
+        )
+
+    @staticmethod
+    def measure(func, repeat):
+        """
+        Best CPU time of `repeat` runs in milliseconds, and the last result
+        """
+        best = None
+        result = None
+        for _ in range(repeat):
+            started = time.process_time()
+            result = func()
+            elapsed = (time.process_time() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
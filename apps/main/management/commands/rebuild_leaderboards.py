@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from apps.main.leaderboards import CHALLENGE, SUPER_CHALLENGE, rebuild_leaderboard
+from apps.main.models import Challenge, SuperChallenge
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the Redis leaderboards of challenges and super challenges "
+        "from the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--challenge", type=int, action="append", help="Only this challenge id"
+        )
+        parser.add_argument(
+            "--super-challenge",
+            type=int,
+            action="append",
+            help="Only this super challenge id",
+        )
+
+    def handle(self, *args, **options):
+        challenge_ids = options["challenge"]
+        super_challenge_ids = options["super_challenge"]
+        if not challenge_ids and not super_challenge_ids:
+            challenge_ids = Challenge.objects.values_list("id", flat=True)
+            super_challenge_ids = SuperChallenge.objects.values_list("id", flat=True)
+
+        for kind, ids in (
+            (CHALLENGE, challenge_ids or []),
+            (SUPER_CHALLENGE, super_challenge_ids or []),
+        ):
+            for id in ids:
+                count = rebuild_leaderboard(kind, id)
+                self.stdout.write(f"{kind} {id}: {count} entries")
+
+        self.stdout.write(self.style.SUCCESS("Leaderboards rebuilt"))
@@ -0,0 +1,92 @@
+# Generated by Django 5.1.6 on 2026-10-19 05:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_hall_of_fame(apps, schema_editor):
+    UserChallenge = apps.get_model("main", "UserChallenge")
+    HallOfFameEntry = apps.get_model("main", "HallOfFameEntry")
+
+    entries = [
+        HallOfFameEntry(
+            user_id=user_challenge.user_id,
+            challenge_id=user_challenge.challenge_id,
+            best_streak=user_challenge.highest_streak,
+            reached_at=user_challenge.last_completion_date
+            or user_challenge.updated_at.date(),
+        )
+        for user_challenge in UserChallenge.objects.filter(
+            highest_streak__gte=30
+        ).iterator()
+    ]
+    HallOfFameEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0022_superchallenge_superchallengeaward_and_more"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HallOfFameEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "best_streak",
+                    models.PositiveIntegerField(verbose_name="Best streak"),
+                ),
+                ("reached_at", models.DateField(verbose_name="Reached at")),
+                (
+                    "challenge",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hall_of_fame_entries",
+                        to="main.challenge",
+                        verbose_name="Challenge",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hall_of_fame_entries",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Hall of Fame Entry",
+                "verbose_name_plural": "Hall of Fame Entries",
+                "ordering": ["-best_streak", "reached_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["challenge", "-best_streak", "reached_at"],
+                        name="main_hof_challenge_streak_idx",
+                    )
+                ],
+                "unique_together": {("user", "challenge")},
+            },
+        ),
+        migrations.RunPython(populate_hall_of_fame, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-19 05:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0023_halloffameentry"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userchallengecompletion",
+            index=models.Index(
+                fields=["user_challenge", "completed_at"],
+                name="main_uc_completion_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersuperchallengecompletion",
+            index=models.Index(
+                fields=["user_super_challenge", "completed_at"],
+                name="main_usc_completion_date_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0024_completion_calendar_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserCalendarState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "seq",
+                    models.PositiveBigIntegerField(default=0, verbose_name="Sequence"),
+                ),
+                (
+                    "reset_seq",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        help_text="Sequence of the last completion deletion. Clients that synced before it have to reload the calendar.",
+                        verbose_name="Reset sequence",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "User Calendar State",
+                "verbose_name_plural": "User Calendar States",
+            },
+        ),
+        migrations.AddField(
+            model_name="userchallengecompletion",
+            name="change_seq",
+            field=models.PositiveBigIntegerField(
+                default=0, editable=False, verbose_name="Change sequence"
+            ),
+        ),
+        migrations.AddField(
+            model_name="usersuperchallengecompletion",
+            name="change_seq",
+            field=models.PositiveBigIntegerField(
+                default=0, editable=False, verbose_name="Change sequence"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userchallengecompletion",
+            index=models.Index(
+                fields=["user_challenge", "change_seq"],
+                name="main_uc_completion_seq_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersuperchallengecompletion",
+            index=models.Index(
+                fields=["user_super_challenge", "change_seq"],
+                name="main_usc_completion_seq_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="usercalendarstate",
+            name="user",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="calendar_state",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="User",
+            ),
+        ),
+    ]
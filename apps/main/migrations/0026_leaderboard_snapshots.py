@@ -0,0 +1,127 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0025_calendar_sync"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("challenge", "Challenge"),
+                            ("super_challenge", "Super Challenge"),
+                        ],
+                        max_length=20,
+                        verbose_name="Kind",
+                    ),
+                ),
+                (
+                    "object_id",
+                    models.PositiveIntegerField(
+                        verbose_name="Challenge or super challenge id"
+                    ),
+                ),
+                ("date", models.DateField(verbose_name="Date")),
+                (
+                    "is_final",
+                    models.BooleanField(default=False, verbose_name="Is final"),
+                ),
+                (
+                    "total",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Total entries"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Leaderboard Snapshot",
+                "verbose_name_plural": "Leaderboard Snapshots",
+                "ordering": ["-date"],
+                "indexes": [
+                    models.Index(
+                        fields=["kind", "object_id", "-date"],
+                        name="main_lb_snapshot_latest_idx",
+                    )
+                ],
+                "unique_together": {("kind", "object_id", "date")},
+            },
+        ),
+        migrations.CreateModel(
+            name="LeaderboardSnapshotEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.PositiveIntegerField(verbose_name="Rank")),
+                (
+                    "highest_streak",
+                    models.PositiveIntegerField(verbose_name="Highest streak"),
+                ),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="main.leaderboardsnapshot",
+                        verbose_name="Snapshot",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_snapshot_entries",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Leaderboard Snapshot Entry",
+                "verbose_name_plural": "Leaderboard Snapshot Entries",
+                "ordering": ["rank"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("snapshot", "rank"), name="main_lb_entry_rank_uniq"
+                    ),
+                    models.UniqueConstraint(
+                        fields=("snapshot", "user"), name="main_lb_entry_user_uniq"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0026_leaderboard_snapshots"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userchallenge",
+            index=models.Index(
+                condition=models.Q(("highest_streak__gt", 0)),
+                fields=["challenge", "-highest_streak", "last_completion_date", "user"],
+                name="main_uc_leaderboard_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usersuperchallenge",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=[
+                    "super_challenge",
+                    "-highest_streak",
+                    "last_completion_date",
+                    "user",
+                ],
+                name="main_usc_leaderboard_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_user_stats(apps, schema_editor):
+    UserChallenge = apps.get_model("main", "UserChallenge")
+    UserStats = apps.get_model("main", "UserStats")
+
+    totals = (
+        UserChallenge.objects.values("user_id")
+        .annotate(
+            total_current_streak=models.Sum(
+                "current_streak", filter=models.Q(is_active=True), default=0
+            ),
+            total_completions=models.Sum("total_completions", default=0),
+        )
+        .order_by()
+    )
+    UserStats.objects.bulk_create(
+        (UserStats(**row) for row in totals.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0027_leaderboard_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "total_current_streak",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Sum of the current streaks of the active challenges",
+                        verbose_name="Total current streak",
+                    ),
+                ),
+                (
+                    "total_completions",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Total completions"
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "User Stats",
+                "verbose_name_plural": "User Stats",
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("total_current_streak__gt", 0)),
+                        fields=["-total_current_streak", "user"],
+                        name="main_stats_streak_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("total_completions__gt", 0)),
+                        fields=["-total_completions", "user"],
+                        name="main_stats_completions_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -8,6 +9,9 @@ from apps.common.models import BaseModel
 
 User = get_user_model()
 
+# Streak length that earns an award and a place in the hall of fame
+HALL_OF_FAME_MIN_STREAK = 30
+
 
 class Challenge(BaseModel):
     title = models.CharField(_("Title"), max_length=255)
@@ -43,6 +47,10 @@ class Challenge(BaseModel):
         verbose_name_plural = _("Challenges")
 
 
+# UserChallenge fields that UserStats totals
+USER_STATS_FIELDS = {"current_streak", "total_completions", "is_active"}
+
+
 class UserChallenge(BaseModel):
     user = models.ForeignKey(
         User,
@@ -69,9 +77,39 @@ class UserChallenge(BaseModel):
     class Meta:
         unique_together = ["user", "challenge"]
         ordering = ["-current_streak", "-highest_streak"]
+        indexes = [
+            # Leaderboard order of ordered_leaderboard_queryset, partial on
+            # the rows that are ranked
+            models.Index(
+                fields=["challenge", "-highest_streak", "last_completion_date", "user"],
+                condition=models.Q(highest_streak__gt=0),
+                name="main_uc_leaderboard_idx",
+            ),
+        ]
         verbose_name = _("User Challenge")
         verbose_name_plural = _("User Challenges")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the stored row adds to UserStats, so saves apply the
+        # difference instead of recomputing the totals
+        if USER_STATS_FIELDS.issubset(instance.__dict__):
+            instance._counted_stats = instance.stats_contribution()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if USER_STATS_FIELDS.issubset(self.__dict__):
+            self._counted_stats = self.stats_contribution()
+
+    def stats_contribution(self):
+        """
+        (current streak, completions) the participation adds to the user's
+        UserStats totals
+        """
+        return self.current_streak if self.is_active else 0, self.total_completions
+
     def has_failed(self):
         """
         Check if the challenge has failed based on the conditions:
@@ -143,7 +181,7 @@ class UserChallenge(BaseModel):
         """
         Check if user has achieved 30-day streak and give award if eligible
         """
-        if self.highest_streak >= 30 and not self.has_award:
+        if self.highest_streak >= HALL_OF_FAME_MIN_STREAK and not self.has_award:
             # Create award for the user
             challenge_award, created = ChallengeAward.objects.get_or_create(
                 challenge=self.challenge
@@ -156,6 +194,34 @@ class UserChallenge(BaseModel):
             return True
         return False
 
+    def update_hall_of_fame(self):
+        """
+        Record the user's best streak in the challenge hall of fame.
+        The entry only ever moves up, so a broken streak keeps its place.
+        """
+        if self.highest_streak < HALL_OF_FAME_MIN_STREAK:
+            return
+
+        # The highest streak grows together with the current one, so the last
+        # completion date is the day the best streak was reached
+        reached_at = self.last_completion_date or timezone.now().date()
+
+        updated = HallOfFameEntry.objects.filter(
+            user_id=self.user_id,
+            challenge_id=self.challenge_id,
+            best_streak__lt=self.highest_streak,
+        ).update(
+            best_streak=self.highest_streak,
+            reached_at=reached_at,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            HallOfFameEntry.objects.get_or_create(
+                user_id=self.user_id,
+                challenge_id=self.challenge_id,
+                defaults={"best_streak": self.highest_streak, "reached_at": reached_at},
+            )
+
     def delete(self, *args, **kwargs):
         """
         Override delete to deactivate instead of deleting
@@ -247,6 +313,132 @@ class UserChallenge(BaseModel):
         self.save()
 
 
+class UserCalendarState(BaseModel):
+    """
+    Per-user change counter of the calendars. Every saved challenge or super
+    challenge completion takes the next value as its `change_seq`, so clients
+    can ask for the completions changed since the last value they saw.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="calendar_state",
+        verbose_name=_("User"),
+    )
+    seq = models.PositiveBigIntegerField(_("Sequence"), default=0)
+    reset_seq = models.PositiveBigIntegerField(
+        _("Reset sequence"),
+        default=0,
+        help_text=_(
+            "Sequence of the last completion deletion. Clients that synced "
+            "before it have to reload the calendar."
+        ),
+    )
+
+    class Meta:
+        verbose_name = _("User Calendar State")
+        verbose_name_plural = _("User Calendar States")
+
+    @classmethod
+    def next_seq(cls, user_id, reset=False):
+        """
+        Increment the user's counter and return the new value. The row stays
+        locked until the transaction commits, so changes become visible in
+        sequence order.
+        """
+        with transaction.atomic():
+            cls.objects.get_or_create(user_id=user_id)
+            fields = {"seq": models.F("seq") + 1, "updated_at": timezone.now()}
+            if reset:
+                fields["reset_seq"] = models.F("seq") + 1
+            cls.objects.filter(user_id=user_id).update(**fields)
+            return cls.objects.values_list("seq", flat=True).get(user_id=user_id)
+
+    @classmethod
+    def current(cls, user_id):
+        """
+        (seq, reset_seq) of the user
+        """
+        return cls.objects.filter(user_id=user_id).values_list(
+            "seq", "reset_seq"
+        ).first() or (0, 0)
+
+
+class UserStats(BaseModel):
+    """
+    Totals of a user across all their challenges, updated by the change
+    whenever one of their user challenges is saved or deleted. Backs the
+    global leaderboard.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="stats",
+        verbose_name=_("User"),
+    )
+    total_current_streak = models.PositiveIntegerField(
+        _("Total current streak"),
+        default=0,
+        help_text=_("Sum of the current streaks of the active challenges"),
+    )
+    total_completions = models.PositiveIntegerField(_("Total completions"), default=0)
+
+    class Meta:
+        indexes = [
+            # Global leaderboard orders, partial on the rows that are ranked
+            models.Index(
+                fields=["-total_current_streak", "user"],
+                condition=models.Q(total_current_streak__gt=0),
+                name="main_stats_streak_idx",
+            ),
+            models.Index(
+                fields=["-total_completions", "user"],
+                condition=models.Q(total_completions__gt=0),
+                name="main_stats_completions_idx",
+            ),
+        ]
+        verbose_name = _("User Stats")
+        verbose_name_plural = _("User Stats")
+
+    def __str__(self):
+        return f"{self.user} ({self.total_current_streak}, {self.total_completions})"
+
+    @classmethod
+    def refresh(cls, user_id):
+        """
+        Recompute the user's totals from their user challenges. Reads only
+        the user's own rows, one per joined challenge. Repairs totals that
+        missed changes (queryset updates bypass the signals).
+        """
+        totals = UserChallenge.objects.filter(user_id=user_id).aggregate(
+            total_current_streak=models.Sum(
+                "current_streak", filter=models.Q(is_active=True), default=0
+            ),
+            total_completions=models.Sum("total_completions", default=0),
+        )
+        stats, _ = cls.objects.update_or_create(user_id=user_id, defaults=totals)
+        return stats
+
+    @classmethod
+    def add(cls, user_id, current_streak, completions):
+        """
+        Add a change of one of the user's challenges to their totals in a
+        single UPDATE, recomputing them if the user has no stats yet
+        """
+        if not current_streak and not completions:
+            return
+        updated = cls.objects.filter(user_id=user_id).update(
+            total_current_streak=Greatest(
+                models.F("total_current_streak") + current_streak, 0
+            ),
+            total_completions=Greatest(models.F("total_completions") + completions, 0),
+        )
+        if not updated:
+            cls.refresh(user_id)
+
+
 class UserChallengeCompletion(BaseModel):
     user_challenge = models.ForeignKey(
         UserChallenge,
@@ -256,16 +448,136 @@ class UserChallengeCompletion(BaseModel):
     )
     completed_at = models.DateTimeField(_("Completed at"))
     is_active = models.BooleanField(_("Is Active"), default=True)
+    change_seq = models.PositiveBigIntegerField(
+        _("Change sequence"), default=0, editable=False
+    )
 
     def save(self, *args, **kwargs):
         if not self.completed_at:
             self.completed_at = timezone.localtime()
+        self.change_seq = UserCalendarState.next_seq(self.user_challenge.user_id)
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ["-completed_at"]
         verbose_name = _("User Challenge Completion")
         verbose_name_plural = _("User Challenge Completions")
+        indexes = [
+            # Calendar month / range scans
+            models.Index(
+                fields=["user_challenge", "completed_at"],
+                name="main_uc_completion_date_idx",
+            ),
+            # Calendar delta sync
+            models.Index(
+                fields=["user_challenge", "change_seq"],
+                name="main_uc_completion_seq_idx",
+            ),
+        ]
+
+
+class HallOfFameEntry(BaseModel):
+    """
+    Best streak of a user who has reached the award threshold in a challenge.
+    Maintained by the award engine whenever a user challenge is saved.
+    """
+
+    challenge = models.ForeignKey(
+        Challenge,
+        on_delete=models.CASCADE,
+        related_name="hall_of_fame_entries",
+        verbose_name=_("Challenge"),
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="hall_of_fame_entries",
+        verbose_name=_("User"),
+    )
+    best_streak = models.PositiveIntegerField(_("Best streak"))
+    reached_at = models.DateField(_("Reached at"))
+
+    class Meta:
+        unique_together = ["user", "challenge"]
+        ordering = ["-best_streak", "reached_at"]
+        indexes = [
+            models.Index(
+                fields=["challenge", "-best_streak", "reached_at"],
+                name="main_hof_challenge_streak_idx",
+            )
+        ]
+        verbose_name = _("Hall of Fame Entry")
+        verbose_name_plural = _("Hall of Fame Entries")
+
+    def __str__(self):
+        return f"{self.user} - {self.challenge.title} ({self.best_streak})"
+
+
+class LeaderboardSnapshot(BaseModel):
+    """
+    Standings of a challenge or super challenge leaderboard taken after the
+    nightly streak update. The snapshot taken after a super challenge ends is
+    marked final and never replaced.
+    """
+
+    kind = models.CharField(
+        _("Kind"),
+        max_length=20,
+        choices=[
+            ("challenge", _("Challenge")),
+            ("super_challenge", _("Super Challenge")),
+        ],
+    )
+    object_id = models.PositiveIntegerField(_("Challenge or super challenge id"))
+    date = models.DateField(_("Date"))
+    is_final = models.BooleanField(_("Is final"), default=False)
+    total = models.PositiveIntegerField(_("Total entries"), default=0)
+
+    class Meta:
+        unique_together = ["kind", "object_id", "date"]
+        ordering = ["-date"]
+        indexes = [
+            models.Index(
+                fields=["kind", "object_id", "-date"],
+                name="main_lb_snapshot_latest_idx",
+            ),
+        ]
+        verbose_name = _("Leaderboard Snapshot")
+        verbose_name_plural = _("Leaderboard Snapshots")
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} ({self.date})"
+
+
+class LeaderboardSnapshotEntry(models.Model):
+    snapshot = models.ForeignKey(
+        LeaderboardSnapshot,
+        on_delete=models.CASCADE,
+        related_name="entries",
+        verbose_name=_("Snapshot"),
+    )
+    rank = models.PositiveIntegerField(_("Rank"))
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="leaderboard_snapshot_entries",
+        verbose_name=_("User"),
+    )
+    highest_streak = models.PositiveIntegerField(_("Highest streak"))
+
+    class Meta:
+        ordering = ["rank"]
+        constraints = [
+            # Pages are read as rank ranges, "my rank" by user
+            models.UniqueConstraint(
+                fields=["snapshot", "rank"], name="main_lb_entry_rank_uniq"
+            ),
+            models.UniqueConstraint(
+                fields=["snapshot", "user"], name="main_lb_entry_user_uniq"
+            ),
+        ]
+        verbose_name = _("Leaderboard Snapshot Entry")
+        verbose_name_plural = _("Leaderboard Snapshot Entries")
 
 
 class ChallengeAward(BaseModel):
@@ -364,6 +676,20 @@ class UserSuperChallenge(BaseModel):
     class Meta:
         unique_together = ["user", "super_challenge"]
         ordering = ["-current_streak", "-highest_streak"]
+        indexes = [
+            # Leaderboard order of ordered_leaderboard_queryset, partial on
+            # the rows that are ranked
+            models.Index(
+                fields=[
+                    "super_challenge",
+                    "-highest_streak",
+                    "last_completion_date",
+                    "user",
+                ],
+                condition=models.Q(is_active=True),
+                name="main_usc_leaderboard_idx",
+            ),
+        ]
         verbose_name = _("User Super Challenge")
         verbose_name_plural = _("User Super Challenges")
 
@@ -818,16 +1144,31 @@ class UserSuperChallengeCompletion(BaseModel):
     )
     completed_at = models.DateTimeField(_("Completed at"))
     is_active = models.BooleanField(_("Is Active"), default=True)
+    change_seq = models.PositiveBigIntegerField(
+        _("Change sequence"), default=0, editable=False
+    )
 
     def save(self, *args, **kwargs):
         if not self.completed_at:
             self.completed_at = timezone.localtime()
+        self.change_seq = UserCalendarState.next_seq(self.user_super_challenge.user_id)
         super().save(*args, **kwargs)
 
     class Meta:
         ordering = ["-completed_at"]
         verbose_name = _("User Super Challenge Completion")
         verbose_name_plural = _("User Super Challenge Completions")
+        indexes = [
+            # Calendar month / range scans
+            models.Index(
+                fields=["user_super_challenge", "completed_at"],
+                name="main_usc_completion_date_idx",
+            ),
+            models.Index(
+                fields=["user_super_challenge", "change_seq"],
+                name="main_usc_completion_seq_idx",
+            ),
+        ]
 
 
 class SuperChallengeAward(BaseModel):
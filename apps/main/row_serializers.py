@@ -0,0 +1,187 @@
+"""
+Fast serialization path for the hot list endpoints.
+
+The functions below build response dicts straight from `.values()` rows,
+skipping ModelSerializer instantiation and field introspection. Their
+output matches the corresponding serializers in `apps.main.serializers`
+field for field, so the endpoints keep the same response format.
+"""
+import bisect
+import datetime
+
+from django.utils import timezone
+
+from apps.common.media import media_url
+from apps.main.serializers import ChallengeListSerializer
+from apps.users.cards import get_user_cards, render_user_card
+
+CHALLENGE_LIST_FIELDS = ChallengeListSerializer.Meta.fields
+
+USER_CHALLENGE_LIST_FIELDS = (
+    "id",
+    "challenge_id",
+    "current_streak",
+    "highest_streak",
+    "total_completions",
+    "last_completion_date",
+    "started_at",
+)
+
+# Leaderboard rows carry the user id only, the user cards come from the
+# card cache (see `serialize_leaderboard_entries`)
+LEADERBOARD_FIELDS = ("user_id", "highest_streak")
+
+GLOBAL_LEADERBOARD_FIELDS = ("user_id", "total_current_streak", "total_completions")
+
+
+def format_datetime(value):
+    """
+    Same output as serializers.DateTimeField: ISO 8601 in the current timezone.
+    """
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def format_date(value):
+    """
+    Same output as serializers.DateField and serializers.TimeField.
+    """
+    return value.isoformat() if value is not None else None
+
+
+def serialize_challenge(row, request):
+    """
+    Challenge `.values(*CHALLENGE_LIST_FIELDS)` row -> ChallengeListSerializer
+    """
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "icon": media_url(row["icon"], request),
+        "video_instruction_url": row["video_instruction_url"],
+        "video_instruction_title": row["video_instruction_title"],
+        "start_time": format_date(row["start_time"]),
+        "end_time": format_date(row["end_time"]),
+        "created_at": format_datetime(row["created_at"]),
+        "updated_at": format_datetime(row["updated_at"]),
+        "rules": row["rules"],
+    }
+
+
+def serialize_user_challenge(row, challenge):
+    """
+    UserChallenge `.values(*USER_CHALLENGE_LIST_FIELDS)` row and its already
+    serialized challenge -> UserChallengeListSerializer
+    """
+    return {
+        "id": row["id"],
+        "challenge": challenge,
+        "current_streak": row["current_streak"],
+        "highest_streak": row["highest_streak"],
+        "total_completions": row["total_completions"],
+        "last_completion_date": format_date(row["last_completion_date"]),
+        "started_at": format_datetime(row["started_at"]),
+    }
+
+
+def serialize_leaderboard_entries(rows, request, fields=("highest_streak",)):
+    """
+    Leaderboard rows (a "user_id" and `fields`) -> ChallengeLeaderboardSerializer,
+    SuperChallengeLeaderboardSerializer or GlobalLeaderboardSerializer entries.
+
+    The user cards of the page are read with one cache multi-get. Rows of
+    users deleted since the rows were read are left out.
+    """
+    cards = get_user_cards([row["user_id"] for row in rows])
+    entries = []
+    for row in rows:
+        card = cards.get(row["user_id"])
+        if card is None:
+            continue
+        entry = {"user": render_user_card(row["user_id"], card, request)}
+        for field in fields:
+            entry[field] = row[field]
+        entries.append(entry)
+    return entries
+
+
+class DayKeys:
+    """
+    Maps completion datetimes in [start, end) to their local ISO date.
+
+    The local midnights of the range are computed once, so each completion
+    costs a binary search instead of a timezone conversion and isoformat().
+    """
+
+    def __init__(self, start, end):
+        current_timezone = timezone.get_current_timezone()
+        day = timezone.localtime(start).date()
+        last_day = timezone.localtime(end).date()
+
+        self.keys = []
+        self.boundaries = []
+        while day <= last_day:
+            self.keys.append(day.isoformat())
+            self.boundaries.append(
+                datetime.datetime.combine(day, datetime.time(), current_timezone)
+            )
+            day += datetime.timedelta(days=1)
+
+    def __call__(self, value):
+        index = bisect.bisect_right(self.boundaries, value) - 1
+        if 0 <= index < len(self.keys) - 1:
+            return self.keys[index]
+        # Outside of the range, only possible for rows that weren't filtered
+        return timezone.localtime(value).date().isoformat()
+
+
+def group_completion_dates(rows, day_keys):
+    """
+    `(participation_id, completed_at)` rows -> {participation_id: [dates]}
+    """
+    dates = {}
+    for participation_id, completed_at in rows:
+        key = day_keys(completed_at)
+        if participation_id in dates:
+            dates[participation_id].append(key)
+        else:
+            dates[participation_id] = [key]
+    return dates
+
+
+def serialize_calendar_entry(id, title, calendar_icon, completion_dates):
+    """
+    Calendar of one participation, the format of ChallengeCalendarSerializer
+    """
+    return {
+        "id": id,
+        "title": title,
+        "calendar_icon": calendar_icon,
+        "completion_dates": completion_dates,
+    }
+
+
+def serialize_super_challenge_calendar(user_super_challenges, dates, request):
+    """
+    User super challenges (with `super_challenge` selected) and their grouped
+    completion dates -> the `calendar_data` of AllSuperChallengesCalendarAPIView
+    """
+    result = []
+    for user_super_challenge in user_super_challenges:
+        super_challenge = user_super_challenge.super_challenge
+        entry = serialize_calendar_entry(
+            user_super_challenge.id,
+            super_challenge.title,
+            media_url(super_challenge.calendar_icon, request),
+            dates.get(user_super_challenge.id, []),
+        )
+        entry["current_streak"] = user_super_challenge.current_streak
+        entry["highest_streak"] = user_super_challenge.highest_streak
+        entry["total_completions"] = user_super_challenge.total_completions
+        entry["start_date"] = format_date(super_challenge.start_date)
+        entry["end_date"] = format_date(super_challenge.end_date)
+        result.append(entry)
+    return result
@@ -1,20 +1,29 @@
+from django.db import models
 from django.utils import timezone
 from rest_framework import serializers
 
+from apps.common.media import media_url
+from apps.common.serializers import MediaURLField
+from apps.main.calendar import completed_in, month_range
 from apps.main.models import (
     Challenge,
     ChallengeAward,
+    HallOfFameEntry,
     SuperChallenge,
     SuperChallengeAward,
     UserChallenge,
     UserChallengeCompletion,
+    UserStats,
     UserSuperAward,
     UserSuperChallenge,
     UserSuperChallengeCompletion,
 )
+from apps.users.cards import get_user_cards, render_user_card
 
 
 class ChallengeListSerializer(serializers.ModelSerializer):
+    icon = MediaURLField()
+
     class Meta:
         model = Challenge
         fields = (
@@ -146,13 +155,7 @@ class ChallengeCalendarSerializer(serializers.ModelSerializer):
 
     def get_calendar_icon(self, obj):
         request = self.context.get("request")
-        if obj.challenge.calendar_icon:
-            return request.build_absolute_uri(obj.challenge.calendar_icon.url)
-        return (
-            request.build_absolute_uri(obj.challenge.icon.url)
-            if obj.challenge.icon
-            else None
-        )
+        return media_url(obj.challenge.calendar_icon or obj.challenge.icon, request)
 
     def get_completion_dates(self, obj):
         request = self.context.get("request")
@@ -171,9 +174,7 @@ class ChallengeCalendarSerializer(serializers.ModelSerializer):
 
         # Fallback to database query if prefetch didn't happen
         completions = UserChallengeCompletion.objects.filter(
-            user_challenge=obj,
-            completed_at__year=year,
-            completed_at__month=month,
+            user_challenge=obj, **completed_in(*month_range(year, month))
         ).values_list("completed_at", flat=True)
 
         return [
@@ -196,21 +197,19 @@ class AllChallengesCalendarSerializer(serializers.Serializer):
         # Process all completions from prefetched data
         for user_challenge in user_challenges:
             challenge = user_challenge.challenge
-            icon_url = None
-            if challenge.calendar_icon:
-                icon_url = request.build_absolute_uri(challenge.calendar_icon.url)
-            elif challenge.icon:
-                icon_url = request.build_absolute_uri(challenge.icon.url)
-
             challenge_info = {
                 "title": challenge.title,
-                "calendar_icon": icon_url,
+                "calendar_icon": media_url(
+                    challenge.calendar_icon or challenge.icon, request
+                ),
             }
 
             # Use prefetched completions
             if hasattr(user_challenge, "_prefetched_completions"):
                 for completion in user_challenge._prefetched_completions:
-                    date_str = completion.completed_at.date().isoformat()
+                    date_str = (
+                        timezone.localtime(completion.completed_at).date().isoformat()
+                    )
                     if date_str not in dates_dict:
                         dates_dict[date_str] = {"date": date_str, "challenges": []}
                     dates_dict[date_str]["challenges"].append(challenge_info)
@@ -220,7 +219,46 @@ class AllChallengesCalendarSerializer(serializers.Serializer):
         return result
 
 
-class ChallengeLeaderboardSerializer(serializers.ModelSerializer):
+class UserCardListSerializer(serializers.ListSerializer):
+    """
+    Reads the user cards of all the items with one cache multi-get before
+    they are serialized. The cards are kept in the context, so nested
+    serializers sharing it don't fetch them again.
+    """
+
+    def to_representation(self, data):
+        items = list(
+            data.all() if isinstance(data, models.manager.BaseManager) else data
+        )
+        prime_user_cards(self.context, [item.user_id for item in items])
+        return super().to_representation(items)
+
+
+class UserCardSerializerMixin:
+    """
+    `user` rendered from the cached user card (see apps.users.cards)
+    """
+
+    def get_user(self, obj):
+        cards = self.context.get("user_cards") or {}
+        card = cards.get(obj.user_id)
+        if card is None:
+            card = get_user_cards([obj.user_id]).get(obj.user_id)
+            if card is None:
+                return None
+        return render_user_card(obj.user_id, card, self.context.get("request"))
+
+
+def prime_user_cards(context, user_ids):
+    cards = context.setdefault("user_cards", {})
+    missing = set(user_ids) - cards.keys()
+    if missing:
+        cards.update(get_user_cards(missing))
+
+
+class ChallengeLeaderboardSerializer(
+    UserCardSerializerMixin, serializers.ModelSerializer
+):
     user = serializers.SerializerMethodField()
     highest_streak = serializers.IntegerField()
 
@@ -230,53 +268,70 @@ class ChallengeLeaderboardSerializer(serializers.ModelSerializer):
             "user",
             "highest_streak",
         )
+        list_serializer_class = UserCardListSerializer
+
+
+class GlobalLeaderboardSerializer(UserCardSerializerMixin, serializers.ModelSerializer):
+    user = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserStats
+        fields = (
+            "user",
+            "total_current_streak",
+            "total_completions",
+        )
+        list_serializer_class = UserCardListSerializer
+
+
+class HallOfFameEntrySerializer(UserCardSerializerMixin, serializers.ModelSerializer):
+    user = serializers.SerializerMethodField()
+    highest_streak = serializers.IntegerField(source="best_streak")
+
+    class Meta:
+        model = HallOfFameEntry
+        fields = (
+            "user",
+            "highest_streak",
+            "reached_at",
+        )
+        list_serializer_class = UserCardListSerializer
 
-    def get_user(self, obj):
-        request = self.context.get("request")
-        user = obj.user
-        return {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "telegram_username": user.telegram_username,
-            "telegram_photo": request.build_absolute_uri(user.telegram_photo.url)
-            if user.telegram_photo
-            else user.telegram_photo_url,
-        }
+
+class Challenge30DaysPlusStreakListSerializer(serializers.ListSerializer):
+    """
+    Reads the user cards of every challenge's leaderboard preview at once
+    """
+
+    def to_representation(self, data):
+        challenges = list(
+            data.all() if isinstance(data, models.manager.BaseManager) else data
+        )
+        prime_user_cards(
+            self.context,
+            [
+                entry.user_id
+                for challenge in challenges
+                for entry in getattr(challenge, "_prefetched_hall_of_fame", [])
+            ],
+        )
+        return super().to_representation(challenges)
 
 
 class Challenge30DaysPlusStreakSerializer(serializers.ModelSerializer):
+    icon = MediaURLField()
     leaderboard = serializers.SerializerMethodField()
 
     class Meta:
         model = Challenge
         fields = ("id", "title", "icon", "leaderboard", "created_at")
+        list_serializer_class = Challenge30DaysPlusStreakListSerializer
 
     def get_leaderboard(self, obj):
-        request = self.context.get("request")
-        user_challenges = (
-            UserChallenge.objects.filter(challenge=obj, highest_streak__gte=30)
-            .select_related("user")
-            .order_by("-highest_streak")
-        )
-
-        return [
-            {
-                "user": {
-                    "id": uc.user.id,
-                    "first_name": uc.user.first_name,
-                    "last_name": uc.user.last_name,
-                    "telegram_username": uc.user.telegram_username,
-                    "telegram_photo": request.build_absolute_uri(
-                        uc.user.telegram_photo.url
-                    )
-                    if uc.user.telegram_photo
-                    else uc.user.telegram_photo_url,
-                },
-                "highest_streak": uc.highest_streak,
-            }
-            for uc in user_challenges
-        ]
+        # Only the top of the hall of fame is prefetched, the full list is
+        # served page by page by the hall of fame endpoint
+        entries = getattr(obj, "_prefetched_hall_of_fame", [])
+        return HallOfFameEntrySerializer(entries, many=True, context=self.context).data
 
 
 class ChallengeAwardSerializer(serializers.ModelSerializer):
@@ -295,10 +350,7 @@ class ChallengeAwardSerializer(serializers.ModelSerializer):
         )
 
     def get_award_icon(self, obj):
-        request = self.context.get("request")
-        if obj.challenge.award_icon:
-            return request.build_absolute_uri(obj.challenge.award_icon.url)
-        return None
+        return media_url(obj.challenge.award_icon, self.context.get("request"))
 
     def get_is_user_awarded(self, obj):
         return bool(getattr(obj, "_prefetched_user_awards", []))
@@ -380,6 +432,7 @@ class UserChallengeDetailSerializer(UserChallengeListSerializer):
 
 
 class SuperChallengeListSerializer(serializers.ModelSerializer):
+    icon = MediaURLField()
     challenges_count = serializers.SerializerMethodField()
     is_failed = serializers.SerializerMethodField()
     is_failed_reason = serializers.SerializerMethodField()
@@ -592,10 +645,7 @@ class SuperChallengeCalendarSerializer(serializers.ModelSerializer):
         )
 
     def get_calendar_icon(self, obj):
-        request = self.context.get("request")
-        if obj.super_challenge.calendar_icon:
-            return request.build_absolute_uri(obj.super_challenge.calendar_icon.url)
-        return None
+        return media_url(obj.super_challenge.calendar_icon, self.context.get("request"))
 
     def get_completion_dates(self, obj):
         request = self.context.get("request")
@@ -614,9 +664,7 @@ class SuperChallengeCalendarSerializer(serializers.ModelSerializer):
 
         # Fallback to database query if prefetch didn't happen
         completions = UserSuperChallengeCompletion.objects.filter(
-            user_super_challenge=obj,
-            completed_at__year=year,
-            completed_at__month=month,
+            user_super_challenge=obj, **completed_in(*month_range(year, month))
         ).values_list("completed_at", flat=True)
 
         return [
@@ -625,27 +673,6 @@ class SuperChallengeCalendarSerializer(serializers.ModelSerializer):
         ]
 
 
-class AllSuperChallengesCalendarSerializer(serializers.Serializer):
-    calendar_data = serializers.SerializerMethodField()
-
-    def get_calendar_data(self, obj):
-        request = self.context.get("request")
-        month = self.context.get("month")
-        year = self.context.get("year")
-
-        user_super_challenges = obj.get("user_super_challenges", [])
-
-        result = []
-        for user_super_challenge in user_super_challenges:
-            serializer = SuperChallengeCalendarSerializer(
-                user_super_challenge,
-                context={"request": request, "month": month, "year": year},
-            )
-            result.append(serializer.data)
-
-        return result
-
-
 class SuperChallengeAwardSerializer(serializers.ModelSerializer):
     super_challenge_title = serializers.CharField(
         source="super_challenge.title", read_only=True
@@ -663,10 +690,10 @@ class SuperChallengeAwardSerializer(serializers.ModelSerializer):
         )
 
     def get_award_icon(self, obj):
-        request = self.context.get("request")
-        return (
-            request.build_absolute_uri(obj.award_icon.url) if obj.award_icon else None
-        )
+        # The super challenge is nullable
+        if obj.super_challenge_id is None:
+            return None
+        return media_url(obj.super_challenge.award_icon, self.context.get("request"))
 
     def get_is_user_awarded(self, obj):
         request = self.context.get("request")
@@ -675,7 +702,9 @@ class SuperChallengeAwardSerializer(serializers.ModelSerializer):
         ).exists()
 
 
-class SuperChallengeLeaderboardSerializer(serializers.ModelSerializer):
+class SuperChallengeLeaderboardSerializer(
+    UserCardSerializerMixin, serializers.ModelSerializer
+):
     user = serializers.SerializerMethodField()
     highest_streak = serializers.IntegerField()
 
@@ -685,22 +714,4 @@ class SuperChallengeLeaderboardSerializer(serializers.ModelSerializer):
             "user",
             "highest_streak",
         )
-
-    def get_user(self, obj):
-        request = self.context.get("request")
-        user = obj.user
-
-        # Prepare photo URL only once
-        photo_url = None
-        if user.telegram_photo:
-            photo_url = request.build_absolute_uri(user.telegram_photo.url)
-        else:
-            photo_url = user.telegram_photo_url
-
-        return {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "telegram_username": user.telegram_username,
-            "telegram_photo": photo_url,
-        }
+        list_serializer_class = UserCardListSerializer
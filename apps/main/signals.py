@@ -1,7 +1,33 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from apps.main.models import Challenge, ChallengeAward, UserAward, UserChallenge
+from apps.common.cache import bump_catalog_version, bump_user_version
+from apps.main.cache import (
+    CHALLENGES_CALENDAR,
+    SUPER_CHALLENGES_CALENDAR,
+    invalidate_calendar_month,
+)
+from apps.main.leaderboards import (
+    CHALLENGE,
+    SUPER_CHALLENGE,
+    is_ranked,
+    leaderboard_score,
+    sync_participation,
+)
+from apps.main.models import (
+    HALL_OF_FAME_MIN_STREAK,
+    USER_STATS_FIELDS,
+    Challenge,
+    ChallengeAward,
+    SuperChallenge,
+    User,
+    UserCalendarState,
+    UserChallenge,
+    UserChallengeCompletion,
+    UserStats,
+    UserSuperChallenge,
+    UserSuperChallengeCompletion,
+)
 
 
 @receiver(post_save, sender=Challenge)
@@ -10,10 +36,146 @@ def create_challenge_award(sender, instance, created, **kwargs):
         ChallengeAward.objects.get_or_create(challenge=instance)
 
 
+@receiver(post_save, sender=Challenge)
+@receiver(post_delete, sender=Challenge)
+@receiver(post_save, sender=SuperChallenge)
+@receiver(post_delete, sender=SuperChallenge)
+def invalidate_catalog(sender, **kwargs):
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=SuperChallenge.challenges.through)
+def invalidate_catalog_on_challenges_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_catalog_version()
+
+
 @receiver(post_save, sender=UserChallenge)
 def check_and_award_user(sender, instance, **kwargs):
-    if instance.highest_streak >= 30:
-        # Try to create the award for the user if they don't have it already
-        UserAward.objects.get_or_create(
-            user=instance.user, award=instance.challenge.award
+    if instance.highest_streak >= HALL_OF_FAME_MIN_STREAK:
+        # Give the award if the user doesn't have it already
+        instance.check_and_award_if_eligible()
+        # Keep the hall of fame in sync with the user's best streak
+        instance.update_hall_of_fame()
+
+
+@receiver(post_save, sender=UserChallenge)
+@receiver(post_delete, sender=UserChallenge)
+@receiver(post_save, sender=UserSuperChallenge)
+@receiver(post_delete, sender=UserSuperChallenge)
+def bump_participation_user_version(sender, instance, **kwargs):
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=UserChallenge)
+@receiver(post_delete, sender=UserChallenge)
+@receiver(post_save, sender=UserSuperChallenge)
+@receiver(post_delete, sender=UserSuperChallenge)
+def sync_leaderboard(sender, instance, signal, **kwargs):
+    if sender is UserChallenge:
+        kind, id = CHALLENGE, instance.challenge_id
+    else:
+        kind, id = SUPER_CHALLENGE, instance.super_challenge_id
+
+    score = None
+    if signal is post_save and is_ranked(kind, instance):
+        score = leaderboard_score(
+            instance.highest_streak, instance.last_completion_date
         )
+    sync_participation(kind, id, instance.user_id, score)
+
+
+@receiver(post_save, sender=UserChallenge)
+@receiver(post_delete, sender=UserChallenge)
+def sync_user_stats(
+    sender, instance, signal, created=False, update_fields=None, origin=None, **kwargs
+):
+    # Nothing to do when the whole user is being deleted
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    if update_fields is not None and not USER_STATS_FIELDS & update_fields:
+        return
+
+    if created:
+        counted = (0, 0)
+    elif update_fields is not None and not USER_STATS_FIELDS <= update_fields:
+        # Only part of the totalled fields was saved
+        counted = None
+    else:
+        # Set when the instance was loaded or last saved
+        counted = getattr(instance, "_counted_stats", None)
+    if counted is None:
+        # What the row added before is unknown
+        UserStats.refresh(instance.user_id)
+        instance.__dict__.pop("_counted_stats", None)
+        return
+
+    contribution = (0, 0) if signal is post_delete else instance.stats_contribution()
+    UserStats.add(
+        instance.user_id,
+        contribution[0] - counted[0],
+        contribution[1] - counted[1],
+    )
+    instance._counted_stats = contribution
+
+
+@receiver(post_save, sender=UserChallengeCompletion)
+@receiver(post_delete, sender=UserChallengeCompletion)
+def bump_completion_user_version(sender, instance, **kwargs):
+    bump_user_version(instance.user_challenge.user_id)
+
+
+@receiver(post_save, sender=UserSuperChallengeCompletion)
+@receiver(post_delete, sender=UserSuperChallengeCompletion)
+def bump_super_completion_user_version(sender, instance, **kwargs):
+    bump_user_version(instance.user_super_challenge.user_id)
+
+
+@receiver(post_delete, sender=UserChallengeCompletion)
+@receiver(post_delete, sender=UserSuperChallengeCompletion)
+def reset_calendar_sync(sender, instance, origin=None, **kwargs):
+    # Deleted rows can't be sent as changes, so clients that synced before
+    # the deletion reload the calendar. Nothing to do when the whole user is
+    # being deleted.
+    if isinstance(origin, User) or getattr(origin, "model", None) is User:
+        return
+    if sender is UserChallengeCompletion:
+        user_id = instance.user_challenge.user_id
+    else:
+        user_id = instance.user_super_challenge.user_id
+    UserCalendarState.next_seq(user_id, reset=True)
+
+
+@receiver(pre_save, sender=UserChallengeCompletion)
+@receiver(pre_save, sender=UserSuperChallengeCompletion)
+def remember_completed_at(sender, instance, **kwargs):
+    # An edited completion may move to another month, whose cached calendar
+    # has to be dropped as well
+    if not instance._state.adding and instance.pk:
+        instance._previous_completed_at = (
+            sender.objects.filter(pk=instance.pk)
+            .values_list("completed_at", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=UserChallengeCompletion)
+@receiver(post_delete, sender=UserChallengeCompletion)
+def invalidate_challenges_calendar(sender, instance, **kwargs):
+    user_id = instance.user_challenge.user_id
+    for completed_at in {
+        instance.completed_at,
+        getattr(instance, "_previous_completed_at", None),
+    } - {None}:
+        invalidate_calendar_month(CHALLENGES_CALENDAR, user_id, completed_at)
+
+
+@receiver(post_save, sender=UserSuperChallengeCompletion)
+@receiver(post_delete, sender=UserSuperChallengeCompletion)
+def invalidate_super_challenges_calendar(sender, instance, **kwargs):
+    user_id = instance.user_super_challenge.user_id
+    for completed_at in {
+        instance.completed_at,
+        getattr(instance, "_previous_completed_at", None),
+    } - {None}:
+        invalidate_calendar_month(SUPER_CHALLENGES_CALENDAR, user_id, completed_at)
@@ -3,6 +3,7 @@ import logging
 from celery import shared_task
 from django.utils import timezone
 
+from apps.main.leaderboards import snapshot_leaderboards
 from apps.main.models import UserChallenge, UserSuperChallenge
 
 logger = logging.getLogger(__name__)
@@ -64,4 +65,16 @@ def update_all_user_challenge_streaks():
         failed_challenge.calculate_streak_before_failure()
         failed_updated_count += 1
 
+    # Streaks are final for the day, take the leaderboard snapshots
+    take_leaderboard_snapshots.delay()
+
     return f"Updated {updated_count} user challenge streaks and {super_updated_count} super challenge streaks. {super_failed_count} super challenges failed. Updated {failed_updated_count} previously failed challenges."
+
+
+@shared_task
+def take_leaderboard_snapshots():
+    """
+    Snapshot all leaderboards. Queued by update_all_user_challenge_streaks.
+    """
+    count = snapshot_leaderboards()
+    return f"Took {count} leaderboard snapshots"
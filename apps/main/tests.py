@@ -1 +1,770 @@
-# Create your tests here.
+import datetime
+import unittest
+from unittest import mock
+
+import redis
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.common.pagination import keyset_filter
+from apps.common.redis_client import get_redis
+from apps.main import leaderboards
+from apps.main.calendar import make_sync_token
+from apps.main.leaderboards import (
+    CHALLENGE,
+    LEADERBOARD_KEY,
+    LEADERBOARD_KEYSET,
+    LEADERBOARD_PENDING_KEY,
+    LEADERBOARD_READY_KEY,
+    SUPER_CHALLENGE,
+    RedisLeaderboard,
+    global_leaderboard_queryset,
+    ordered_leaderboard_queryset,
+    ranked_ahead_filter,
+    rebuild_leaderboard,
+    sync_participation,
+)
+from apps.main.models import (
+    HALL_OF_FAME_MIN_STREAK,
+    Challenge,
+    HallOfFameEntry,
+    SuperChallenge,
+    UserChallenge,
+    UserChallengeCompletion,
+    UserStats,
+    UserSuperChallenge,
+)
+from apps.main.row_serializers import GLOBAL_LEADERBOARD_FIELDS, LEADERBOARD_FIELDS
+from apps.users.models import User
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql", "EXPLAIN output is PostgreSQL specific"
+)
+class LeaderboardQueryPlanTests(TestCase):
+    """
+    The database leaderboard pages must be read in order from the partial
+    leaderboard indexes instead of sorting every participation.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+        cls.super_challenge = SuperChallenge.objects.create(
+            title="Super Challenge",
+            icon="super_challenge_icons/icon.png",
+            start_date=datetime.date(2025, 1, 1),
+            end_date=datetime.date(2025, 12, 31),
+        )
+        users = User.objects.bulk_create(
+            User(username=f"user{index}") for index in range(50)
+        )
+        last_completion_date = datetime.date(2025, 3, 1)
+        # bulk_create skips the leaderboard signals
+        UserChallenge.objects.bulk_create(
+            UserChallenge(
+                user=user,
+                challenge=cls.challenge,
+                highest_streak=index % 7,
+                last_completion_date=last_completion_date,
+            )
+            for index, user in enumerate(users)
+        )
+        UserSuperChallenge.objects.bulk_create(
+            UserSuperChallenge(
+                user=user,
+                super_challenge=cls.super_challenge,
+                highest_streak=index % 7,
+                last_completion_date=last_completion_date,
+                is_active=index % 5 != 0,
+            )
+            for index, user in enumerate(users)
+        )
+        UserStats.objects.bulk_create(
+            UserStats(
+                user=user, total_current_streak=index % 7, total_completions=index
+            )
+            for index, user in enumerate(users)
+        )
+
+    def explain(self, queryset):
+        # Tiny test tables are cheapest to scan, so make scans that can't
+        # return rows in order unattractive and see whether the index is used
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("SET LOCAL enable_bitmapscan = off")
+        return queryset.explain()
+
+    def assertOrderedByIndex(self, queryset, index_name):
+        plan = self.explain(queryset)
+        self.assertIn(index_name, plan)
+        self.assertNotIn("Sort", plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_challenge_leaderboard_page(self):
+        queryset = ordered_leaderboard_queryset(CHALLENGE, self.challenge.id)
+        self.assertOrderedByIndex(
+            queryset.values(*LEADERBOARD_FIELDS)[:20], "main_uc_leaderboard_idx"
+        )
+
+    def test_super_challenge_leaderboard_page(self):
+        queryset = ordered_leaderboard_queryset(
+            SUPER_CHALLENGE, self.super_challenge.id
+        )
+        self.assertOrderedByIndex(
+            queryset.values(*LEADERBOARD_FIELDS)[:20], "main_usc_leaderboard_idx"
+        )
+
+    def test_leaderboard_snapshot_scan(self):
+        for kind, id, index_name in [
+            (CHALLENGE, self.challenge.id, "main_uc_leaderboard_idx"),
+            (SUPER_CHALLENGE, self.super_challenge.id, "main_usc_leaderboard_idx"),
+        ]:
+            with self.subTest(kind=kind):
+                queryset = ordered_leaderboard_queryset(kind, id)
+                self.assertOrderedByIndex(
+                    queryset.values_list("user_id", "highest_streak"), index_name
+                )
+
+    def test_global_leaderboard_page(self):
+        for order, index_name in [
+            ("streak", "main_stats_streak_idx"),
+            ("completions", "main_stats_completions_idx"),
+        ]:
+            with self.subTest(order=order):
+                queryset = global_leaderboard_queryset(order)
+                self.assertOrderedByIndex(
+                    queryset.values(*GLOBAL_LEADERBOARD_FIELDS)[:20], index_name
+                )
+
+
+class LeaderboardTieOrderTests(TestCase):
+    """
+    The database and the Redis sorted sets must order tied users the same
+    way, by ascending user id, and resume keyset cursors at the same row.
+    """
+
+    # Ids crossing a digit count, where string ordering differs
+    TIED_USER_IDS = [3, 9, 10, 11, 99, 100, 101]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+        users = User.objects.bulk_create(
+            User(id=user_id, username=f"user{user_id}")
+            for user_id in [*cls.TIED_USER_IDS, 5, 50]
+        )
+        tied_date = datetime.date(2025, 3, 1)
+        # bulk_create skips the leaderboard signals
+        UserChallenge.objects.bulk_create(
+            UserChallenge(
+                user=user,
+                challenge=cls.challenge,
+                highest_streak=3,
+                last_completion_date=tied_date,
+            )
+            for user in users
+            if user.id in cls.TIED_USER_IDS
+        )
+        UserChallenge.objects.bulk_create(
+            [
+                UserChallenge(
+                    user_id=5,
+                    challenge=cls.challenge,
+                    highest_streak=4,
+                    last_completion_date=tied_date,
+                ),
+                UserChallenge(
+                    user_id=50,
+                    challenge=cls.challenge,
+                    highest_streak=3,
+                    last_completion_date=None,
+                ),
+            ]
+        )
+        cls.expected_order = [5, *cls.TIED_USER_IDS, 50]
+
+    def setUp(self):
+        try:
+            get_redis().ping()
+        except redis.RedisError:
+            self.redis = False
+        else:
+            self.redis = True
+            self.addCleanup(self.delete_leaderboard)
+
+    def delete_leaderboard(self):
+        get_redis().delete(
+            LEADERBOARD_KEY.format(kind=CHALLENGE, id=self.challenge.id),
+            LEADERBOARD_READY_KEY.format(kind=CHALLENGE, id=self.challenge.id),
+        )
+
+    def skip_without_redis(self):
+        if not self.redis:
+            self.skipTest("Redis is not available")
+
+    def database_rows(self):
+        return list(
+            ordered_leaderboard_queryset(CHALLENGE, self.challenge.id).values(
+                "user_id", "highest_streak", "last_completion_date"
+            )
+        )
+
+    def database_page(self, after, limit):
+        queryset = ordered_leaderboard_queryset(CHALLENGE, self.challenge.id)
+        if after is not None:
+            queryset = queryset.filter(keyset_filter(LEADERBOARD_KEYSET, after))
+        return list(
+            queryset.values("user_id", "highest_streak", "last_completion_date")[:limit]
+        )
+
+    @staticmethod
+    def cursor(row):
+        # The decoded form of the cursor KeysetPagination makes of the row
+        date = row["last_completion_date"]
+        return [
+            row["highest_streak"],
+            date and date.isoformat(),
+            row["user_id"],
+        ]
+
+    def test_database_orders_ties_by_user_id(self):
+        user_ids = [row["user_id"] for row in self.database_rows()]
+        self.assertEqual(user_ids, self.expected_order)
+
+    def test_ranked_ahead_filter_counts_rank(self):
+        queryset = ordered_leaderboard_queryset(CHALLENGE, self.challenge.id)
+        for index, row in enumerate(self.database_rows()):
+            ahead = ranked_ahead_filter(
+                row["highest_streak"], row["last_completion_date"], row["user_id"]
+            )
+            self.assertEqual(queryset.filter(ahead).count(), index)
+
+    def test_redis_orders_ties_like_database(self):
+        self.skip_without_redis()
+        leaderboard = RedisLeaderboard(CHALLENGE, self.challenge.id)
+        self.assertEqual(leaderboard[0:], self.database_rows())
+
+    def test_keyset_pages_match_database(self):
+        self.skip_without_redis()
+        leaderboard = RedisLeaderboard(CHALLENGE, self.challenge.id)
+        after = None
+        user_ids = []
+        while True:
+            page = leaderboard.keyset_page(after, 2)
+            self.assertEqual(page, self.database_page(after, 2))
+            if not page:
+                break
+            user_ids += [row["user_id"] for row in page]
+            after = self.cursor(page[-1])
+        self.assertEqual(user_ids, self.expected_order)
+
+    def test_cursor_of_moved_user_resumes_in_ties(self):
+        self.skip_without_redis()
+        leaderboard = RedisLeaderboard(CHALLENGE, self.challenge.id)
+        page = leaderboard.keyset_page(None, 3)
+        self.assertEqual([row["user_id"] for row in page], [5, 3, 9])
+        after = self.cursor(page[-1])
+
+        # User 9 moves up after the page is read
+        UserChallenge.objects.filter(user_id=9).update(highest_streak=5)
+        rebuild_leaderboard(CHALLENGE, self.challenge.id)
+
+        page = leaderboard.keyset_page(after, 3)
+        self.assertEqual([row["user_id"] for row in page], [10, 11, 99])
+        self.assertEqual(page, self.database_page(after, 3))
+
+
+class LeaderboardSyncTests(TestCase):
+    """
+    Participation updates reach the sorted sets once the transaction
+    commits, without ever failing the request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+        cls.users = User.objects.bulk_create(
+            User(username=f"user{index}") for index in range(3)
+        )
+        # bulk_create skips the leaderboard signals
+        UserChallenge.objects.bulk_create(
+            UserChallenge(
+                user=user,
+                challenge=cls.challenge,
+                highest_streak=index + 1,
+                last_completion_date=datetime.date(2025, 3, 1),
+            )
+            for index, user in enumerate(cls.users)
+        )
+
+    def keys(self):
+        return [
+            key.format(kind=CHALLENGE, id=self.challenge.id)
+            for key in (
+                LEADERBOARD_KEY,
+                LEADERBOARD_READY_KEY,
+                LEADERBOARD_PENDING_KEY,
+            )
+        ]
+
+    def test_update_during_rebuild_is_kept(self):
+        try:
+            get_redis().delete(*self.keys())
+        except redis.RedisError:
+            self.skipTest("Redis is not available")
+        self.addCleanup(lambda: get_redis().delete(*self.keys()))
+
+        participation = UserChallenge.objects.get(user=self.users[0])
+        read_scores = leaderboards.leaderboard_scores
+
+        def read_then_save(kind, id, user_ids=None):
+            scores = read_scores(kind, id, user_ids)
+            if user_ids is None:
+                # The participation is saved after the rows were read
+                participation.highest_streak += 10
+                with self.captureOnCommitCallbacks(execute=True):
+                    participation.save()
+            return scores
+
+        # With no set yet, and replacing a complete one
+        for ready in (False, True):
+            with self.subTest(ready=ready):
+                with mock.patch(
+                    "apps.main.leaderboards.leaderboard_scores", read_then_save
+                ):
+                    rebuild_leaderboard(CHALLENGE, self.challenge.id)
+
+                self.assertFalse(get_redis().exists(self.keys()[2]))
+                rows = RedisLeaderboard(CHALLENGE, self.challenge.id)[0:]
+                self.assertEqual(rows[0]["user_id"], participation.user_id)
+                self.assertEqual(
+                    rows[0]["highest_streak"], participation.highest_streak
+                )
+
+    def test_update_survives_redis_failure(self):
+        client = mock.Mock()
+        client.eval.side_effect = redis.ConnectionError("Connection refused")
+        client.delete.side_effect = redis.ConnectionError("Connection refused")
+
+        with mock.patch("apps.main.leaderboards.get_redis", return_value=client):
+            with self.assertLogs("apps.main.leaderboards", "WARNING"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    sync_participation(CHALLENGE, 1, 1, 10)
+
+        client.delete.assert_called_once_with(
+            LEADERBOARD_READY_KEY.format(kind=CHALLENGE, id=1)
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_PUBLIC_BASE_URL="")
+class CalendarTests(TestCase):
+    """
+    The month calendar is cached per user, month, language and media host,
+    and completion changes invalidate it. Its sync token returns the
+    completions changed since.
+    """
+
+    URL = "/api/v1/main/challenges/calendar/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(telegram_id=1, username="user")
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+        cls.user_challenge = UserChallenge.objects.create(
+            user=cls.user, challenge=cls.challenge
+        )
+        cls.month = datetime.date(2025, 3, 1)
+
+    def setUp(self):
+        cache.clear()
+
+    def complete(self, day):
+        return UserChallengeCompletion.objects.create(
+            user_challenge=self.user_challenge,
+            completed_at=timezone.make_aware(
+                datetime.datetime.combine(self.month.replace(day=day), datetime.time(7))
+            ),
+        )
+
+    def get(self, host="testserver", status=200, **params):
+        params.setdefault("year", self.month.year)
+        params.setdefault("month", self.month.month)
+        response = self.client.get(
+            self.URL, params, HTTP_X_TELEGRAM_ID="1", HTTP_HOST=host
+        )
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def dates(self, data):
+        return sorted(day["date"] for day in data["calendar_data"])
+
+    def test_cached_per_media_host(self):
+        self.complete(5)
+        for host in ["a.example.com", "b.example.com", "a.example.com"]:
+            with self.subTest(host=host):
+                data = self.get(host)
+                icon = data["calendar_data"][0]["challenges"][0]["calendar_icon"]
+                self.assertEqual(icon, f"http://{host}/media/challenge_icons/icon.png")
+
+    def test_completion_invalidates_every_host(self):
+        self.complete(5)
+        for host in ["a.example.com", "b.example.com"]:
+            self.assertEqual(self.dates(self.get(host)), ["2025-03-05"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.complete(9)
+
+        for host in ["a.example.com", "b.example.com"]:
+            with self.subTest(host=host):
+                self.assertEqual(
+                    self.dates(self.get(host)), ["2025-03-05", "2025-03-09"]
+                )
+
+    def test_sync_returns_changes_since_token(self):
+        completion = self.complete(5)
+        token = self.get()["sync_token"]
+
+        added = self.complete(9)
+        completion.is_active = False
+        completion.save()
+
+        data = self.get(since=token)
+        self.assertFalse(data["reset"])
+        self.assertEqual(
+            [(change["id"], change["is_active"]) for change in data["changes"]],
+            [(added.id, True), (completion.id, False)],
+        )
+        self.assertEqual(data["changes"][0]["date"], "2025-03-09")
+
+        data = self.get(since=data["sync_token"])
+        self.assertEqual((data["reset"], data["changes"]), (False, []))
+
+    def test_deletion_resets_sync(self):
+        completion = self.complete(5)
+        token = self.get()["sync_token"]
+
+        UserChallengeCompletion.objects.filter(id=completion.id).delete()
+
+        data = self.get(since=token)
+        self.assertEqual((data["reset"], data["changes"]), (True, []))
+        # The new token syncs normally again
+        data = self.get(since=data["sync_token"])
+        self.assertEqual((data["reset"], data["changes"]), (False, []))
+
+    def test_tampered_token_is_rejected(self):
+        token = self.get()["sync_token"]
+        other_user_token = make_sync_token(self.user.id + 1, 0)
+
+        for since in [token[:-1] + ("A" if token[-1] != "A" else "B"), "x", ""]:
+            with self.subTest(since=since):
+                self.get(since=since, status=400)
+        self.get(since=other_user_token, status=400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    """
+    Catalog and detail endpoints answer a matching If-None-Match with 304,
+    until the data they render changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create(telegram_id=1, username="user")
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, etag=None, host="testserver"):
+        headers = {"HTTP_X_TELEGRAM_ID": "1", "HTTP_HOST": host}
+        if etag is not None:
+            headers["HTTP_IF_NONE_MATCH"] = etag
+        return self.client.get(url, **headers)
+
+    def edit_challenge(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.challenge.title = "Renamed"
+            self.challenge.save()
+
+    def test_matching_etag_is_not_modified(self):
+        for url in [
+            "/api/v1/main/challenges/",
+            f"/api/v1/main/challenges/{self.challenge.id}/",
+        ]:
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response["ETag"]
+
+                response = self.get(url, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(response["ETag"], etag)
+
+    def test_etag_changes_with_the_catalog(self):
+        url = "/api/v1/main/challenges/"
+        etag = self.get(url)["ETag"]
+
+        self.edit_challenge()
+
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["results"][0]["title"], "Renamed")
+
+    def test_etag_changes_with_the_object(self):
+        url = f"/api/v1/main/challenges/{self.challenge.id}/"
+        etag = self.get(url)["ETag"]
+
+        self.edit_challenge()
+
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_differs_per_host(self):
+        url = "/api/v1/main/challenges/"
+        etag = self.get(url, host="a.example.com")["ETag"]
+        response = self.get(url, etag, host="b.example.com")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class HallOfFameTests(TestCase):
+    """
+    Reaching the award streak puts the user in the challenge's hall of fame,
+    where they keep their best streak.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(telegram_id=1, username="user")
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+        cls.user_challenge = UserChallenge.objects.create(
+            user=cls.user, challenge=cls.challenge
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def complete_days(self, days, end):
+        for day in range(days):
+            UserChallengeCompletion.objects.create(
+                user_challenge=self.user_challenge,
+                completed_at=timezone.make_aware(
+                    datetime.datetime.combine(
+                        end - datetime.timedelta(days=day), datetime.time(7)
+                    )
+                ),
+            )
+        self.user_challenge.update_streak(end)
+
+    def test_entry_created_at_the_award_streak(self):
+        today = timezone.localdate()
+        self.complete_days(HALL_OF_FAME_MIN_STREAK - 1, today - datetime.timedelta(1))
+        self.assertFalse(HallOfFameEntry.objects.exists())
+
+        self.complete_days(1, today)
+        entry = HallOfFameEntry.objects.get()
+        self.assertEqual(
+            (entry.user_id, entry.challenge_id, entry.best_streak, entry.reached_at),
+            (self.user.id, self.challenge.id, HALL_OF_FAME_MIN_STREAK, today),
+        )
+
+    def test_entry_keeps_the_best_streak(self):
+        today = timezone.localdate()
+        self.complete_days(HALL_OF_FAME_MIN_STREAK + 2, today)
+        # The streak is broken and a shorter one reaches the threshold again
+        UserChallengeCompletion.objects.filter(
+            user_challenge=self.user_challenge
+        ).delete()
+        self.complete_days(HALL_OF_FAME_MIN_STREAK, today)
+
+        entry = HallOfFameEntry.objects.get()
+        self.assertEqual(entry.best_streak, HALL_OF_FAME_MIN_STREAK + 2)
+
+    def test_hall_of_fame_endpoint(self):
+        self.complete_days(HALL_OF_FAME_MIN_STREAK, timezone.localdate())
+        response = self.client.get(
+            f"/api/v1/main/challenges/{self.challenge.id}/hall-of-fame/",
+            HTTP_X_TELEGRAM_ID="1",
+        )
+        self.assertEqual(response.status_code, 200)
+        [row] = response.json()["results"]
+        self.assertEqual(row["user"]["id"], self.user.id)
+        self.assertEqual(row["highest_streak"], HALL_OF_FAME_MIN_STREAK)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SharedCacheTests(TestCase):
+    """
+    Shared endpoints cache their 200 payloads for every user, and never an
+    error response.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(telegram_id=1, username="user")
+        cls.challenge = Challenge.objects.create(
+            title="Challenge",
+            icon="challenge_icons/icon.png",
+            video_instruction_url="https://example.com/video",
+            start_time=datetime.time(6),
+            end_time=datetime.time(8),
+        )
+        cls.url = f"/api/v1/main/challenges/{cls.challenge.id}/30-days-plus-streaks/"
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self):
+        return self.client.get(self.url, HTTP_X_TELEGRAM_ID="1")
+
+    def add_entry(self, best_streak):
+        HallOfFameEntry.objects.update_or_create(
+            user=self.user,
+            challenge=self.challenge,
+            defaults={
+                "best_streak": best_streak,
+                "reached_at": timezone.localdate(),
+            },
+        )
+
+    def test_error_response_is_not_cached(self):
+        self.assertEqual(self.get().status_code, 400)
+
+        self.add_entry(HALL_OF_FAME_MIN_STREAK)
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_payload_is_cached(self):
+        self.add_entry(HALL_OF_FAME_MIN_STREAK)
+        data = self.get().json()
+
+        self.add_entry(HALL_OF_FAME_MIN_STREAK + 1)
+        with self.assertNumQueries(1):
+            # Only the authentication query
+            response = self.get()
+        self.assertEqual(response.json(), data)
+
+
+class UserStatsTests(TestCase):
+    """
+    Saving and deleting user challenges keeps the UserStats totals equal to
+    a full recompute.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="user")
+        cls.challenges = [
+            Challenge.objects.create(
+                title=f"Challenge {index}",
+                icon="challenge_icons/icon.png",
+                video_instruction_url="https://example.com/video",
+                start_time=datetime.time(6),
+                end_time=datetime.time(8),
+            )
+            for index in range(2)
+        ]
+
+    def assertTotals(self, total_current_streak, total_completions):
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(
+            (stats.total_current_streak, stats.total_completions),
+            (total_current_streak, total_completions),
+        )
+        # The same as recomputing them
+        stats = UserStats.refresh(self.user.id)
+        self.assertEqual(
+            (stats.total_current_streak, stats.total_completions),
+            (total_current_streak, total_completions),
+        )
+
+    def test_saves_and_deletes(self):
+        first = UserChallenge.objects.create(
+            user=self.user,
+            challenge=self.challenges[0],
+            current_streak=3,
+            total_completions=5,
+        )
+        self.assertTotals(3, 5)
+        second = UserChallenge.objects.create(
+            user=self.user, challenge=self.challenges[1], current_streak=2
+        )
+        self.assertTotals(5, 5)
+
+        # Saved again, and loaded again
+        first.current_streak = 4
+        first.total_completions = 6
+        first.save()
+        self.assertTotals(6, 6)
+        second = UserChallenge.objects.get(id=second.id)
+        second.total_completions = 1
+        second.save(update_fields=["total_completions"])
+        self.assertTotals(6, 7)
+
+        # Inactive participations keep their completions only
+        second.is_active = False
+        second.save()
+        self.assertTotals(4, 7)
+
+        # delete() deactivates, the queryset delete removes the rows
+        UserChallenge.objects.get(id=first.id).delete()
+        self.assertTotals(0, 7)
+        UserChallenge.objects.filter(id=first.id).delete()
+        self.assertTotals(0, 1)
+
+    def test_instances_loaded_without_the_totalled_fields(self):
+        user_challenge = UserChallenge.objects.create(
+            user=self.user, challenge=self.challenges[0], current_streak=3
+        )
+        user_challenge = UserChallenge.objects.only("id", "user").get(
+            id=user_challenge.id
+        )
+        user_challenge.current_streak = 1
+        user_challenge.save()
+        self.assertTotals(1, 0)
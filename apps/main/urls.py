@@ -2,19 +2,27 @@ from django.urls import path
 
 from apps.main.views import (  # Super Challenge views
     AllChallengesCalendarAPIView,
+    AllChallengesCalendarRangeAPIView,
     AllSuperChallengesCalendarAPIView,
+    AllSuperChallengesCalendarRangeAPIView,
     Challenge30DaysPlusStreakDetailView,
     Challenge30DaysPlusStreakView,
     ChallengeAwardListView,
     ChallengeCalendarAPIView,
     ChallengeDetailAPIView,
+    ChallengeHallOfFameAPIView,
+    ChallengeHeatmapAPIView,
     ChallengeLeaderboardAPIView,
+    ChallengeLeaderboardRankAPIView,
     ChallengeListAPIView,
     GenerateSuperChallengeDataAPIView,
+    GlobalLeaderboardAPIView,
     SuperChallengeAwardListView,
     SuperChallengeCalendarAPIView,
     SuperChallengeDetailAPIView,
+    SuperChallengeHeatmapAPIView,
     SuperChallengeLeaderboardAPIView,
+    SuperChallengeLeaderboardRankAPIView,
     SuperChallengeListAPIView,
     UpdateUserChallengeStreaksAPIView,
     UserChallengeCompletionAPIView,
@@ -72,11 +80,31 @@ urlpatterns = [
         AllChallengesCalendarAPIView.as_view(),
         name="all-challenges-calendar",
     ),
+    path(
+        "challenges/calendar/range/",
+        AllChallengesCalendarRangeAPIView.as_view(),
+        name="all-challenges-calendar-range",
+    ),
+    path(
+        "challenges/heatmap/",
+        ChallengeHeatmapAPIView.as_view(),
+        name="challenges-heatmap",
+    ),
     path(
         "challenges/<int:id>/leaderboard/",
         ChallengeLeaderboardAPIView.as_view(),
         name="challenge-leaderboard",
     ),
+    path(
+        "challenges/<int:id>/leaderboard/me/",
+        ChallengeLeaderboardRankAPIView.as_view(),
+        name="challenge-leaderboard-rank",
+    ),
+    path(
+        "leaderboard/",
+        GlobalLeaderboardAPIView.as_view(),
+        name="global-leaderboard",
+    ),
     path(
         "challenges/30-days-plus-streaks/",
         Challenge30DaysPlusStreakView.as_view(),
@@ -87,6 +115,11 @@ urlpatterns = [
         Challenge30DaysPlusStreakDetailView.as_view(),
         name="challenge-30-days-plus-streaks-detail",
     ),
+    path(
+        "challenges/<int:id>/hall-of-fame/",
+        ChallengeHallOfFameAPIView.as_view(),
+        name="challenge-hall-of-fame",
+    ),
     path(
         "challenges/awards/",
         ChallengeAwardListView.as_view(),
@@ -128,6 +161,16 @@ urlpatterns = [
         AllSuperChallengesCalendarAPIView.as_view(),
         name="all-super-challenges-calendar",
     ),
+    path(
+        "super-challenges/calendar/range/",
+        AllSuperChallengesCalendarRangeAPIView.as_view(),
+        name="all-super-challenges-calendar-range",
+    ),
+    path(
+        "super-challenges/heatmap/",
+        SuperChallengeHeatmapAPIView.as_view(),
+        name="super-challenges-heatmap",
+    ),
     path(
         "super-challenges/awards/",
         SuperChallengeAwardListView.as_view(),
@@ -138,6 +181,11 @@ urlpatterns = [
         SuperChallengeLeaderboardAPIView.as_view(),
         name="super-challenge-leaderboard",
     ),
+    path(
+        "super-challenges/<int:id>/leaderboard/me/",
+        SuperChallengeLeaderboardRankAPIView.as_view(),
+        name="super-challenge-leaderboard-rank",
+    ),
     path(
         "admin/generate-super-challenge-data/",
         GenerateSuperChallengeDataAPIView.as_view(),
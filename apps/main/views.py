@@ -1,8 +1,10 @@
+import redis
 from django.db import transaction
-from django.db.models import Prefetch
+from django.db.models import Exists, OuterRef, Prefetch
 from django.utils import timezone
+from django.utils.translation import get_language
 from rest_framework import status
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import (
     CreateAPIView,
     DestroyAPIView,
@@ -13,27 +15,81 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.common.cache import get_catalog_version
+from apps.common.media import get_media_base_url, media_url
+from apps.common.mixins import (
+    CatalogCacheMixin,
+    ConditionalGetMixin,
+    RowListMixin,
+    SharedCacheMixin,
+)
+from apps.common.pagination import KeysetPagination
+from apps.main.cache import (
+    CHALLENGES_CALENDAR,
+    SUPER_CHALLENGES_CALENDAR,
+    get_cached_calendar,
+)
+from apps.main.calendar import (
+    MAX_SYNC_CHANGES,
+    completed_in,
+    days_in_year,
+    make_sync_token,
+    month_range,
+    parse_month,
+    parse_month_span,
+    parse_sync_token,
+    parse_year,
+    year_bitmaps,
+)
+from apps.main.leaderboards import (
+    CHALLENGE,
+    GLOBAL_LEADERBOARD_ORDERS,
+    LEADERBOARD_KEYSET,
+    SNAPSHOT_KEYSET,
+    SUPER_CHALLENGE,
+    RedisLeaderboard,
+    global_leaderboard_queryset,
+    latest_snapshot,
+    ordered_leaderboard_queryset,
+    ranked_ahead_filter,
+    streak_from_score,
+)
 from apps.main.models import (
     Challenge,
     ChallengeAward,
+    HallOfFameEntry,
     SuperChallenge,
     SuperChallengeAward,
     UserAward,
+    UserCalendarState,
     UserChallenge,
     UserChallengeCompletion,
     UserSuperAward,
     UserSuperChallenge,
     UserSuperChallengeCompletion,
 )
+from apps.main.row_serializers import (
+    CHALLENGE_LIST_FIELDS,
+    GLOBAL_LEADERBOARD_FIELDS,
+    LEADERBOARD_FIELDS,
+    USER_CHALLENGE_LIST_FIELDS,
+    DayKeys,
+    group_completion_dates,
+    serialize_challenge,
+    serialize_leaderboard_entries,
+    serialize_super_challenge_calendar,
+    serialize_user_challenge,
+)
 from apps.main.serializers import (
     AllChallengesCalendarSerializer,
-    AllSuperChallengesCalendarSerializer,
     Challenge30DaysPlusStreakSerializer,
     ChallengeAwardSerializer,
     ChallengeCalendarSerializer,
     ChallengeDetailSerializer,
     ChallengeLeaderboardSerializer,
     ChallengeListSerializer,
+    GlobalLeaderboardSerializer,
+    HallOfFameEntrySerializer,
     SuperChallengeAwardSerializer,
     SuperChallengeCalendarSerializer,
     SuperChallengeDetailSerializer,
@@ -50,28 +106,69 @@ from apps.main.tasks import update_all_user_challenge_streaks
 from apps.users.models import User
 from apps.users.permissions import IsTelegramUser
 
+# Number of hall of fame entries embedded into each challenge card
+HALL_OF_FAME_PREVIEW_SIZE = 10
 
-class ChallengeListAPIView(ListAPIView):
-    serializer_class = ChallengeListSerializer
-    permission_classes = [IsTelegramUser]
+# Keyset pagination ordering of the user's challenge and super challenge lists
+PARTICIPATION_KEYSET = (
+    ("current_streak", True),
+    ("created_at", True),
+    ("id", True),
+)
 
-    def get_queryset(self):
-        if not self.request.user.is_authenticated:
-            return Challenge.objects.all()
 
-        return Challenge.objects.prefetch_related(
+def calendar_user_challenges(user, start, end):
+    """
+    User challenges with their active completions in [start, end), fetched
+    with one range scan over the completions index.
+    """
+    return (
+        UserChallenge.objects.filter(user=user)
+        .select_related("challenge")
+        .prefetch_related(
             Prefetch(
-                "user_challenges",
-                queryset=UserChallenge.objects.filter(user=self.request.user),
-                to_attr="_prefetched_user_challenges",
+                "completions",
+                queryset=UserChallengeCompletion.objects.filter(
+                    **completed_in(start, end)
+                ).order_by("completed_at"),
+                to_attr="_prefetched_completions",
             )
         )
+    )
+
+
+def hall_of_fame_challenges():
+    """
+    Challenges that have at least one hall of fame entry, with the top
+    entries prefetched for the preview leaderboard.
+    """
+    return Challenge.objects.filter(
+        Exists(HallOfFameEntry.objects.filter(challenge=OuterRef("pk")))
+    ).prefetch_related(
+        Prefetch(
+            "hall_of_fame_entries",
+            queryset=HallOfFameEntry.objects.order_by("-best_streak", "reached_at")[
+                :HALL_OF_FAME_PREVIEW_SIZE
+            ],
+            to_attr="_prefetched_hall_of_fame",
+        )
+    )
+
+
+class ChallengeListAPIView(CatalogCacheMixin, ConditionalGetMixin, ListAPIView):
+    serializer_class = ChallengeListSerializer
+    permission_classes = [IsTelegramUser]
 
+    def get_queryset(self):
+        return Challenge.objects.all()
 
-class ChallengeDetailAPIView(RetrieveAPIView):
+
+class ChallengeDetailAPIView(ConditionalGetMixin, RetrieveAPIView):
     serializer_class = ChallengeDetailSerializer
     permission_classes = [IsTelegramUser]
     lookup_field = "id"
+    conditional_models = (Challenge,)
+    conditional_per_user = True
 
     def get_queryset(self):
         return Challenge.objects.all()
@@ -172,14 +269,7 @@ class ChallengeCalendarAPIView(RetrieveAPIView):
         if not self.request.user.is_authenticated:
             return UserChallenge.objects.none()
 
-        try:
-            month = int(self.request.query_params.get("month", timezone.now().month))
-            year = int(self.request.query_params.get("year", timezone.now().year))
-            if not 1 <= month <= 12:
-                raise ValidationError("Month must be between 1 and 12")
-        except ValueError:
-            raise ValidationError("Invalid month or year format")
-
+        start, end = month_range(*parse_month(self.request.query_params))
         return (
             UserChallenge.objects.filter(user=self.request.user)
             .select_related("challenge")
@@ -187,7 +277,7 @@ class ChallengeCalendarAPIView(RetrieveAPIView):
                 Prefetch(
                     "completions",
                     queryset=UserChallengeCompletion.objects.filter(
-                        completed_at__year=year, completed_at__month=month
+                        **completed_in(start, end)
                     ),
                     to_attr="_prefetched_completions",
                 )
@@ -196,97 +286,306 @@ class ChallengeCalendarAPIView(RetrieveAPIView):
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        try:
-            month = int(self.request.query_params.get("month", timezone.now().month))
-            year = int(self.request.query_params.get("year", timezone.now().year))
-            if not 1 <= month <= 12:
-                raise ValidationError("Month must be between 1 and 12")
-        except ValueError:
-            raise ValidationError("Invalid month or year format")
-
-        context["month"] = month
-        context["year"] = year
+        context["year"], context["month"] = parse_month(self.request.query_params)
         return context
 
 
+def super_challenge_completion_dates(user, start, end):
+    """
+    Local dates of the user's active super challenge completions in
+    [start, end), grouped by user super challenge id.
+    """
+    completions = (
+        UserSuperChallengeCompletion.objects.filter(
+            user_super_challenge__user=user, **completed_in(start, end)
+        )
+        .order_by("completed_at")
+        .values_list("user_super_challenge_id", "completed_at")
+    )
+    return group_completion_dates(completions, DayKeys(start, end))
+
+
+def calendar_changes(user, since, completions, serialize_change):
+    """
+    Delta sync payload: the completions saved after change sequence `since`
+    and a token for the current sequence. `reset` tells the client to reload
+    the calendar, when completions were deleted since or it is too far behind.
+    """
+    seq, reset_seq = UserCalendarState.current(user.id)
+    data = {
+        "sync_token": make_sync_token(user.id, seq),
+        "reset": False,
+        "changes": [],
+    }
+    if not reset_seq <= since <= seq:
+        data["reset"] = True
+        return data
+
+    changed = list(
+        completions.filter(change_seq__gt=since, change_seq__lte=seq).order_by(
+            "change_seq"
+        )[: MAX_SYNC_CHANGES + 1]
+    )
+    if len(changed) > MAX_SYNC_CHANGES:
+        data["reset"] = True
+        return data
+
+    data["changes"] = [serialize_change(completion) for completion in changed]
+    return data
+
+
 class AllChallengesCalendarAPIView(APIView):
+    """
+    Month calendar of all the user's challenges. The response carries a
+    `sync_token`; passing it back as `?since=` returns only the completions
+    added or voided after it (see `calendar_changes`).
+    """
+
     permission_classes = [IsTelegramUser]
 
     def get(self, request):
         if not request.user.is_authenticated:
             return Response({"calendar_data": []})
 
-        try:
-            month = int(request.query_params.get("month", timezone.now().month))
-            year = int(request.query_params.get("year", timezone.now().year))
-            if not 1 <= month <= 12:
-                raise ValidationError("Month must be between 1 and 12")
-        except ValueError:
-            raise ValidationError("Invalid month or year format")
+        since = request.query_params.get("since")
+        if since is not None:
+            return Response(self.get_changes(request, since))
 
-        # Get all completions for the month in a single query
-        user_challenges = (
-            UserChallenge.objects.filter(user=request.user)
-            .select_related("challenge")
-            .prefetch_related(
-                Prefetch(
-                    "completions",
-                    queryset=UserChallengeCompletion.objects.filter(
-                        completed_at__year=year, completed_at__month=month
-                    ).order_by("completed_at"),
-                    to_attr="_prefetched_completions",
-                )
+        year, month = parse_month(request.query_params)
+
+        def build():
+            # Read the sequence first, so the token never covers a change
+            # the data doesn't include
+            seq, _ = UserCalendarState.current(request.user.id)
+            # Get all completions for the month in a single query
+            user_challenges = calendar_user_challenges(
+                request.user, *month_range(year, month)
+            )
+            context = {"request": request, "month": month, "year": year}
+            serializer = AllChallengesCalendarSerializer(
+                {"user_challenges": user_challenges}, context=context
             )
+            return {"sync_seq": seq, "calendar_data": serializer.data["calendar_data"]}
+
+        data = get_cached_calendar(
+            CHALLENGES_CALENDAR,
+            request.user.id,
+            year,
+            month,
+            build,
+            language=get_language(),
+            media_base_url=get_media_base_url(request),
+        )
+        return Response(
+            {
+                "calendar_data": data["calendar_data"],
+                "sync_token": make_sync_token(request.user.id, data["sync_seq"]),
+            }
+        )
+
+    def get_changes(self, request, since):
+        completions = UserChallengeCompletion.objects.filter(
+            user_challenge__user=request.user
+        ).select_related("user_challenge__challenge")
+
+        def serialize_change(completion):
+            challenge = completion.user_challenge.challenge
+            return {
+                "id": completion.id,
+                "user_challenge_id": completion.user_challenge_id,
+                "date": timezone.localtime(completion.completed_at).date().isoformat(),
+                "is_active": completion.is_active,
+                "title": challenge.title,
+                "calendar_icon": media_url(
+                    challenge.calendar_icon or challenge.icon, request
+                ),
+            }
+
+        return calendar_changes(
+            request.user,
+            parse_sync_token(since, request.user.id),
+            completions,
+            serialize_change,
         )
 
-        context = {"request": request, "month": month, "year": year}
+
+class AllChallengesCalendarRangeAPIView(APIView):
+    """
+    Calendar of all the user's challenges for the months `from`..`to`
+    (inclusive, `YYYY-MM`), fetched in one query.
+    """
+
+    permission_classes = [IsTelegramUser]
+
+    def get(self, request):
+        start, end = parse_month_span(request.query_params)
+        data = {
+            "from": "{:04d}-{:02d}".format(*start),
+            "to": "{:04d}-{:02d}".format(*end),
+            "calendar_data": [],
+        }
+        if not request.user.is_authenticated:
+            return Response(data)
+
+        user_challenges = calendar_user_challenges(
+            request.user, *month_range(*start, *end)
+        )
         serializer = AllChallengesCalendarSerializer(
-            {"user_challenges": user_challenges}, context=context
+            {"user_challenges": user_challenges}, context={"request": request}
         )
-        return Response(serializer.data)
+        data["calendar_data"] = serializer.data["calendar_data"]
+        return Response(data)
 
 
-class ChallengeLeaderboardAPIView(ListAPIView):
-    serializer_class = ChallengeLeaderboardSerializer
+class ChallengeHeatmapAPIView(APIView):
+    """
+    Year view of all the user's challenges: the challenge metadata once and a
+    base64 bitmap of the completed days (see `year_bitmaps`).
+    """
+
+    permission_classes = [IsTelegramUser]
+
+    def get(self, request):
+        year = parse_year(request.query_params)
+        data = {
+            "year": year,
+            "days": days_in_year(year),
+            "heatmap": [],
+        }
+        if not request.user.is_authenticated:
+            return Response(data)
+
+        user_challenges = list(
+            UserChallenge.objects.filter(user=request.user).select_related("challenge")
+        )
+        rows = UserChallengeCompletion.objects.filter(
+            user_challenge__in=[uc.id for uc in user_challenges],
+            **completed_in(*month_range(year, 1, year, 12)),
+        ).values_list("user_challenge_id", "completed_at")
+        bitmaps = year_bitmaps(rows, year, keys=[uc.id for uc in user_challenges])
+
+        data["heatmap"] = [
+            {
+                "id": user_challenge.id,
+                "challenge_id": user_challenge.challenge_id,
+                "title": user_challenge.challenge.title,
+                "calendar_icon": media_url(
+                    user_challenge.challenge.calendar_icon
+                    or user_challenge.challenge.icon,
+                    request,
+                ),
+                "bitmap": bitmaps[user_challenge.id],
+            }
+            for user_challenge in user_challenges
+        ]
+        return Response(data)
+
+
+class LeaderboardMixin:
+    """
+    Shared by the leaderboard endpoints. They serve the latest daily snapshot
+    unless `?live=1` is passed. The final snapshot of an ended super challenge
+    is served in both modes. Live standings come from the Redis sorted sets,
+    or from the database while Redis is unavailable.
+    """
+
     permission_classes = [IsTelegramUser]
+    leaderboard_kind = None
+
+    def check_leaderboard(self, id):
+        pass
+
+    def get_snapshot(self, id):
+        snapshot = latest_snapshot(self.leaderboard_kind, id)
+        live = self.request.query_params.get("live") in ("1", "true")
+        if snapshot and (snapshot.is_final or not live):
+            return snapshot
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == 200 and hasattr(self, "snapshot"):
+            response["X-Leaderboard-Snapshot"] = (
+                self.snapshot.date.isoformat() if self.snapshot else "live"
+            )
+        return response
+
+
+class LeaderboardAPIView(LeaderboardMixin, RowListMixin, ListAPIView):
+    """
+    Pages are cursor paginated: snapshots by rank, live standings by
+    LEADERBOARD_KEYSET.
+    """
+
+    pagination_class = KeysetPagination
+
+    def get_keyset(self):
+        return SNAPSHOT_KEYSET if self.snapshot else LEADERBOARD_KEYSET
 
     def get_queryset(self):
-        challenge_id = self.kwargs["id"]
+        id = self.kwargs["id"]
+        self.check_leaderboard(id)
+
+        self.snapshot = self.get_snapshot(id)
+        if self.snapshot:
+            return self.snapshot.entries.order_by("rank").values(
+                "rank", *LEADERBOARD_FIELDS
+            )
+
         try:
-            challenge = Challenge.objects.get(id=challenge_id)
-        except Challenge.DoesNotExist:
+            return RedisLeaderboard(self.leaderboard_kind, id)
+        except redis.RedisError:
+            return ordered_leaderboard_queryset(self.leaderboard_kind, id).values(
+                "last_completion_date", *LEADERBOARD_FIELDS
+            )
+
+    def serialize_rows(self, rows):
+        return serialize_leaderboard_entries(rows, self.request)
+
+
+class ChallengeLeaderboardAPIView(LeaderboardAPIView):
+    serializer_class = ChallengeLeaderboardSerializer
+    leaderboard_kind = CHALLENGE
+
+    def check_leaderboard(self, id):
+        if not Challenge.objects.filter(id=id).exists():
             raise ValidationError("Challenge not found")
 
-        # Query UserChallenge directly to get unique entries
-        return (
-            UserChallenge.objects.filter(
-                challenge_id=challenge_id, highest_streak__gt=0
+
+class GlobalLeaderboardAPIView(SharedCacheMixin, RowListMixin, ListAPIView):
+    """
+    Users ranked across all challenges, by the sum of their current streaks
+    (`?order=streak`, the default) or by their total completions
+    (`?order=completions`). Served from the UserStats totals, pages are
+    cached for a minute.
+    """
+
+    serializer_class = GlobalLeaderboardSerializer
+    permission_classes = [IsTelegramUser]
+
+    def get_queryset(self):
+        order = self.request.query_params.get("order", "streak")
+        if order not in GLOBAL_LEADERBOARD_ORDERS:
+            raise ValidationError(
+                {"order": f"Expected one of {', '.join(GLOBAL_LEADERBOARD_ORDERS)}"}
             )
-            .select_related("user")
-            .order_by("-highest_streak")
+        return global_leaderboard_queryset(order).values(*GLOBAL_LEADERBOARD_FIELDS)
+
+    def serialize_rows(self, rows):
+        return serialize_leaderboard_entries(
+            rows, self.request, fields=("total_current_streak", "total_completions")
         )
 
 
-class Challenge30DaysPlusStreakView(ListAPIView):
+class Challenge30DaysPlusStreakView(SharedCacheMixin, ListAPIView):
     serializer_class = Challenge30DaysPlusStreakSerializer
     permission_classes = [IsTelegramUser]
 
     def get_queryset(self):
-        return (
-            Challenge.objects.filter(user_challenges__highest_streak__gte=30)
-            .distinct()
-            .prefetch_related(
-                Prefetch(
-                    "user_challenges",
-                    queryset=UserChallenge.objects.filter(highest_streak__gte=30)
-                    .select_related("user")
-                    .order_by("-highest_streak"),
-                )
-            )
-        )
+        return hall_of_fame_challenges()
 
 
-class Challenge30DaysPlusStreakDetailView(RetrieveAPIView):
+class Challenge30DaysPlusStreakDetailView(SharedCacheMixin, RetrieveAPIView):
     serializer_class = Challenge30DaysPlusStreakSerializer
     permission_classes = [IsTelegramUser]
     lookup_field = "id"
@@ -294,27 +593,28 @@ class Challenge30DaysPlusStreakDetailView(RetrieveAPIView):
     def get_object(self):
         challenge_id = self.kwargs["id"]
         try:
-            return (
-                Challenge.objects.filter(
-                    id=challenge_id, user_challenges__highest_streak__gte=30
-                )
-                .distinct()
-                .prefetch_related(
-                    Prefetch(
-                        "user_challenges",
-                        queryset=UserChallenge.objects.filter(highest_streak__gte=30)
-                        .select_related("user")
-                        .order_by("-highest_streak"),
-                    )
-                )
-                .get()
-            )
+            return hall_of_fame_challenges().get(id=challenge_id)
         except Challenge.DoesNotExist:
             raise ValidationError(
                 "No users have achieved 30+ days streak in this challenge"
             )
 
 
+class ChallengeHallOfFameAPIView(SharedCacheMixin, ListAPIView):
+    """
+    Paginated hall of fame of a challenge, read from the precomputed
+    HallOfFameEntry table. Pages are cached for a minute.
+    """
+
+    serializer_class = HallOfFameEntrySerializer
+    permission_classes = [IsTelegramUser]
+
+    def get_queryset(self):
+        return HallOfFameEntry.objects.filter(challenge_id=self.kwargs["id"]).order_by(
+            "-best_streak", "reached_at"
+        )
+
+
 class ChallengeAwardListView(ListAPIView):
     serializer_class = ChallengeAwardSerializer
     permission_classes = [IsTelegramUser]
@@ -376,17 +676,33 @@ class UserChallengeCreateAPIView(CreateAPIView):
         return Response(response_serializer.data, status=status_code)
 
 
-class UserChallengeListAPIView(ListAPIView):
+class UserChallengeListAPIView(RowListMixin, ListAPIView):
     serializer_class = UserChallengeListSerializer
     permission_classes = [IsTelegramUser]
+    pagination_class = KeysetPagination
+    keyset = PARTICIPATION_KEYSET
 
     def get_queryset(self):
         return (
             UserChallenge.objects.filter(user=self.request.user, is_active=True)
-            .select_related("challenge")
-            .order_by("-current_streak", "-created_at")
+            .order_by("-current_streak", "-created_at", "-id")
+            .values("created_at", *USER_CHALLENGE_LIST_FIELDS)
         )
 
+    def serialize_rows(self, rows):
+        # Each challenge is serialized once, however many rows refer to it.
+        # Challenge.objects.values() resolves the translated fields.
+        challenges = {
+            row["id"]: serialize_challenge(row, self.request)
+            for row in Challenge.objects.filter(
+                id__in={row["challenge_id"] for row in rows}
+            ).values(*CHALLENGE_LIST_FIELDS)
+        }
+        return [
+            serialize_user_challenge(row, challenges[row["challenge_id"]])
+            for row in rows
+        ]
+
 
 class UserChallengeDeleteAPIView(DestroyAPIView):
     permission_classes = [IsTelegramUser]
@@ -427,48 +743,64 @@ class UserChallengeDetailAPIView(RetrieveAPIView):
 
 
 # Super Challenge views
-class SuperChallengeListAPIView(ListAPIView):
+class SuperChallengeListAPIView(CatalogCacheMixin, ListAPIView):
     serializer_class = SuperChallengeListSerializer
     permission_classes = [IsTelegramUser]
 
+    def get_catalog_cache_key(self, request):
+        # The list only contains super challenges running today
+        key = super().get_catalog_cache_key(request)
+        return f"{key}:{timezone.now().date().isoformat()}"
+
     def get_queryset(self):
         today = timezone.now().date()
 
-        # Get the current user for optimization
-        user = self.request.user
-
-        # Use select_related and prefetch_related to optimize database queries
-        queryset = SuperChallenge.objects.filter(
-            start_date__lte=today, end_date__gte=today
-        ).prefetch_related(
-            "challenges"  # Prefetch challenges for get_challenges_count in serializer
+        return (
+            SuperChallenge.objects.filter(start_date__lte=today, end_date__gte=today)
+            .prefetch_related(
+                "challenges"  # Prefetch challenges for get_challenges_count in serializer
+            )
+            .order_by("start_date")
         )
 
-        # Prefetch user_super_challenges for the current user to optimize is_failed check
-        if user.is_authenticated:
-            queryset = queryset.prefetch_related(
-                Prefetch(
-                    "user_super_challenges",
-                    queryset=UserSuperChallenge.objects.filter(
-                        user=user, is_active=True
-                    ),
-                    to_attr="_prefetched_user_super_challenges",
-                )
-            )
+    def finalize_catalog_data(self, data):
+        """
+        The cached catalog is rendered without a user, fill in the user's
+        failure status from a single query over the listed super challenges.
+        """
+        rows = data["results"] if isinstance(data, dict) else data
+        user_super_challenges = {
+            user_super_challenge.super_challenge_id: user_super_challenge
+            for user_super_challenge in UserSuperChallenge.objects.filter(
+                user=self.request.user,
+                is_active=True,
+                super_challenge_id__in=[row["id"] for row in rows],
+            ).select_related("super_challenge")
+        }
 
-        return queryset.order_by("start_date")
+        for row in rows:
+            user_super_challenge = user_super_challenges.get(row["id"])
+            if user_super_challenge and user_super_challenge.is_failed:
+                row["is_failed"] = True
+                row["is_failed_reason"] = user_super_challenge.get_failure_reason()
+            else:
+                row["is_failed"] = False
+                row["is_failed_reason"] = None
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        # Add user directly to context to avoid accessing request.user multiple times
-        context["user"] = self.request.user
-        return context
+        return data
 
 
-class SuperChallengeDetailAPIView(RetrieveAPIView):
+class SuperChallengeDetailAPIView(ConditionalGetMixin, RetrieveAPIView):
     serializer_class = SuperChallengeDetailSerializer
     permission_classes = [IsTelegramUser]
     lookup_field = "id"
+    conditional_models = (SuperChallenge, Challenge)
+    conditional_per_user = True
+
+    def get_etag_parts(self, request):
+        # The challenges M2M table has no timestamps: changes to it bump the
+        # catalog version (see signals.py)
+        return super().get_etag_parts(request) + [get_catalog_version()]
 
     def get_queryset(self):
         return SuperChallenge.objects.all().prefetch_related("challenges")
@@ -477,6 +809,8 @@ class SuperChallengeDetailAPIView(RetrieveAPIView):
 class UserSuperChallengeListAPIView(ListAPIView):
     serializer_class = UserSuperChallengeListSerializer
     permission_classes = [IsTelegramUser]
+    pagination_class = KeysetPagination
+    keyset = PARTICIPATION_KEYSET
 
     def get_queryset(self):
         today = timezone.now().date()
@@ -488,7 +822,7 @@ class UserSuperChallengeListAPIView(ListAPIView):
                 super_challenge__end_date__gte=today,
             )
             .select_related("super_challenge")
-            .order_by("-current_streak", "-created_at")
+            .order_by("-current_streak", "-created_at", "-id")
         )
 
 
@@ -514,14 +848,7 @@ class SuperChallengeCalendarAPIView(RetrieveAPIView):
         if not self.request.user.is_authenticated:
             return UserSuperChallenge.objects.none()
 
-        try:
-            month = int(self.request.query_params.get("month", timezone.now().month))
-            year = int(self.request.query_params.get("year", timezone.now().year))
-            if not 1 <= month <= 12:
-                raise ValidationError("Month must be between 1 and 12")
-        except ValueError:
-            raise ValidationError("Invalid month or year format")
-
+        start, end = month_range(*parse_month(self.request.query_params))
         return (
             UserSuperChallenge.objects.filter(user=self.request.user)
             .select_related("super_challenge")
@@ -529,7 +856,7 @@ class SuperChallengeCalendarAPIView(RetrieveAPIView):
                 Prefetch(
                     "completions",
                     queryset=UserSuperChallengeCompletion.objects.filter(
-                        completed_at__year=year, completed_at__month=month
+                        **completed_in(start, end)
                     ),
                     to_attr="_prefetched_completions",
                 )
@@ -538,55 +865,150 @@ class SuperChallengeCalendarAPIView(RetrieveAPIView):
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
-        try:
-            context["month"] = int(
-                self.request.query_params.get("month", timezone.now().month)
-            )
-            context["year"] = int(
-                self.request.query_params.get("year", timezone.now().year)
-            )
-        except ValueError:
-            context["month"] = timezone.now().month
-            context["year"] = timezone.now().year
-
+        context["year"], context["month"] = parse_month(self.request.query_params)
         return context
 
 
 class AllSuperChallengesCalendarAPIView(APIView):
+    """
+    Month calendar of all the user's super challenges, with the same delta
+    sync as AllChallengesCalendarAPIView.
+    """
+
     permission_classes = [IsTelegramUser]
 
     def get(self, request):
         if not request.user.is_authenticated:
             return Response({"calendar_data": []})
 
-        try:
-            month = int(request.query_params.get("month", timezone.now().month))
-            year = int(request.query_params.get("year", timezone.now().year))
-            if not 1 <= month <= 12:
-                raise ValidationError("Month must be between 1 and 12")
-        except ValueError:
-            raise ValidationError("Invalid month or year format")
+        since = request.query_params.get("since")
+        if since is not None:
+            return Response(self.get_changes(request, since))
 
-        # Get all completions for the month in a single query
-        user_super_challenges = (
-            UserSuperChallenge.objects.filter(user=request.user)
-            .select_related("super_challenge")
-            .prefetch_related(
-                Prefetch(
-                    "completions",
-                    queryset=UserSuperChallengeCompletion.objects.filter(
-                        completed_at__year=year, completed_at__month=month
-                    ).order_by("completed_at"),
-                    to_attr="_prefetched_completions",
-                )
+        year, month = parse_month(request.query_params)
+
+        def build():
+            seq, _ = UserCalendarState.current(request.user.id)
+            dates = super_challenge_completion_dates(
+                request.user, *month_range(year, month)
             )
+            return {"sync_seq": seq, "completion_dates": dates}
+
+        # Completion dates are cached per month, the streak counters and the
+        # super challenge fields are read fresh
+        cached = get_cached_calendar(
+            SUPER_CHALLENGES_CALENDAR, request.user.id, year, month, build
+        )
+        user_super_challenges = list(
+            UserSuperChallenge.objects.filter(user=request.user).select_related(
+                "super_challenge"
+            )
+        )
+        calendar_data = serialize_super_challenge_calendar(
+            user_super_challenges, cached["completion_dates"], request
+        )
+        return Response(
+            {
+                "calendar_data": calendar_data,
+                "sync_token": make_sync_token(request.user.id, cached["sync_seq"]),
+            }
+        )
+
+    def get_changes(self, request, since):
+        completions = UserSuperChallengeCompletion.objects.filter(
+            user_super_challenge__user=request.user
+        )
+
+        def serialize_change(completion):
+            return {
+                "id": completion.id,
+                "user_super_challenge_id": completion.user_super_challenge_id,
+                "date": timezone.localtime(completion.completed_at).date().isoformat(),
+                "is_active": completion.is_active,
+            }
+
+        return calendar_changes(
+            request.user,
+            parse_sync_token(since, request.user.id),
+            completions,
+            serialize_change,
+        )
+
+
+class AllSuperChallengesCalendarRangeAPIView(APIView):
+    """
+    Calendar of all the user's super challenges for the months `from`..`to`
+    (inclusive, `YYYY-MM`), fetched in one query.
+    """
+
+    permission_classes = [IsTelegramUser]
+
+    def get(self, request):
+        start, end = parse_month_span(request.query_params)
+        data = {
+            "from": "{:04d}-{:02d}".format(*start),
+            "to": "{:04d}-{:02d}".format(*end),
+            "calendar_data": [],
+        }
+        if not request.user.is_authenticated:
+            return Response(data)
+
+        completion_dates = super_challenge_completion_dates(
+            request.user, *month_range(*start, *end)
+        )
+        user_super_challenges = UserSuperChallenge.objects.filter(
+            user=request.user
+        ).select_related("super_challenge")
+        data["calendar_data"] = serialize_super_challenge_calendar(
+            user_super_challenges, completion_dates, request
         )
+        return Response(data)
+
+
+class SuperChallengeHeatmapAPIView(APIView):
+    """
+    Year view of all the user's super challenges, same format as
+    ChallengeHeatmapAPIView.
+    """
+
+    permission_classes = [IsTelegramUser]
+
+    def get(self, request):
+        year = parse_year(request.query_params)
+        data = {
+            "year": year,
+            "days": days_in_year(year),
+            "heatmap": [],
+        }
+        if not request.user.is_authenticated:
+            return Response(data)
 
-        context = {"request": request, "month": month, "year": year}
-        serializer = AllSuperChallengesCalendarSerializer(
-            {"user_super_challenges": user_super_challenges}, context=context
+        user_super_challenges = list(
+            UserSuperChallenge.objects.filter(user=request.user).select_related(
+                "super_challenge"
+            )
         )
-        return Response(serializer.data)
+        rows = UserSuperChallengeCompletion.objects.filter(
+            user_super_challenge__in=[usc.id for usc in user_super_challenges],
+            **completed_in(*month_range(year, 1, year, 12)),
+        ).values_list("user_super_challenge_id", "completed_at")
+        bitmaps = year_bitmaps(
+            rows, year, keys=[usc.id for usc in user_super_challenges]
+        )
+
+        data["heatmap"] = [
+            {
+                "id": user_super_challenge.id,
+                "super_challenge_id": user_super_challenge.super_challenge_id,
+                "title": user_super_challenge.super_challenge.title,
+                "calendar_icon": media_url(
+                    user_super_challenge.super_challenge.calendar_icon, request
+                ),
+                "bitmap": bitmaps[user_super_challenge.id],
+            }
+            for user_super_challenge in user_super_challenges
+        ]
+        return Response(data)
 
 
 class SuperChallengeAwardListView(ListAPIView):
@@ -607,30 +1029,130 @@ class SuperChallengeAwardListView(ListAPIView):
         )
 
 
-class SuperChallengeLeaderboardAPIView(ListAPIView):
+class SuperChallengeLeaderboardAPIView(LeaderboardAPIView):
     serializer_class = SuperChallengeLeaderboardSerializer
-    permission_classes = [IsTelegramUser]
+    leaderboard_kind = SUPER_CHALLENGE
 
-    def get_queryset(self):
-        super_challenge_id = self.kwargs["id"]
-        return (
-            UserSuperChallenge.objects.filter(
-                super_challenge_id=super_challenge_id, is_active=True
+
+class LeaderboardRankAPIView(LeaderboardMixin, APIView):
+    """
+    The caller's place on a leaderboard: their rank (1-based), their streak
+    and the `window` entries above and below them. Live ranks come from
+    ZREVRANK on the leaderboard sorted set, snapshot ranks are stored.
+    """
+
+    default_window = 5
+    max_window = 50
+
+    def get_window(self):
+        try:
+            window = int(self.request.query_params.get("window", self.default_window))
+        except ValueError:
+            raise ValidationError({"window": "A valid integer is required."})
+        if not 0 <= window <= self.max_window:
+            raise ValidationError(
+                {"window": f"Must be between 0 and {self.max_window}."}
             )
-            .select_related("user")  # Prefetch user data to avoid N+1 queries
-            .only(
-                "id",
-                "highest_streak",
-                "last_completion_date",
-                "user__id",
-                "user__first_name",
-                "user__last_name",
-                "user__telegram_username",
-                "user__telegram_photo",
-                "user__telegram_photo_url",
-            )  # Only fetch the fields we need
-            .order_by("-highest_streak", "last_completion_date")
+        return window
+
+    def get(self, request, id):
+        self.check_leaderboard(id)
+        window = self.get_window()
+
+        self.snapshot = self.get_snapshot(id)
+        if self.snapshot:
+            standing = self.standing_from_snapshot(request.user.id, window)
+        else:
+            try:
+                standing = self.standing_from_redis(id, request.user.id, window)
+            except redis.RedisError:
+                standing = self.standing_from_database(id, request.user.id, window)
+        rank, highest_streak, rows, total = standing
+
+        data = {
+            "rank": None,
+            "highest_streak": None,
+            "total": total,
+            "snapshot_date": self.snapshot.date if self.snapshot else None,
+            "above": [],
+            "below": [],
+        }
+        if rank is None:
+            return Response(data)
+
+        data["rank"] = rank
+        data["highest_streak"] = highest_streak
+        entries = serialize_leaderboard_entries(
+            rows, request, fields=("highest_streak", "rank")
+        )
+        for entry in entries:
+            if entry["rank"] < rank:
+                data["above"].append(entry)
+            elif entry["rank"] > rank:
+                data["below"].append(entry)
+        return Response(data)
+
+    # Each standing_from_* returns (rank, highest streak, rows around the
+    # user with their "rank", leaderboard size), ranks starting at 1
+
+    def standing_from_snapshot(self, user_id, window):
+        entries = self.snapshot.entries
+        entry = entries.filter(user_id=user_id).values_list("rank", "highest_streak")
+        entry = entry.first()
+        if entry is None:
+            return None, None, [], self.snapshot.total
+
+        rank, highest_streak = entry
+        rows = entries.filter(rank__gte=rank - window, rank__lte=rank + window)
+        rows = list(rows.order_by("rank").values("rank", *LEADERBOARD_FIELDS))
+        return rank, highest_streak, rows, self.snapshot.total
+
+    def standing_from_redis(self, id, user_id, window):
+        leaderboard = RedisLeaderboard(self.leaderboard_kind, id)
+        rank, score, rows = leaderboard.around(user_id, window)
+        total = len(leaderboard)
+        if rank is None:
+            return None, None, [], total
+
+        for row in rows:
+            row["rank"] += 1
+        return rank + 1, streak_from_score(score), rows, total
+
+    def standing_from_database(self, id, user_id, window):
+        queryset = ordered_leaderboard_queryset(self.leaderboard_kind, id)
+        total = queryset.count()
+        entry = queryset.filter(user_id=user_id).values_list(
+            "highest_streak", "last_completion_date"
         )
+        entry = entry.first()
+        if entry is None:
+            return None, None, [], total
+
+        # The rank is counted on the leaderboard index instead of reading
+        # every participation
+        index = queryset.filter(ranked_ahead_filter(*entry, user_id)).count()
+        start = max(index - window, 0)
+        rows = list(queryset.values(*LEADERBOARD_FIELDS)[start : index + window + 1])
+        for offset, row in enumerate(rows):
+            row["rank"] = start + offset + 1
+
+        user_row = next((row for row in rows if row["user_id"] == user_id), None)
+        if user_row is None:
+            # Left the leaderboard or moved between the queries
+            raise NotFound("Participation not found")
+        return user_row["rank"], user_row["highest_streak"], rows, total
+
+
+class ChallengeLeaderboardRankAPIView(LeaderboardRankAPIView):
+    leaderboard_kind = CHALLENGE
+
+    def check_leaderboard(self, id):
+        if not Challenge.objects.filter(id=id).exists():
+            raise ValidationError("Challenge not found")
+
+
+class SuperChallengeLeaderboardRankAPIView(LeaderboardRankAPIView):
+    leaderboard_kind = SUPER_CHALLENGE
 
 
 class GenerateSuperChallengeDataAPIView(APIView):
@@ -3,9 +3,12 @@ from django.utils.translation import gettext_lazy as _
 
 from apps.notification.models import (
     ChallengeNotificationTemplate,
+    NotificationChunk,
     NotificationLog,
+    NotificationRun,
     SuperChallengeNotificationTemplate,
 )
+from apps.notification.tasks import queue_notification_chunks
 
 
 @admin.register(ChallengeNotificationTemplate)
@@ -70,3 +73,65 @@ class NotificationLogAdmin(admin.ModelAdmin):
 
     def has_change_permission(self, request, obj=None):
         return False
+
+
+class NotificationChunkInline(admin.TabularInline):
+    model = NotificationChunk
+    extra = 0
+    fields = (
+        "start_id",
+        "end_id",
+        "status",
+        "planned_count",
+        "sent_count",
+        "failed_count",
+        "skipped_count",
+        "started_at",
+    )
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(NotificationRun)
+class NotificationRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "key",
+        "kind",
+        "status",
+        "planned_count",
+        "sent_count",
+        "failed_count",
+        "skipped_count",
+        "created_at",
+        "finished_at",
+    )
+    list_filter = ("kind", "status", "run_date")
+    search_fields = ("key",)
+    readonly_fields = (
+        "kind",
+        "key",
+        "run_date",
+        "parameters",
+        "status",
+        "planned_count",
+        "sent_count",
+        "failed_count",
+        "skipped_count",
+        "created_at",
+        "finished_at",
+    )
+    inlines = [NotificationChunkInline]
+    actions = ["resume_runs"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description=_("Resume selected runs"))
+    def resume_runs(self, request, queryset):
+        queued = 0
+        for run in queryset.filter(status="running"):
+            queued += queue_notification_chunks(run)
+        self.message_user(request, _("Queued %(count)d chunks") % {"count": queued})
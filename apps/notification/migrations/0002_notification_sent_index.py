@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notificationlog",
+            index=models.Index(
+                condition=models.Q(("is_sent", True)),
+                fields=["notification_type", "sent_at", "user"],
+                name="notification_sent_idx",
+            ),
+        ),
+    ]
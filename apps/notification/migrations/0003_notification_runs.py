@@ -0,0 +1,168 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notification", "0002_notification_sent_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("challenge", "Challenge"),
+                            ("super_challenge_general", "Super Challenge General"),
+                            ("super_challenge_progress", "Super Challenge Progress"),
+                        ],
+                        max_length=50,
+                        verbose_name="Kind",
+                    ),
+                ),
+                (
+                    "key",
+                    models.CharField(max_length=255, unique=True, verbose_name="Key"),
+                ),
+                ("run_date", models.DateField(verbose_name="Run date")),
+                (
+                    "parameters",
+                    models.JSONField(
+                        blank=True, default=dict, verbose_name="Parameters"
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("running", "Running"), ("completed", "Completed")],
+                        default="running",
+                        max_length=20,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "planned_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Planned"),
+                ),
+                (
+                    "sent_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Sent"),
+                ),
+                (
+                    "failed_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Failed"),
+                ),
+                (
+                    "skipped_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Skipped"),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Finished at"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification Run",
+                "verbose_name_plural": "Notification Runs",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="NotificationChunk",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created at"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Updated at"),
+                ),
+                ("start_id", models.PositiveBigIntegerField(verbose_name="Start id")),
+                ("end_id", models.PositiveBigIntegerField(verbose_name="End id")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                        verbose_name="Status",
+                    ),
+                ),
+                (
+                    "planned_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Planned"),
+                ),
+                (
+                    "sent_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Sent"),
+                ),
+                (
+                    "failed_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Failed"),
+                ),
+                (
+                    "skipped_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Skipped"),
+                ),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Started at"
+                    ),
+                ),
+                (
+                    "run",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chunks",
+                        to="notification.notificationrun",
+                        verbose_name="Run",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification Chunk",
+                "verbose_name_plural": "Notification Chunks",
+                "ordering": ["run", "start_id"],
+                "unique_together": {("run", "start_id")},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-19 06:31
+
+from django.db import migrations
+
+
+def remove_hourly_challenge_notification_tasks(apps, schema_editor):
+    # The database scheduler keeps the periodic tasks that were removed from
+    # CELERY_BEAT_SCHEDULE, and the task they call no longer exists
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(
+        task="apps.notification.tasks.send_challenge_notifications"
+    ).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+        ("notification", "0003_notification_runs"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_hourly_challenge_notification_tasks, migrations.RunPython.noop
+        ),
+    ]
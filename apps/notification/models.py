@@ -113,3 +113,95 @@ class NotificationLog(BaseModel):
         verbose_name = _("Notification Log")
         verbose_name_plural = _("Notification Logs")
         ordering = ["-sent_at"]
+        indexes = [
+            # Notifications already sent, loaded per type and day by the
+            # notification tasks
+            models.Index(
+                fields=["notification_type", "sent_at", "user"],
+                condition=models.Q(is_sent=True),
+                name="notification_sent_idx",
+            ),
+        ]
+
+
+class NotificationRun(BaseModel):
+    """
+    One run of a notification task. Its audience is split into chunks of
+    participation ids sent by separate tasks, so a run can be followed and
+    resumed where it stopped.
+    """
+
+    kind = models.CharField(
+        _("Kind"),
+        max_length=50,
+        choices=[
+            ("challenge", _("Challenge")),
+            ("super_challenge_general", _("Super Challenge General")),
+            ("super_challenge_progress", _("Super Challenge Progress")),
+        ],
+    )
+    # Identifies the run of a kind, so a task started twice resumes it
+    key = models.CharField(_("Key"), max_length=255, unique=True)
+    run_date = models.DateField(_("Run date"))
+    parameters = models.JSONField(_("Parameters"), default=dict, blank=True)
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=[
+            ("running", _("Running")),
+            ("completed", _("Completed")),
+        ],
+        default="running",
+    )
+    planned_count = models.PositiveIntegerField(_("Planned"), default=0)
+    sent_count = models.PositiveIntegerField(_("Sent"), default=0)
+    failed_count = models.PositiveIntegerField(_("Failed"), default=0)
+    skipped_count = models.PositiveIntegerField(_("Skipped"), default=0)
+    finished_at = models.DateTimeField(_("Finished at"), null=True, blank=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        verbose_name = _("Notification Run")
+        verbose_name_plural = _("Notification Runs")
+        ordering = ["-created_at"]
+
+
+class NotificationChunk(BaseModel):
+    """
+    Participations of a run with ids in [start_id, end_id), sent by one task.
+    """
+
+    run = models.ForeignKey(
+        NotificationRun,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+        verbose_name=_("Run"),
+    )
+    start_id = models.PositiveBigIntegerField(_("Start id"))
+    end_id = models.PositiveBigIntegerField(_("End id"))
+    status = models.CharField(
+        _("Status"),
+        max_length=20,
+        choices=[
+            ("pending", _("Pending")),
+            ("running", _("Running")),
+            ("completed", _("Completed")),
+        ],
+        default="pending",
+    )
+    planned_count = models.PositiveIntegerField(_("Planned"), default=0)
+    sent_count = models.PositiveIntegerField(_("Sent"), default=0)
+    failed_count = models.PositiveIntegerField(_("Failed"), default=0)
+    skipped_count = models.PositiveIntegerField(_("Skipped"), default=0)
+    started_at = models.DateTimeField(_("Started at"), null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.run} [{self.start_id}, {self.end_id})"
+
+    class Meta:
+        verbose_name = _("Notification Chunk")
+        verbose_name_plural = _("Notification Chunks")
+        ordering = ["run", "start_id"]
+        unique_together = ["run", "start_id"]
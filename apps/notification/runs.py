@@ -0,0 +1,271 @@
+"""
+Notification runs: the audience of a notification task split into chunks of
+participation ids, each sent by its own task on the "notifications" queue.
+
+Chunks record what they sent and the run adds their counts up. A chunk left
+unfinished by a lost worker is queued again once it's stale (see
+get_stale_chunks); the users it had already notified are skipped by the
+sent-today dedupe.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.main.models import UserChallenge, UserSuperChallenge
+from apps.notification.models import NotificationChunk, NotificationRun
+from apps.notification.utils import (
+    load_challenge_notification_context,
+    load_super_challenge_notification_context,
+    prepare_challenge_notification,
+    prepare_super_challenge_general_notification,
+    prepare_super_challenge_progress_notification,
+    send_notifications,
+    should_send_challenge_notification,
+)
+
+# Participations sent by one chunk task
+NOTIFICATION_RUN_CHUNK_SIZE = 1000
+
+# Stale chunks of runs planned longer ago than this are left unfinished,
+# their notifications would arrive too late
+STALE_CHUNK_MAX_AGE = timezone.timedelta(hours=6)
+
+
+def challenge_audience(run):
+    """
+    Active participations in the challenges starting at the run's start
+    time, of the users in the run's timezones (see schedule.py)
+    """
+    users = Q(user__timezone_id__in=run.parameters["timezone_ids"])
+    if run.parameters["default_timezone"]:
+        users |= Q(user__timezone__isnull=True)
+    return UserChallenge.objects.filter(
+        users,
+        is_active=True,
+        challenge__notification_template__is_active=True,
+        challenge__start_time=run.parameters["start_time"],
+    )
+
+
+def prepare_challenge_messages(user_challenges, run):
+    # Templates, the chunk's sent notifications and rendered messages, once
+    # per chunk. Notifications are deduped on the users' local day
+    user_challenges = list(user_challenges.select_related("user", "challenge"))
+    context = load_challenge_notification_context(
+        run.run_date,
+        run.parameters["utc_offset"],
+        user_ids={user_challenge.user_id for user_challenge in user_challenges},
+    )
+    messages = []
+    for user_challenge in user_challenges:
+        if should_send_challenge_notification(
+            user_challenge, context.sent_notifications
+        ):
+            message = prepare_challenge_notification(user_challenge, context)
+            if message:
+                messages.append(message)
+    return messages
+
+
+def super_challenge_general_audience(run):
+    """
+    Participations in the super challenges running on the run's date
+    """
+    return UserSuperChallenge.objects.filter(
+        is_active=True,
+        is_failed=False,
+        super_challenge__notification_template__is_active=True,
+        super_challenge__start_date__lte=run.run_date,
+        super_challenge__end_date__gte=run.run_date,
+    )
+
+
+def prepare_super_challenge_general_messages(user_super_challenges, run):
+    user_super_challenges = list(
+        user_super_challenges.select_related("user", "super_challenge")
+    )
+    context = load_super_challenge_notification_context(
+        ["super_challenge_general"],
+        user_ids={participation.user_id for participation in user_super_challenges},
+    )
+    messages = []
+    for user_super_challenge in user_super_challenges:
+        message = prepare_super_challenge_general_notification(
+            user_super_challenge, context
+        )
+        if message:
+            messages.append(message)
+    return messages
+
+
+def super_challenge_progress_audience(run):
+    """
+    Active and failed participations in the super challenges that were
+    running the day before the run's date
+    """
+    previous_date = run.run_date - timezone.timedelta(days=1)
+    return UserSuperChallenge.objects.filter(
+        Q(is_active=True) | Q(is_failed=True),
+        super_challenge__notification_template__is_active=True,
+        super_challenge__start_date__lte=previous_date,
+        super_challenge__end_date__gte=previous_date,
+    )
+
+
+def prepare_super_challenge_progress_messages(user_super_challenges, run):
+    # The previous day's completions are loaded with the templates
+    previous_date = run.run_date - timezone.timedelta(days=1)
+    user_super_challenges = list(
+        user_super_challenges.select_related("user", "super_challenge")
+    )
+    context = load_super_challenge_notification_context(
+        ["super_challenge_warning", "super_challenge_failure"],
+        previous_date,
+        user_ids={participation.user_id for participation in user_super_challenges},
+    )
+    messages = []
+    for user_super_challenge in user_super_challenges:
+        # Only users who didn't complete all challenges yesterday
+        if not context.is_completed(user_super_challenge):
+            message = prepare_super_challenge_progress_notification(
+                user_super_challenge, context
+            )
+            if message:
+                messages.append(message)
+    return messages
+
+
+# Run kind -> (audience queryset of a run, messages of a chunk's participations)
+NOTIFICATION_RUN_KINDS = {
+    "challenge": (challenge_audience, prepare_challenge_messages),
+    "super_challenge_general": (
+        super_challenge_general_audience,
+        prepare_super_challenge_general_messages,
+    ),
+    "super_challenge_progress": (
+        super_challenge_progress_audience,
+        prepare_super_challenge_progress_messages,
+    ),
+}
+
+
+def get_or_plan_run(kind, key, run_date, parameters=None):
+    """
+    Get the run identified by `key`, planning it if it doesn't exist yet:
+    its audience ids are split into chunks of NOTIFICATION_RUN_CHUNK_SIZE.
+    """
+    with transaction.atomic():
+        run, created = NotificationRun.objects.get_or_create(
+            key=key,
+            defaults={
+                "kind": kind,
+                "run_date": run_date,
+                "parameters": parameters or {},
+            },
+        )
+        if not created:
+            return run
+
+        audience, _ = NOTIFICATION_RUN_KINDS[kind]
+        ids = list(audience(run).order_by("id").values_list("id", flat=True))
+        chunks = []
+        for start in range(0, len(ids), NOTIFICATION_RUN_CHUNK_SIZE):
+            chunk_ids = ids[start : start + NOTIFICATION_RUN_CHUNK_SIZE]
+            chunks.append(
+                NotificationChunk(
+                    run=run,
+                    start_id=chunk_ids[0],
+                    end_id=chunk_ids[-1] + 1,
+                    planned_count=len(chunk_ids),
+                )
+            )
+        NotificationChunk.objects.bulk_create(chunks)
+
+        run.planned_count = len(ids)
+        if not chunks:
+            run.status = "completed"
+            run.finished_at = timezone.now()
+        run.save(update_fields=["planned_count", "status", "finished_at"])
+    return run
+
+
+def get_stale_time(now):
+    """
+    Chunks started before this have been running for longer than a task may
+    run, their worker having been lost
+    """
+    return now - timezone.timedelta(seconds=settings.CELERY_TASK_TIME_LIMIT)
+
+
+def get_stale_chunks(now=None):
+    """
+    Chunks left running by a lost worker, in runs planned within
+    STALE_CHUNK_MAX_AGE.
+
+    The task redelivered when a worker is lost finds its chunk still running
+    and not yet stale, so it is dropped by claim_chunk: these chunks are
+    queued again by schedule_challenge_notifications.
+    """
+    now = now or timezone.now()
+    return NotificationChunk.objects.filter(
+        status="running",
+        started_at__lt=get_stale_time(now),
+        run__created_at__gte=now - STALE_CHUNK_MAX_AGE,
+    )
+
+
+def claim_chunk(chunk_id):
+    """
+    Mark the chunk as running and return it, or None if it's completed or
+    another worker is sending it. A stale chunk is taken over.
+    """
+    now = timezone.now()
+    claimed = NotificationChunk.objects.filter(
+        Q(status="pending") | Q(status="running", started_at__lt=get_stale_time(now)),
+        id=chunk_id,
+    ).update(status="running", started_at=now)
+    if not claimed:
+        return None
+    return NotificationChunk.objects.select_related("run").get(id=chunk_id)
+
+
+def send_chunk(chunk):
+    """
+    Send the notifications due to the chunk's participations and record the
+    counts on the chunk and its run.
+
+    Returns:
+        int: Number of notifications sent successfully
+    """
+    run = chunk.run
+    audience, prepare_messages = NOTIFICATION_RUN_KINDS[run.kind]
+    participations = audience(run).filter(id__gte=chunk.start_id, id__lt=chunk.end_id)
+    messages = prepare_messages(participations, run)
+    sent_count = send_notifications(messages)
+    counts = {
+        "sent_count": sent_count,
+        "failed_count": len(messages) - sent_count,
+        # Participations with nothing due, or gone since the run was planned
+        "skipped_count": max(chunk.planned_count - len(messages), 0),
+    }
+
+    with transaction.atomic():
+        # Chunks of a run finish one at a time, so exactly one sees them all
+        # completed
+        run = NotificationRun.objects.select_for_update().get(id=run.id)
+        completed = NotificationChunk.objects.filter(
+            id=chunk.id, status="running", started_at=chunk.started_at
+        ).update(status="completed", **counts)
+        if not completed:
+            # Taken over by another worker, which records the counts
+            return sent_count
+
+        NotificationRun.objects.filter(id=run.id).update(
+            **{field: F(field) + count for field, count in counts.items()}
+        )
+        if not run.chunks.exclude(status="completed").exists():
+            NotificationRun.objects.filter(id=run.id).update(
+                status="completed", finished_at=timezone.now()
+            )
+    return sent_count
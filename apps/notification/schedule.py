@@ -0,0 +1,116 @@
+"""
+Local-time scheduling of challenge reminders.
+
+Users are bucketed by the current UTC offset of their timezone, which follows
+daylight saving time, and the start time of their challenges. The scheduler
+runs every CHALLENGE_SLOT_MINUTES and starts a notification run for each
+bucket whose local start time falls in the current slot, so every user is
+reminded at their own local time and the sends are spread over the day.
+"""
+import datetime
+import re
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+
+from apps.main.models import Challenge
+from apps.users.models import Timezone
+
+# Offset of users without a (valid) timezone: Asia/Tashkent, the default
+# timezone given to new users
+DEFAULT_UTC_OFFSET = 5 * 60
+
+# Length of a scheduling slot, the interval the scheduler runs at
+CHALLENGE_SLOT_MINUTES = 5
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_utc_offset(offset):
+    """
+    Timezone.offset ("+05:30") -> minutes east of UTC, None if malformed
+    """
+    match = re.fullmatch(r"([+-])(\d{1,2}):?(\d{2})", (offset or "").strip())
+    if not match:
+        return None
+    sign, hours, minutes = match.groups()
+    minutes = int(hours) * 60 + int(minutes)
+    return -minutes if sign == "-" else minutes
+
+
+def get_current_utc_offset(name, offset, now):
+    """
+    Minutes east of UTC of a timezone at `now`: from its IANA name, so
+    daylight saving time is followed, or else from its stored offset.
+    None if neither is usable.
+    """
+    try:
+        utc_offset = ZoneInfo(name).utcoffset(now)
+    except (ZoneInfoNotFoundError, TypeError, ValueError):
+        return parse_utc_offset(offset)
+    return int(utc_offset.total_seconds()) // 60
+
+
+def get_offset_timezones(now=None):
+    """
+    {offset minutes: timezone ids} of the stored timezones at `now` (default:
+    the current time). Timezones without a usable name or offset are counted
+    in the default offset.
+    """
+    now = now or timezone.now()
+    offsets = {DEFAULT_UTC_OFFSET: []}
+    for timezone_id, name, offset in Timezone.objects.values_list(
+        "id", "name", "offset"
+    ):
+        minutes = get_current_utc_offset(name, offset, now)
+        if minutes is None:
+            minutes = DEFAULT_UTC_OFFSET
+        offsets.setdefault(minutes, []).append(timezone_id)
+    return offsets
+
+
+def get_slot_start(now=None):
+    """
+    Start of the scheduling slot `now` (default: the current time) falls in
+    """
+    now = now or timezone.now()
+    return now.replace(
+        minute=now.minute - now.minute % CHALLENGE_SLOT_MINUTES,
+        second=0,
+        microsecond=0,
+    )
+
+
+def get_due_challenge_buckets(slot_start):
+    """
+    Buckets of users to remind in the slot starting at `slot_start`: the
+    offsets and challenge start times for which the start time, in local
+    time, falls in the slot.
+
+    Returns:
+        list: (offset minutes, timezone ids, start_time, local date) tuples;
+            the default offset's bucket also holds the users without a
+            timezone
+    """
+    start_times = set(
+        Challenge.objects.filter(notification_template__is_active=True)
+        .values_list("start_time", flat=True)
+        .distinct()
+    )
+    if not start_times:
+        return []
+
+    slot_start = slot_start.astimezone(datetime.timezone.utc)
+    buckets = []
+    for offset, timezone_ids in get_offset_timezones(slot_start).items():
+        local_start = slot_start + timezone.timedelta(minutes=offset)
+        local_minute = local_start.hour * 60 + local_start.minute
+        for start_time in start_times:
+            # Minutes from the slot start to the start time, across midnight
+            delay = (
+                start_time.hour * 60 + start_time.minute - local_minute
+            ) % MINUTES_PER_DAY
+            if delay < CHALLENGE_SLOT_MINUTES:
+                local_date = (local_start + timezone.timedelta(minutes=delay)).date()
+                buckets.append((offset, timezone_ids, start_time, local_date))
+    return buckets
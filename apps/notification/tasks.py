@@ -1,67 +1,90 @@
 import logging
 
 from celery import shared_task
-from django.db.models import Q
 from django.utils import timezone
 
-from apps.main.models import UserChallenge, UserSuperChallenge
-from apps.notification.utils import (
-    send_challenge_notification,
-    send_super_challenge_general_notification,
-    send_super_challenge_progress_notification,
-    should_send_challenge_notification,
+from apps.notification.runs import (
+    claim_chunk,
+    get_or_plan_run,
+    get_stale_chunks,
+    send_chunk,
+)
+from apps.notification.schedule import (
+    DEFAULT_UTC_OFFSET,
+    get_due_challenge_buckets,
+    get_slot_start,
 )
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def send_challenge_notifications():
+def start_notification_run(kind, key, run_date, parameters=None):
     """
-    Send notifications for all active challenges.
-    This task is scheduled to run at specific times (05:00, 19:00 and 20:00).
-    It will only send notifications for challenges that start at the current hour.
+    Plan the run (or get it, if it was started before) and queue its
+    unfinished chunks
     """
-    logger.info("Starting challenge notification task")
-
-    # Get current hour
-    current_hour = timezone.localtime().hour
-
-    # Map scheduled task hours to challenge start times
-    # This handles the case where the task runs at 21:00 but we want to notify for 20:00 challenges
-    notification_hour_mapping = {
-        5: 5,  # 05:00 task notifies for 05:00 challenges
-        19: 19,  # 19:00 task notifies for 19:00 challenges
-        20: 20,  # 20:00 task notifies for 20:00 challenges
-    }
+    run = get_or_plan_run(kind, key, run_date, parameters)
+    queue_notification_chunks(run)
+    logger.info(
+        f"Notification run {run.key}: {run.planned_count} planned, {run.status}"
+    )
+    return run
 
-    # Get the target hour for challenge start times
-    target_hour = notification_hour_mapping.get(current_hour)
 
-    if target_hour is None:
-        logger.warning(f"No target hour mapping for current hour {current_hour}")
-        return 0
+def queue_notification_chunks(run):
+    """
+    Queue a task for every chunk of the run that hasn't completed. Chunks
+    being sent by a live worker are left to it by claim_chunk.
+    """
+    chunk_ids = run.chunks.exclude(status="completed").values_list("id", flat=True)
+    for chunk_id in chunk_ids:
+        send_notification_chunk.delay(chunk_id)
+    return len(chunk_ids)
 
-    logger.info(f"Sending notifications for challenges starting at {target_hour}:00")
 
-    # Get all active user challenges with the matching start time hour
-    user_challenges = UserChallenge.objects.filter(
-        is_active=True,
-        challenge__notification_template__is_active=True,
-        challenge__start_time__hour=target_hour,
-    ).select_related("user", "challenge", "challenge__notification_template")
+def requeue_stale_chunks():
+    """
+    Queue a task for every chunk left running by a lost worker, of any run
+    """
+    chunk_ids = list(get_stale_chunks().values_list("id", flat=True))
+    for chunk_id in chunk_ids:
+        send_notification_chunk.delay(chunk_id)
+    if chunk_ids:
+        logger.warning(f"Requeued {len(chunk_ids)} stale notification chunks")
+    return len(chunk_ids)
 
-    sent_count = 0
-    for user_challenge in user_challenges:
-        if should_send_challenge_notification(user_challenge):
-            success = send_challenge_notification(user_challenge)
-            if success:
-                sent_count += 1
 
-    logger.info(
-        f"Sent {sent_count} challenge notifications for {target_hour}:00 challenges"
-    )
-    return sent_count
+@shared_task
+def schedule_challenge_notifications():
+    """
+    Start the challenge notification runs due in the current slot.
+    This task is scheduled to run every CHALLENGE_SLOT_MINUTES minutes.
+    Each run covers the users of one UTC offset whose challenges start, in
+    their local time, during the slot. Stale chunks of earlier runs are
+    queued again.
+    """
+    requeue_stale_chunks()
+
+    slot_start = get_slot_start()
+    buckets = get_due_challenge_buckets(slot_start)
+
+    run_ids = []
+    for offset, timezone_ids, start_time, local_date in buckets:
+        run = start_notification_run(
+            "challenge",
+            key=f"challenge:{local_date}:{start_time:%H:%M}:{offset:+d}",
+            run_date=local_date,
+            parameters={
+                "utc_offset": offset,
+                "timezone_ids": timezone_ids,
+                "default_timezone": offset == DEFAULT_UTC_OFFSET,
+                "start_time": start_time.isoformat(),
+            },
+        )
+        run_ids.append(run.id)
+
+    logger.info(f"Started {len(run_ids)} challenge notification runs at {slot_start}")
+    return run_ids
 
 
 @shared_task
@@ -75,25 +98,12 @@ def send_super_challenge_general_notifications():
     # Get current date
     current_date = timezone.localtime().date()
 
-    # Get all active user super challenges
-    user_super_challenges = UserSuperChallenge.objects.filter(
-        is_active=True,
-        is_failed=False,
-        super_challenge__notification_template__is_active=True,
-        super_challenge__start_date__lte=current_date,
-        super_challenge__end_date__gte=current_date,
-    ).select_related(
-        "user", "super_challenge", "super_challenge__notification_template"
+    run = start_notification_run(
+        "super_challenge_general",
+        key=f"super_challenge_general:{current_date}",
+        run_date=current_date,
     )
-
-    sent_count = 0
-    for user_super_challenge in user_super_challenges:
-        success = send_super_challenge_general_notification(user_super_challenge)
-        if success:
-            sent_count += 1
-
-    logger.info(f"Sent {sent_count} super challenge general notifications")
-    return sent_count
+    return run.id
 
 
 @shared_task
@@ -104,29 +114,31 @@ def send_super_challenge_progress_notifications():
     """
     logger.info("Starting super challenge progress notification task")
 
-    # Get current date and previous date
+    # Get current date, the run checks the previous day's completions
     current_date = timezone.localtime().date()
-    previous_date = current_date - timezone.timedelta(days=1)
-
-    # Get all active user super challenges
-    user_super_challenges = UserSuperChallenge.objects.filter(
-        Q(is_active=True) | Q(is_failed=True),
-        super_challenge__notification_template__is_active=True,
-        super_challenge__start_date__lte=previous_date,
-        super_challenge__end_date__gte=previous_date,
-    ).select_related(
-        "user", "super_challenge", "super_challenge__notification_template"
+
+    run = start_notification_run(
+        "super_challenge_progress",
+        key=f"super_challenge_progress:{current_date}",
+        run_date=current_date,
     )
+    return run.id
+
+
+# Acknowledged once done, so a chunk in flight when its worker is lost is
+# delivered again. That delivery usually finds the chunk still running and
+# is dropped; requeue_stale_chunks sends it once stale.
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def send_notification_chunk(chunk_id):
+    """
+    Send the notifications of one chunk of a notification run.
+    Routed to the "notifications" queue.
+    """
+    chunk = claim_chunk(chunk_id)
+    if chunk is None:
+        logger.info(f"Notification chunk {chunk_id} is completed or being sent")
+        return 0
 
-    sent_count = 0
-    for user_super_challenge in user_super_challenges:
-        # Check if user completed all challenges yesterday
-        # We'll need to modify the is_completed_today method to accept a date parameter
-        if not user_super_challenge.is_completed_for_date(previous_date):
-            # Send progress notification
-            success = send_super_challenge_progress_notification(user_super_challenge)
-            if success:
-                sent_count += 1
-
-    logger.info(f"Sent {sent_count} super challenge progress notifications")
+    sent_count = send_chunk(chunk)
+    logger.info(f"Notification chunk {chunk_id} of {chunk.run.key}: sent {sent_count}")
     return sent_count
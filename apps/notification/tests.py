@@ -0,0 +1,343 @@
+import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.main.models import Challenge, SuperChallenge, UserSuperChallenge
+from apps.notification.models import (
+    ChallengeNotificationTemplate,
+    NotificationChunk,
+    NotificationLog,
+    NotificationRun,
+    SuperChallengeNotificationTemplate,
+)
+from apps.notification.runs import claim_chunk, get_or_plan_run, send_chunk
+from apps.notification.schedule import (
+    DEFAULT_UTC_OFFSET,
+    get_due_challenge_buckets,
+    get_slot_start,
+)
+from apps.notification.tasks import requeue_stale_chunks
+from apps.notification.utils import (
+    get_sent_notifications,
+    load_super_challenge_notification_context,
+)
+from apps.users.models import Timezone, User
+
+
+@mock.patch("apps.notification.runs.NOTIFICATION_RUN_CHUNK_SIZE", 2)
+class NotificationRunTests(TestCase):
+    """
+    A run is planned once into chunks, each chunk is sent by one worker, and
+    the run completes with its chunks' counts added up.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        cls.super_challenge = SuperChallenge.objects.create(
+            title="Super Challenge",
+            icon="super_challenge_icons/icon.png",
+            start_date=today - datetime.timedelta(days=1),
+            end_date=today + datetime.timedelta(days=1),
+        )
+        SuperChallengeNotificationTemplate.objects.create(
+            super_challenge=cls.super_challenge,
+            general_message="General",
+            progress_warning_message="Warning",
+            failure_message="Failure",
+        )
+        for index in range(5):
+            user = User.objects.create(
+                username=f"user{index}",
+                telegram_id=index + 1,
+                is_telegram_channel_member=True,
+            )
+            UserSuperChallenge.objects.create(
+                user=user, super_challenge=cls.super_challenge
+            )
+
+    def plan(self):
+        return get_or_plan_run(
+            "super_challenge_general",
+            key="super_challenge_general:test",
+            run_date=timezone.localdate(),
+        )
+
+    def test_run_is_planned_once(self):
+        run = self.plan()
+        self.assertEqual(run.planned_count, 5)
+        self.assertEqual(
+            [chunk.planned_count for chunk in run.chunks.order_by("start_id")],
+            [2, 2, 1],
+        )
+
+        self.assertEqual(self.plan().id, run.id)
+        self.assertEqual(NotificationChunk.objects.count(), 3)
+
+    def test_chunk_is_claimed_once(self):
+        chunk = self.plan().chunks.first()
+        self.assertEqual(claim_chunk(chunk.id).id, chunk.id)
+        self.assertIsNone(claim_chunk(chunk.id))
+
+    @mock.patch("apps.notification.runs.send_notifications")
+    def test_run_completes_with_chunk_counts(self, send_notifications):
+        # One notification of each chunk fails
+        send_notifications.side_effect = lambda messages: len(messages) - 1
+        run = self.plan()
+
+        for chunk in run.chunks.all():
+            self.assertEqual(run.status, "running")
+            send_chunk(claim_chunk(chunk.id))
+            run.refresh_from_db()
+            self.assertIsNone(claim_chunk(chunk.id))
+
+        self.assertEqual(run.status, "completed")
+        self.assertEqual((run.sent_count, run.failed_count), (2, 3))
+
+    @mock.patch("apps.notification.runs.send_notifications")
+    def test_chunk_taken_over_is_not_counted_twice(self, send_notifications):
+        send_notifications.side_effect = len
+        chunk = claim_chunk(self.plan().chunks.first().id)
+        # Taken over by another worker while this one was sending
+        NotificationChunk.objects.filter(id=chunk.id).update(started_at=timezone.now())
+
+        send_chunk(chunk)
+        chunk.refresh_from_db()
+        self.assertEqual(chunk.status, "running")
+        self.assertEqual(chunk.run.sent_count, 0)
+
+
+class StaleChunkTests(TestCase):
+    """
+    A chunk whose worker was lost is taken over once it has been running
+    for longer than a task may run.
+    """
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.run = NotificationRun.objects.create(
+            kind="challenge", key="challenge:test", run_date=self.now.date()
+        )
+
+    def create_chunk(self, status, running_for=None):
+        started_at = None
+        if running_for is not None:
+            started_at = self.now - running_for
+        start_id = self.run.chunks.count() + 1
+        return NotificationChunk.objects.create(
+            run=self.run,
+            start_id=start_id,
+            end_id=start_id + 1,
+            planned_count=1,
+            status=status,
+            started_at=started_at,
+        )
+
+    def stale_age(self):
+        return datetime.timedelta(seconds=settings.CELERY_TASK_TIME_LIMIT + 60)
+
+    def test_running_chunk_is_claimed_once_stale(self):
+        running = self.create_chunk("running", datetime.timedelta(minutes=1))
+        stale = self.create_chunk("running", self.stale_age())
+
+        self.assertIsNone(claim_chunk(running.id))
+        self.assertEqual(claim_chunk(stale.id).id, stale.id)
+        # Now running again, under the new claim
+        self.assertIsNone(claim_chunk(stale.id))
+
+    @mock.patch("apps.notification.tasks.send_notification_chunk")
+    def test_stale_chunks_are_requeued(self, send_notification_chunk):
+        stale = self.create_chunk("running", self.stale_age())
+        self.create_chunk("running", datetime.timedelta(minutes=1))
+        self.create_chunk("pending")
+        self.create_chunk("completed", self.stale_age())
+
+        with self.assertLogs("apps.notification.tasks", "WARNING"):
+            self.assertEqual(requeue_stale_chunks(), 1)
+        send_notification_chunk.delay.assert_called_once_with(stale.id)
+
+    @mock.patch("apps.notification.tasks.send_notification_chunk")
+    def test_stale_chunks_of_old_runs_are_left(self, send_notification_chunk):
+        self.create_chunk("running", self.stale_age())
+        NotificationRun.objects.filter(id=self.run.id).update(
+            created_at=self.now - datetime.timedelta(days=1)
+        )
+
+        self.assertEqual(requeue_stale_chunks(), 0)
+        send_notification_chunk.delay.assert_not_called()
+
+
+class SentNotificationTests(TestCase):
+    """
+    The sent-notification dedupe loads only the logs that can still
+    suppress a notification of the chunk's users.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.super_challenge = SuperChallenge.objects.create(
+            title="Super Challenge",
+            icon="super_challenge_icons/icon.png",
+            start_date=cls.today - datetime.timedelta(days=10),
+            end_date=cls.today + datetime.timedelta(days=10),
+        )
+        SuperChallengeNotificationTemplate.objects.create(
+            super_challenge=cls.super_challenge,
+            general_message="General",
+            progress_warning_message="Warning",
+            failure_message="Failure",
+        )
+        cls.users = User.objects.bulk_create(
+            User(username=f"user{index}") for index in range(3)
+        )
+
+    def log(self, user, notification_type, days_ago=0):
+        notification_log = NotificationLog.objects.create(
+            user=user,
+            super_challenge=self.super_challenge,
+            message="Message",
+            notification_type=notification_type,
+            is_sent=True,
+        )
+        # sent_at is set on creation
+        NotificationLog.objects.filter(id=notification_log.id).update(
+            sent_at=timezone.now() - datetime.timedelta(days=days_ago)
+        )
+
+    def key(self, user, notification_type):
+        return (user.id, self.super_challenge.id, notification_type)
+
+    def test_only_the_given_users(self):
+        for user in self.users:
+            self.log(user, "super_challenge_warning")
+
+        sent = get_sent_notifications(
+            ["super_challenge_warning"], user_ids=[self.users[0].id]
+        )
+        self.assertEqual(sent, {self.key(self.users[0], "super_challenge_warning")})
+
+    def test_failures_since_the_date(self):
+        self.log(self.users[0], "super_challenge_failure", days_ago=5)
+        self.log(self.users[1], "super_challenge_failure", days_ago=30)
+        self.log(self.users[2], "super_challenge_warning", days_ago=5)
+
+        sent = get_sent_notifications(
+            ["super_challenge_warning", "super_challenge_failure"],
+            failures_since=self.today - datetime.timedelta(days=10),
+        )
+        self.assertEqual(sent, {self.key(self.users[0], "super_challenge_failure")})
+
+    def test_failures_since_the_super_challenges_started(self):
+        self.log(self.users[0], "super_challenge_failure", days_ago=5)
+        self.log(self.users[1], "super_challenge_failure", days_ago=30)
+
+        context = load_super_challenge_notification_context(
+            ["super_challenge_warning", "super_challenge_failure"],
+            self.today - datetime.timedelta(days=1),
+        )
+        self.assertEqual(
+            context.sent_notifications,
+            {self.key(self.users[0], "super_challenge_failure")},
+        )
+
+
+class ChallengeScheduleTests(TestCase):
+    """
+    Challenge reminders are due at the start time in each user's local
+    time, following daylight saving time.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for start_time in [datetime.time(6), datetime.time(23)]:
+            challenge = Challenge.objects.create(
+                title=f"Challenge {start_time}",
+                icon="challenge_icons/icon.png",
+                video_instruction_url="https://example.com/video",
+                start_time=start_time,
+                end_time=datetime.time(23, 59),
+            )
+            ChallengeNotificationTemplate.objects.create(
+                challenge=challenge, message="Reminder"
+            )
+        cls.tashkent = Timezone.objects.create(name="Asia/Tashkent", offset="+05:00")
+        cls.kolkata = Timezone.objects.create(name="Asia/Kolkata", offset="+05:30")
+        cls.berlin = Timezone.objects.create(name="Europe/Berlin", offset="+01:00")
+        cls.new_york = Timezone.objects.create(name="America/New_York", offset="-05:00")
+        # Not an IANA name: the stored offset is used
+        cls.moscow = Timezone.objects.create(name="Moscow", offset="+03:00")
+
+    def buckets(self, slot_start):
+        return {
+            (offset, tuple(timezone_ids), start_time.hour, local_date.isoformat())
+            for offset, timezone_ids, start_time, local_date in (
+                get_due_challenge_buckets(slot_start)
+            )
+        }
+
+    def utc(self, *args):
+        return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+    def test_slot_start(self):
+        self.assertEqual(
+            get_slot_start(self.utc(2025, 7, 1, 4, 7, 30)), self.utc(2025, 7, 1, 4, 5)
+        )
+
+    def test_buckets_across_timezones(self):
+        cases = [
+            # 06:00 in Tashkent, the default timezone
+            (self.utc(2025, 1, 15, 1), {(DEFAULT_UTC_OFFSET, (self.tashkent.id,), 6)}),
+            (self.utc(2025, 1, 15, 0, 30), {(330, (self.kolkata.id,), 6)}),
+            (self.utc(2025, 1, 15, 3), {(180, (self.moscow.id,), 6)}),
+            # Berlin and New York in winter and in summer time
+            (self.utc(2025, 1, 15, 5), {(60, (self.berlin.id,), 6)}),
+            (self.utc(2025, 7, 15, 4), {(120, (self.berlin.id,), 6)}),
+            (self.utc(2025, 1, 15, 11), {(-300, (self.new_york.id,), 6)}),
+            (self.utc(2025, 7, 15, 10), {(-240, (self.new_york.id,), 6)}),
+        ]
+        for slot_start, expected in cases:
+            with self.subTest(slot_start=slot_start):
+                buckets = self.buckets(slot_start)
+                self.assertEqual(
+                    {bucket[:3] for bucket in buckets},
+                    expected,
+                )
+                # Due on the local date of the slot
+                self.assertEqual(
+                    {bucket[3] for bucket in buckets}, {slot_start.date().isoformat()}
+                )
+
+    def test_bucket_on_the_previous_local_date(self):
+        # 23:00 of January 14 in New York is 04:00 UTC on January 15
+        self.assertEqual(
+            self.buckets(self.utc(2025, 1, 15, 4)),
+            {(-300, (self.new_york.id,), 23, "2025-01-14")},
+        )
+
+    def test_slot_without_due_reminders(self):
+        self.assertEqual(self.buckets(self.utc(2025, 7, 15, 4, 5)), set())
+
+    def test_sent_notifications_on_the_local_day(self):
+        user = User.objects.create(username="user")
+        notification_log = NotificationLog.objects.create(
+            user=user,
+            challenge=Challenge.objects.first(),
+            message="Reminder",
+            notification_type="challenge",
+            is_sent=True,
+        )
+        # July 14 in New York, July 15 in UTC
+        NotificationLog.objects.filter(id=notification_log.id).update(
+            sent_at=self.utc(2025, 7, 15, 2)
+        )
+
+        for day, expected in [(14, 1), (15, 0)]:
+            with self.subTest(day=day):
+                sent = get_sent_notifications(
+                    ["challenge"], datetime.date(2025, 7, day), utc_offset=-240
+                )
+                self.assertEqual(len(sent), expected)
@@ -1,41 +1,43 @@
-import asyncio
+import datetime
 import logging
 
+from django.db.models import Min, Q
 from django.utils import timezone
 
+from apps.main.models import SuperChallenge, UserChallengeCompletion
 from apps.notification.models import (
     ChallengeNotificationTemplate,
     NotificationLog,
     SuperChallengeNotificationTemplate,
 )
+from apps.telegram_bot.dispatcher import OutgoingMessage, dispatch_chunks
 from apps.telegram_bot.models import CustomMessage
-from apps.telegram_bot.utils import send_broadcast
-from apps.users.models import User
+from apps.telegram_bot.utils import render_message
 
 logger = logging.getLogger(__name__)
 
+# Notifications sent between two NotificationLog writes
+NOTIFICATION_CHUNK_SIZE = 500
 
-def is_channel_member(telegram_id):
-    """
-    Check if a user is a member of the specified Telegram channel.
-    Uses the cached value from the database instead of making an API call.
-
-    Args:
-        telegram_id: The Telegram user ID to check
 
-    Returns:
-        bool: True if the user is a member of the channel, False otherwise
+def local_day_range(day, utc_offset=None):
+    """
+    (start, end) of a local date as aware datetimes, for range filters that
+    can use an index unlike __date lookups. The date is in the current
+    timezone, or at `utc_offset` minutes east of UTC if given.
     """
-    try:
-        user = User.objects.get(telegram_id=telegram_id)
-        return user.is_telegram_channel_member
-    except User.DoesNotExist:
-        return False
+    start = datetime.datetime.combine(day, datetime.time.min)
+    if utc_offset is None:
+        start = timezone.make_aware(start)
+    else:
+        offset = datetime.timezone(datetime.timedelta(minutes=utc_offset))
+        start = start.replace(tzinfo=offset)
+    return start, start + timezone.timedelta(days=1)
 
 
 def create_temp_message(title, message_text, is_attach_link=False):
     """
-    Create a temporary CustomMessage object for use with send_broadcast.
+    Create a temporary CustomMessage object for use with render_message.
 
     Args:
         title (str): Message title
@@ -51,175 +53,302 @@ def create_temp_message(title, message_text, is_attach_link=False):
     return message
 
 
-def send_challenge_notification(user_challenge):
+class NotificationContext:
+    """
+    What all the notifications of a task run share, resolved once per run
+    instead of once per user.
+
+    Attributes:
+        templates (dict): Active templates by challenge or super challenge id
+        sent_notifications (set): Result of get_sent_notifications
+        super_challenge_challenges (dict): Challenge ids by super challenge id
+        completed_challenges (dict): Challenge ids completed on the checked
+            date by user id
+    """
+
+    def __init__(
+        self,
+        templates,
+        sent_notifications,
+        super_challenge_challenges=None,
+        completed_challenges=None,
+    ):
+        self.templates = templates
+        self.sent_notifications = sent_notifications
+        self.super_challenge_challenges = super_challenge_challenges or {}
+        self.completed_challenges = completed_challenges or {}
+        self.payloads = {}
+
+    def render(self, target, notification_type, message_text):
+        """
+        (text, reply_markup) of a notification, rendered once per challenge
+        or super challenge and type
+        """
+        key = (target.id, notification_type)
+        if key not in self.payloads:
+            self.payloads[key] = render_message(
+                create_temp_message(
+                    title=target.title, message_text=message_text, is_attach_link=True
+                )
+            )
+        return self.payloads[key]
+
+    def is_completed(self, user_super_challenge):
+        """
+        UserSuperChallenge.is_completed_for_date for the checked date, from
+        the completions loaded up front
+        """
+        challenge_ids = self.super_challenge_challenges.get(
+            user_super_challenge.super_challenge_id, set()
+        )
+        completed = self.completed_challenges.get(user_super_challenge.user_id, set())
+        return challenge_ids <= completed
+
+
+def load_challenge_notification_context(day=None, utc_offset=None, user_ids=None):
+    """
+    NotificationContext of a challenge notification run.
+
+    Args:
+        day (date): The users' local date, default today
+        utc_offset (int): The users' UTC offset in minutes, default the
+            current timezone's
+        user_ids (iterable): Users whose sent notifications are loaded,
+            default all
+    """
+    templates = ChallengeNotificationTemplate.objects.filter(is_active=True)
+    return NotificationContext(
+        templates={template.challenge_id: template for template in templates},
+        sent_notifications=get_sent_notifications(
+            ["challenge"], day, utc_offset, user_ids=user_ids
+        ),
+    )
+
+
+def load_super_challenge_notification_context(
+    notification_types, check_date=None, user_ids=None
+):
+    """
+    NotificationContext of a super challenge notification run.
+
+    Args:
+        notification_types (list): Notification types the run may send
+        check_date (date): Date whose completions are loaded, if any
+        user_ids (iterable): Users whose sent notifications are loaded,
+            default all
+    """
+    templates = {
+        template.super_challenge_id: template
+        for template in SuperChallengeNotificationTemplate.objects.filter(
+            is_active=True
+        )
+    }
+    super_challenge_ids = list(templates)
+    failures_since = None
+    if "super_challenge_failure" in notification_types:
+        # A failure notification is sent once per participation, so only
+        # those since the running super challenges started matter
+        failures_since = SuperChallenge.objects.filter(
+            id__in=super_challenge_ids,
+            start_date__lte=check_date or timezone.localdate(),
+            end_date__gte=check_date or timezone.localdate(),
+        ).aggregate(start_date=Min("start_date"))["start_date"]
+    context = NotificationContext(
+        templates=templates,
+        sent_notifications=get_sent_notifications(
+            notification_types, user_ids=user_ids, failures_since=failures_since
+        ),
+    )
+    if check_date is not None:
+        (
+            context.super_challenge_challenges,
+            context.completed_challenges,
+        ) = get_super_challenge_completions(super_challenge_ids, check_date)
+    return context
+
+
+def make_outgoing_message(notification_log, user, payload):
+    """
+    OutgoingMessage of a notification, keyed by its unsaved NotificationLog
+    """
+    text, reply_markup = payload
+    return OutgoingMessage(notification_log, user.telegram_id, text, reply_markup)
+
+
+def send_notifications(messages):
+    """
+    Send prepared notifications and record them in NotificationLog.
+
+    Messages go out in chunks, all through one dispatch: the chunk's logs
+    are inserted in one query before it is sent, so an interrupted run still
+    shows what was attempted, and its outcomes are written with two more
+    once it is done.
+
+    Args:
+        messages (list): OutgoingMessage objects keyed by their unsaved
+            NotificationLog
+
+    Returns:
+        int: Number of notifications sent successfully
+    """
+
+    def logged_chunks():
+        for start in range(0, len(messages), NOTIFICATION_CHUNK_SIZE):
+            chunk = messages[start : start + NOTIFICATION_CHUNK_SIZE]
+            NotificationLog.objects.bulk_create([message.key for message in chunk])
+            yield chunk
+
+    sent_count = 0
+    for results in dispatch_chunks(logged_chunks()):
+        sent_ids, failed = [], []
+        for message, error in results:
+            notification_log = message.key
+            if error is None:
+                sent_ids.append(notification_log.id)
+            else:
+                notification_log.error_message = str(error)
+                failed.append(notification_log)
+
+        NotificationLog.objects.filter(id__in=sent_ids).update(is_sent=True)
+        NotificationLog.objects.bulk_update(failed, ["error_message"])
+        sent_count += len(sent_ids)
+    return sent_count
+
+
+def prepare_challenge_notification(user_challenge, context):
     """
-    Send a notification for a challenge to a user.
+    Prepare a notification for a challenge to a user.
 
     Args:
         user_challenge (UserChallenge): User challenge object
+        context (NotificationContext): The run's shared state
 
     Returns:
-        bool: True if notification was sent successfully, False otherwise
+        OutgoingMessage: The message to send with send_notifications,
+            None if no notification is due
     """
     user = user_challenge.user
     challenge = user_challenge.challenge
 
     # Skip if user doesn't have a Telegram ID
     if not user.telegram_id:
-        return False
+        return None
 
     # Skip if user is not a channel member
-    if not is_channel_member(user.telegram_id):
+    if not user.is_telegram_channel_member:
         logger.info(f"Skipping notification for user {user.id} - not a channel member")
-        return False
+        return None
 
     # Get notification template
-    try:
-        template = ChallengeNotificationTemplate.objects.get(
-            challenge=challenge, is_active=True
-        )
-    except ChallengeNotificationTemplate.DoesNotExist:
+    template = context.templates.get(challenge.id)
+    if template is None:
         logger.warning(f"No active notification template for challenge {challenge.id}")
-        return False
+        return None
 
-    # Create notification log
-    notification_log = NotificationLog.objects.create(
+    # Notification log, saved with the others when the batch is sent
+    notification_log = NotificationLog(
         user=user,
         challenge=challenge,
         message=template.message,
         notification_type="challenge",
     )
 
-    # Create temporary message object
-    temp_message = create_temp_message(
-        title=challenge.title, message_text=template.message, is_attach_link=True
-    )
-
-    # Send notification
-    try:
-        asyncio.run(send_broadcast(user.telegram_id, temp_message))
-        notification_log.is_sent = True
-        notification_log.save()
-        return True
-    except Exception as e:
-        notification_log.error_message = str(e)
-        notification_log.save()
-        logger.error(f"Error sending challenge notification: {str(e)}")
-        return False
+    payload = context.render(challenge, "challenge", template.message)
+    return make_outgoing_message(notification_log, user, payload)
 
 
-def send_super_challenge_general_notification(user_super_challenge):
+def prepare_super_challenge_general_notification(user_super_challenge, context):
     """
-    Send a general notification for a super challenge to a user.
+    Prepare a general notification for a super challenge to a user.
 
     Args:
         user_super_challenge (UserSuperChallenge): User super challenge object
+        context (NotificationContext): The run's shared state
 
     Returns:
-        bool: True if notification was sent successfully, False otherwise
+        OutgoingMessage: The message to send with send_notifications,
+            None if no notification is due
     """
     user = user_super_challenge.user
     super_challenge = user_super_challenge.super_challenge
 
     # Skip if user doesn't have a Telegram ID
     if not user.telegram_id:
-        return False
+        return None
 
     # Skip if user is not a channel member
-    if not is_channel_member(user.telegram_id):
+    if not user.is_telegram_channel_member:
         logger.info(f"Skipping notification for user {user.id} - not a channel member")
-        return False
+        return None
 
     # Skip if user has failed the super challenge
     if user_super_challenge.is_failed:
-        return False
+        return None
 
     # Get notification template
-    try:
-        template = SuperChallengeNotificationTemplate.objects.get(
-            super_challenge=super_challenge, is_active=True
-        )
-    except SuperChallengeNotificationTemplate.DoesNotExist:
+    template = context.templates.get(super_challenge.id)
+    if template is None:
         logger.warning(
             f"No active notification template for super challenge {super_challenge.id}"
         )
-        return False
+        return None
 
     # Check if we should send this type of notification today
     notification_type = "super_challenge_general"
     if not should_send_super_challenge_notification(
-        user_super_challenge, notification_type
+        user_super_challenge, context.sent_notifications, notification_type
     ):
         logger.info(
             f"Skipping {notification_type} notification for user {user.id} - already sent today"
         )
-        return False
+        return None
 
-    # Create notification log
-    notification_log = NotificationLog.objects.create(
+    # Notification log, saved with the others when the batch is sent
+    notification_log = NotificationLog(
         user=user,
         super_challenge=super_challenge,
         message=template.general_message,
         notification_type=notification_type,
     )
 
-    # Create temporary message object
-    temp_message = create_temp_message(
-        title=super_challenge.title,
-        message_text=template.general_message,
-        is_attach_link=True,
+    payload = context.render(
+        super_challenge, notification_type, template.general_message
     )
-
-    # Send notification
-    try:
-        asyncio.run(send_broadcast(user.telegram_id, temp_message))
-        notification_log.is_sent = True
-        notification_log.save()
-        return True
-    except Exception as e:
-        notification_log.error_message = str(e)
-        notification_log.save()
-        logger.error(f"Error sending super challenge general notification: {str(e)}")
-        return False
+    return make_outgoing_message(notification_log, user, payload)
 
 
-def send_super_challenge_progress_notification(user_super_challenge):
+def prepare_super_challenge_progress_notification(user_super_challenge, context):
     """
-    Send a progress notification for a super challenge to a user.
+    Prepare a progress notification for a super challenge to a user.
     This is sent when a user hasn't completed all challenges for the day.
 
     Args:
         user_super_challenge (UserSuperChallenge): User super challenge object
+        context (NotificationContext): The run's shared state
 
     Returns:
-        bool: True if notification was sent successfully, False otherwise
+        OutgoingMessage: The message to send with send_notifications,
+            None if no notification is due
     """
     user = user_super_challenge.user
     super_challenge = user_super_challenge.super_challenge
 
     # Skip if user doesn't have a Telegram ID
     if not user.telegram_id:
-        return False
+        return None
 
     # Skip if user is not a channel member
-    if not is_channel_member(user.telegram_id):
+    if not user.is_telegram_channel_member:
         logger.info(f"Skipping notification for user {user.id} - not a channel member")
-        return False
+        return None
 
     # Get notification template
-    try:
-        template = SuperChallengeNotificationTemplate.objects.get(
-            super_challenge=super_challenge, is_active=True
-        )
-    except SuperChallengeNotificationTemplate.DoesNotExist:
+    template = context.templates.get(super_challenge.id)
+    if template is None:
         logger.warning(
             f"No active notification template for super challenge {super_challenge.id}"
         )
-        return False
-
-    # Get current date and previous date
-    current_date = timezone.localtime().date()
-    previous_date = current_date - timezone.timedelta(days=1)
+        return None
 
     # Determine which message to send based on failure status
     if user_super_challenge.is_failed:
@@ -228,18 +357,18 @@ def send_super_challenge_progress_notification(user_super_challenge):
     else:
         # Check if the user completed the challenge on the previous day
         # If they did, we don't need to send a warning message
-        if user_super_challenge.is_completed_for_date(previous_date):
+        if context.is_completed(user_super_challenge):
             logger.info(
                 f"Skipping warning notification for user {user.id} - completed super challenge yesterday"
             )
-            return False
+            return None
 
         message = template.progress_warning_message
         notification_type = "super_challenge_warning"
 
     # Check if we should send this type of notification today
     if not should_send_super_challenge_notification(
-        user_super_challenge, notification_type
+        user_super_challenge, context.sent_notifications, notification_type
     ):
         if notification_type == "super_challenge_failure":
             logger.info(
@@ -249,68 +378,135 @@ def send_super_challenge_progress_notification(user_super_challenge):
             logger.info(
                 f"Skipping {notification_type} notification for user {user.id} - already sent today"
             )
-        return False
+        return None
 
-    # Create notification log
-    notification_log = NotificationLog.objects.create(
+    # Notification log, saved with the others when the batch is sent
+    notification_log = NotificationLog(
         user=user,
         super_challenge=super_challenge,
         message=message,
         notification_type=notification_type,
     )
 
-    # Create temporary message object
-    temp_message = create_temp_message(
-        title=super_challenge.title, message_text=message, is_attach_link=True
+    payload = context.render(super_challenge, notification_type, message)
+    return make_outgoing_message(notification_log, user, payload)
+
+
+def get_sent_notifications(
+    notification_types, day=None, utc_offset=None, user_ids=None, failures_since=None
+):
+    """
+    Load the notifications of the given types that were already sent, in one
+    query: those sent on the day, and failure notifications, which are only
+    ever sent once, since `failures_since`.
+
+    Args:
+        notification_types (list): Notification types a task may send
+        day (date): The users' local date, default today
+        utc_offset (int): The users' UTC offset in minutes, default the
+            current timezone's (see local_day_range)
+        user_ids (iterable): Only the notifications of these users, default
+            all users'
+        failures_since (date): First local date of the failure notifications
+            loaded, default the day
+
+    Returns:
+        set: (user_id, challenge or super challenge id, notification_type)
+    """
+    day_start, day_end = local_day_range(day or timezone.localdate(), utc_offset)
+    query = Q(sent_at__gte=day_start, sent_at__lt=day_end)
+    if "super_challenge_failure" in notification_types and failures_since:
+        failures_start, _ = local_day_range(failures_since, utc_offset)
+        query |= Q(
+            notification_type="super_challenge_failure", sent_at__gte=failures_start
+        )
+
+    logs = NotificationLog.objects.filter(
+        query, notification_type__in=notification_types, is_sent=True
     )
+    if user_ids is not None:
+        logs = logs.filter(user_id__in=user_ids)
+    rows = logs.values_list(
+        "user_id", "challenge_id", "super_challenge_id", "notification_type"
+    )
+    return {
+        (user_id, challenge_id or super_challenge_id, notification_type)
+        for user_id, challenge_id, super_challenge_id, notification_type in rows
+    }
+
 
-    # Send notification
-    try:
-        asyncio.run(send_broadcast(user.telegram_id, temp_message))
-        notification_log.is_sent = True
-        notification_log.save()
-        return True
-    except Exception as e:
-        notification_log.error_message = str(e)
-        notification_log.save()
-        logger.error(f"Error sending super challenge progress notification: {str(e)}")
-        return False
+def get_super_challenge_completions(super_challenge_ids, check_date):
+    """
+    Load what NotificationContext.is_completed needs in two queries: the
+    challenges of each super challenge and the challenges every user
+    completed on `check_date` (active completions of active participations,
+    as UserSuperChallenge.is_completed_for_date counts them).
 
+    Args:
+        super_challenge_ids (list): Super challenges whose challenges are
+            loaded
+        check_date (date): Date whose completions are loaded
 
-def should_send_challenge_notification(user_challenge):
+    Returns:
+        tuple: ({super_challenge_id: challenge ids}, {user_id: challenge ids})
+    """
+    super_challenge_challenges = {
+        super_challenge_id: set() for super_challenge_id in super_challenge_ids
+    }
+    rows = SuperChallenge.objects.filter(id__in=super_challenge_ids).values_list(
+        "id", "challenges"
+    )
+    for super_challenge_id, challenge_id in rows:
+        if challenge_id is not None:
+            super_challenge_challenges[super_challenge_id].add(challenge_id)
+
+    day_start, day_end = local_day_range(check_date)
+    rows = (
+        UserChallengeCompletion.objects.filter(
+            is_active=True,
+            completed_at__gte=day_start,
+            completed_at__lt=day_end,
+            user_challenge__is_active=True,
+            user_challenge__challenge_id__in=set().union(
+                *super_challenge_challenges.values()
+            ),
+        )
+        .values_list("user_challenge__user_id", "user_challenge__challenge_id")
+        .distinct()
+    )
+    completed_challenges = {}
+    for user_id, challenge_id in rows:
+        completed_challenges.setdefault(user_id, set()).add(challenge_id)
+    return super_challenge_challenges, completed_challenges
+
+
+def should_send_challenge_notification(user_challenge, sent_notifications):
     """
     Check if a challenge notification should be sent.
 
     Args:
         user_challenge (UserChallenge): User challenge object
+        sent_notifications (set): Result of get_sent_notifications
 
     Returns:
         bool: True if notification should be sent, False otherwise
     """
-    # Get current date
-    current_date = timezone.localtime().date()
-
-    # Check if notification has already been sent today
-    already_sent = NotificationLog.objects.filter(
-        user=user_challenge.user,
-        challenge=user_challenge.challenge,
-        notification_type="challenge",
-        sent_at__date=current_date,
-        is_sent=True,
-    ).exists()
-
     # Only send if not already sent today
-    return not already_sent
+    key = (user_challenge.user_id, user_challenge.challenge_id, "challenge")
+    return key not in sent_notifications
 
 
 def should_send_super_challenge_notification(
-    user_super_challenge, notification_type="super_challenge_general"
+    user_super_challenge,
+    sent_notifications,
+    notification_type="super_challenge_general",
 ):
     """
     Check if a super challenge notification should be sent.
 
     Args:
         user_super_challenge (UserSuperChallenge): User super challenge object
+        sent_notifications (set): Result of get_sent_notifications
         notification_type (str): Type of notification to check for
             (super_challenge_general, super_challenge_warning, super_challenge_failure)
 
@@ -337,23 +533,11 @@ def should_send_super_challenge_notification(
         if not (super_challenge.start_date <= current_date <= super_challenge.end_date):
             return False
 
-    # For failure notifications, check if it has ever been sent before
-    # This ensures we only send the failure notification once
-    if notification_type == "super_challenge_failure":
-        already_sent = NotificationLog.objects.filter(
-            user=user_super_challenge.user,
-            super_challenge=super_challenge,
-            notification_type=notification_type,
-            is_sent=True,
-        ).exists()
-    else:
-        # For other notification types, check if it has been sent today
-        already_sent = NotificationLog.objects.filter(
-            user=user_super_challenge.user,
-            super_challenge=super_challenge,
-            notification_type=notification_type,
-            sent_at__date=current_date,
-            is_sent=True,
-        ).exists()
-
-    return not already_sent
+    # Failure notifications count whenever they were sent, so they are only
+    # sent once; the other types once a day
+    key = (
+        user_super_challenge.user_id,
+        user_super_challenge.super_challenge_id,
+        notification_type,
+    )
+    return key not in sent_notifications
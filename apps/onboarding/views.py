@@ -1,6 +1,7 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 
+from apps.common.mixins import CatalogCacheMixin, ConditionalGetMixin
 from apps.users.permissions import IsTelegramUser
 
 from .models import FAQ, Question
@@ -12,7 +13,7 @@ from .serializers import (
 )
 
 
-class QuestionListView(generics.ListAPIView):
+class QuestionListView(CatalogCacheMixin, ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint to list all active onboarding questions with their answers.
     """
@@ -53,7 +54,7 @@ class UserAnswersBulkCreateView(generics.CreateAPIView):
         )
 
 
-class FAQListView(generics.ListAPIView):
+class FAQListView(CatalogCacheMixin, ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint to list all active FAQs.
     """
@@ -0,0 +1,143 @@
+"""
+Bulk Telegram sends from synchronous code (Celery tasks).
+
+A dispatch runs all its messages, which may come in several chunks, on one
+event loop through one Bot, whose HTTP client keeps a pool of connections to
+the Bot API open, with at most TELEGRAM_SEND_CONCURRENCY requests in flight.
+Sends are paced by the shared RateLimiter; flood control waits are honoured
+and network errors retried.
+"""
+import asyncio
+import logging
+
+from django.conf import settings
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from telegram.request import HTTPXRequest
+
+from apps.common.redis_client import create_async_redis
+from apps.telegram_bot.ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Seconds before retrying a send that failed on a network error, doubled
+# after every attempt
+RETRY_BACKOFF = 1
+
+
+class OutgoingMessage:
+    """
+    A rendered message to one chat. `key` identifies it in the results
+    (e.g. a NotificationLog id).
+    """
+
+    __slots__ = ("key", "chat_id", "text", "reply_markup")
+
+    def __init__(self, key, chat_id, text, reply_markup=None):
+        self.key = key
+        self.chat_id = chat_id
+        self.text = text
+        self.reply_markup = reply_markup
+
+
+def create_bot(concurrency):
+    request = HTTPXRequest(connection_pool_size=concurrency)
+    return Bot(token=settings.TELEGRAM_BOT_TOKEN, request=request)
+
+
+async def send_message(bot, message):
+    await bot.send_message(
+        message.chat_id,
+        message.text,
+        parse_mode="HTML",
+        reply_markup=message.reply_markup,
+    )
+
+
+async def send_with_retry(bot, limiter, message):
+    """
+    Send `message` once the rate limits allow it. RetryAfter pauses every
+    send for the time Telegram asks, network errors are retried with
+    backoff; both up to TELEGRAM_SEND_RETRIES times before giving up.
+    """
+    attempt = 0
+    while True:
+        await limiter.acquire(message.chat_id)
+        try:
+            await send_message(bot, message)
+            return
+        except RetryAfter as e:
+            if attempt >= settings.TELEGRAM_SEND_RETRIES:
+                raise
+            logger.info(f"Flood control, pausing sends for {e.retry_after}s")
+            await limiter.pause(e.retry_after)
+        except BadRequest:
+            # Also a NetworkError, but retrying won't change the answer
+            raise
+        except NetworkError:
+            # A timed out message may have been delivered, it's sent again
+            # rather than lost
+            if attempt >= settings.TELEGRAM_SEND_RETRIES:
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+        attempt += 1
+
+
+async def send_all(bot, limiter, messages, concurrency):
+    """
+    Send `messages` with at most `concurrency` in flight and return
+    [(message, error)], `error` being None for the messages that were sent.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(message):
+        async with semaphore:
+            try:
+                await send_with_retry(bot, limiter, message)
+            except Exception as e:
+                logger.warning(f"Error sending message to {message.chat_id}: {e}")
+                return message, e
+            return message, None
+
+    return await asyncio.gather(*(send(message) for message in messages))
+
+
+def dispatch_chunks(chunks, concurrency=None):
+    """
+    Send each chunk of `chunks` (lists of OutgoingMessage) and yield its
+    [(message, error)] once it has been sent. All the chunks share one event
+    loop, Bot and rate limiter. The loop only runs while a chunk is being
+    sent, so the database is usable between chunks: the next chunk may be
+    produced, and the previous results recorded, from it.
+    """
+    concurrency = concurrency or settings.TELEGRAM_SEND_CONCURRENCY
+    with asyncio.Runner() as runner:
+        bot = None
+        client = create_async_redis()
+        limiter = RateLimiter(client)
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    yield []
+                    continue
+                if bot is None:
+                    bot = create_bot(concurrency)
+                    runner.run(bot.initialize())
+                yield runner.run(send_all(bot, limiter, chunk, concurrency))
+        finally:
+            if bot is not None:
+                runner.run(bot.shutdown())
+            runner.run(client.aclose())
+
+
+def dispatch(messages, concurrency=None):
+    """
+    Send `messages` (OutgoingMessage) on one event loop and return
+    [(message, error)] in the same order. The database isn't usable while
+    the loop runs, so callers record the results afterwards.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    (results,) = dispatch_chunks([messages], concurrency)
+    return results
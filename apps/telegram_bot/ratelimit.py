@@ -0,0 +1,107 @@
+"""
+Rate limiting of the messages the bot sends.
+
+Telegram allows a bot about 30 messages per second overall and about one per
+second to the same chat, and answers anything faster with RetryAfter. The
+limits are kept in Redis, so every worker sending as the bot shares them.
+"""
+import asyncio
+import logging
+import math
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE_KEY = "telegram:rate:global"
+CHAT_RATE_KEY = "telegram:rate:chat:{chat_id}"
+
+# Leaky bucket: each key holds the time (ms) from which the bot (or a chat)
+# can take the next message, and every message pushes it one interval
+# further. KEYS: the global and the chat key, ARGV: their intervals.
+#
+# A chat that isn't free yet reserves nothing and gets minus the ms until it
+# is, so waiting on one chat never holds a global slot other chats could
+# use. Otherwise the next global slot is reserved, the chat's next slot
+# counted from it, and the ms to wait for the global slot returned.
+RESERVE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local chat_at = tonumber(redis.call('GET', KEYS[2]) or 0)
+if chat_at > now then
+    return now - chat_at
+end
+local at = math.max(now, tonumber(redis.call('GET', KEYS[1]) or 0))
+local global_next = at + tonumber(ARGV[1])
+redis.call('SET', KEYS[1], global_next, 'PX', global_next - now + 1000)
+local chat_next = at + tonumber(ARGV[2])
+redis.call('SET', KEYS[2], chat_next, 'PX', chat_next - now + 1000)
+return at - now
+"""
+
+# Holds KEYS[1] back for ARGV[1] ms
+PAUSE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local resume = now + tonumber(ARGV[1])
+if tonumber(redis.call('GET', KEYS[1]) or 0) < resume then
+    redis.call('SET', KEYS[1], resume, 'PX', resume - now + 1000)
+end
+"""
+
+
+class RateLimiter:
+    """
+    Paces sends to the global and per-chat Telegram limits. Used from one
+    event loop with an asyncio Redis client.
+
+    If Redis is unavailable, sends are paced by this limiter alone at the
+    global rate.
+    """
+
+    def __init__(self, client, rate=None, chat_rate=None):
+        self.interval = math.ceil(1000 / (rate or settings.TELEGRAM_RATE_LIMIT))
+        self.chat_interval = math.ceil(
+            1000 / (chat_rate or settings.TELEGRAM_CHAT_RATE_LIMIT)
+        )
+        self.reserve = client.register_script(RESERVE_SCRIPT)
+        self.hold = client.register_script(PAUSE_SCRIPT)
+        self.local_next = 0
+
+    async def acquire(self, chat_id):
+        """
+        Wait until a message may be sent to `chat_id`
+        """
+        keys = [GLOBAL_RATE_KEY, CHAT_RATE_KEY.format(chat_id=chat_id)]
+        args = [self.interval, self.chat_interval]
+        while True:
+            try:
+                wait = await self.reserve(keys=keys, args=args) / 1000
+            except redis.RedisError as e:
+                logger.warning(f"Telegram rate limit unavailable: {e}")
+                wait = self.local_wait()
+            if wait >= 0:
+                break
+            # The chat is busy, try again once it's free
+            await asyncio.sleep(-wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def local_wait(self):
+        now = asyncio.get_running_loop().time()
+        at = max(self.local_next, now)
+        self.local_next = at + self.interval / 1000
+        return at - now
+
+    async def pause(self, seconds):
+        """
+        Hold every send back for `seconds` (flood control applies to the
+        whole bot)
+        """
+        try:
+            await self.hold(keys=[GLOBAL_RATE_KEY], args=[int(seconds * 1000)])
+        except redis.RedisError as e:
+            logger.warning(f"Telegram rate limit unavailable: {e}")
+            now = asyncio.get_running_loop().time()
+            self.local_next = max(self.local_next, now + seconds)
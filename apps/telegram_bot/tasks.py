@@ -1,11 +1,10 @@
-import asyncio
-
 from celery import shared_task
 from django.utils import timezone
 
 from apps.main.models import UserChallenge
+from apps.telegram_bot.dispatcher import OutgoingMessage, dispatch
 from apps.telegram_bot.models import CustomMessage
-from apps.telegram_bot.utils import send_broadcast
+from apps.telegram_bot.utils import render_message
 from apps.users.models import User
 
 
@@ -25,11 +24,10 @@ def async_send_message_to_users(message_id):
 
     print(f"Sending message to {len(users)} users")
 
-    async def send_notifications():
-        for user in users:
-            await send_broadcast(user_id=user.telegram_id, message=message)
-
-    asyncio.run(send_notifications())
+    text, reply_markup = render_message(message)
+    dispatch(
+        OutgoingMessage(user.id, user.telegram_id, text, reply_markup) for user in users
+    )
     message.sent = True
     message.sent_at = timezone.now()
     message.save()
@@ -1 +1,163 @@
-# Create your tests here.
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import redis
+from django.test import SimpleTestCase, override_settings
+from telegram.error import BadRequest, RetryAfter
+
+from apps.telegram_bot.dispatcher import OutgoingMessage, dispatch_chunks
+from apps.telegram_bot.ratelimit import RateLimiter
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class BrokenRedis:
+    """
+    Client whose scripts fail like an unreachable server
+    """
+
+    def register_script(self, script):
+        async def run(keys, args):
+            raise redis.ConnectionError("Connection refused")
+
+        return run
+
+
+class FakeBot:
+    """
+    Bot whose sends take `delay` seconds, failing with `errors[chat_id]`
+    (popped, so a retry succeeds) when set
+    """
+
+    def __init__(self, delay=0.01, errors=None):
+        self.delay = delay
+        self.errors = errors or {}
+        self.initialized = self.shut_down = 0
+        self.sent = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def initialize(self):
+        self.initialized += 1
+
+    async def shutdown(self):
+        self.shut_down += 1
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            error = self.errors.pop(chat_id, None)
+            if error is not None:
+                raise error
+            self.sent.append(chat_id)
+        finally:
+            self.in_flight -= 1
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+@override_settings(TELEGRAM_RATE_LIMIT=1000, TELEGRAM_CHAT_RATE_LIMIT=1000)
+class DispatcherTests(SimpleTestCase):
+    def dispatch(self, bot, chunks, concurrency=3):
+        create_bot = mock.Mock(return_value=bot)
+        with mock.patch(
+            "apps.telegram_bot.dispatcher.create_bot", create_bot
+        ), mock.patch(
+            "apps.telegram_bot.dispatcher.create_async_redis",
+            lambda: fakeredis.FakeAsyncRedis(decode_responses=True),
+        ):
+            results = list(dispatch_chunks(chunks, concurrency))
+        self.assertEqual(create_bot.call_count, 1)
+        return results
+
+    def messages(self, chat_ids):
+        return [OutgoingMessage(chat_id, chat_id, "Text") for chat_id in chat_ids]
+
+    def test_chunks_share_one_bot(self):
+        bot = FakeBot()
+        chunks = [self.messages(range(0, 4)), [], self.messages(range(4, 10))]
+        results = self.dispatch(bot, chunks)
+
+        self.assertEqual(
+            [[message.key for message, _ in chunk] for chunk in results],
+            [[0, 1, 2, 3], [], [4, 5, 6, 7, 8, 9]],
+        )
+        self.assertEqual(sorted(bot.sent), list(range(10)))
+        self.assertEqual((bot.initialized, bot.shut_down), (1, 1))
+
+    def test_concurrency_is_bounded(self):
+        bot = FakeBot(delay=0.02)
+        self.dispatch(bot, [self.messages(range(12))], concurrency=3)
+        self.assertEqual(bot.max_in_flight, 3)
+
+    def test_errors_are_returned_per_message(self):
+        bot = FakeBot(
+            errors={1: BadRequest("Chat not found"), 2: RetryAfter(0)},
+        )
+        with self.assertLogs("apps.telegram_bot.dispatcher", "WARNING"):
+            (results,) = self.dispatch(bot, [self.messages(range(4))])
+
+        errors = {message.key: error for message, error in results}
+        self.assertIsInstance(errors.pop(1), BadRequest)
+        # Flood control is waited out and the message sent again
+        self.assertEqual(errors, {0: None, 2: None, 3: None})
+        self.assertEqual(sorted(bot.sent), [0, 2, 3])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class RateLimiterTests(SimpleTestCase):
+    # 10 ms between any two messages, 200 ms between two to the same chat
+    RATE = 100
+    CHAT_RATE = 5
+
+    def send_times(self, chat_ids, client=None):
+        """
+        Seconds from the start at which each acquire for `chat_ids`, all
+        started together, returned
+        """
+
+        async def run():
+            limiter = RateLimiter(
+                client or fakeredis.FakeAsyncRedis(decode_responses=True),
+                rate=self.RATE,
+                chat_rate=self.CHAT_RATE,
+            )
+            start = time.monotonic()
+
+            async def acquire(chat_id):
+                await limiter.acquire(chat_id)
+                return chat_id, time.monotonic() - start
+
+            return await asyncio.gather(*(acquire(chat_id) for chat_id in chat_ids))
+
+        return asyncio.run(run())
+
+    def test_distinct_chats_are_paced_at_the_global_rate(self):
+        times = sorted(at for _, at in self.send_times(range(20)))
+        # 19 intervals of 10 ms, with some slack for the event loop
+        self.assertGreaterEqual(times[-1], 0.18)
+        self.assertLess(times[-1], 0.5)
+
+    def test_busy_chat_does_not_hold_other_chats(self):
+        # Two messages in a row to each of 10 chats: the second ones wait
+        # for their chat while the other chats take the global slots
+        results = self.send_times([chat_id for chat_id in range(10) for _ in "ab"])
+        self.assertLess(max(at for _, at in results), 0.6)
+
+        by_chat = {}
+        for chat_id, at in results:
+            by_chat.setdefault(chat_id, []).append(at)
+        for chat_id, (first, second) in by_chat.items():
+            with self.subTest(chat_id=chat_id):
+                self.assertGreaterEqual(abs(second - first), 0.19)
+
+    def test_local_pacing_without_redis(self):
+        with self.assertLogs("apps.telegram_bot.ratelimit", "WARNING"):
+            results = self.send_times(range(5), BrokenRedis())
+        times = sorted(at for _, at in results)
+        self.assertGreaterEqual(times[-1], 0.035)
@@ -0,0 +1,105 @@
+"""
+Cached user cards: the public profile shown next to a user on leaderboards
+and in the hall of fame.
+
+Cards are stored per user as compact tuples and read with one multi-get per
+page, so leaderboard rows only carry user ids instead of joining `User`.
+They are refreshed when a user's card fields are saved.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.common.media import media_url
+from apps.users.models import User
+
+USER_CARD_KEY = "user_card:{user_id}"
+# Saves refresh the cards, the timeout only bounds the staleness after
+# writes that bypass the signals (queryset updates)
+USER_CARD_TIMEOUT = 60 * 60 * 24 * 7
+
+# Stored in this order
+USER_CARD_FIELDS = (
+    "first_name",
+    "last_name",
+    "telegram_username",
+    "telegram_photo",
+    "telegram_photo_url",
+)
+
+
+def user_card_key(user_id):
+    return USER_CARD_KEY.format(user_id=user_id)
+
+
+def make_user_card(user):
+    """
+    Card of a User instance
+    """
+    return (
+        user.first_name,
+        user.last_name,
+        user.telegram_username,
+        user.telegram_photo.name,
+        user.telegram_photo_url,
+    )
+
+
+def build_user_cards(user_ids):
+    """
+    {user_id: card} read from the database in one query. Soft-deleted users
+    keep their card, like the rows they still have on the leaderboards.
+    """
+    rows = User._base_manager.filter(id__in=user_ids).values_list(
+        "id", *USER_CARD_FIELDS
+    )
+    return {row[0]: row[1:] for row in rows}
+
+
+def get_user_cards(user_ids):
+    """
+    {user_id: card} of the given users: one cache multi-get, the misses read
+    with one query and cached. Users that don't exist are left out.
+    """
+    keys = {user_card_key(user_id): user_id for user_id in set(user_ids)}
+    if not keys:
+        return {}
+
+    cached = cache.get_many(keys)
+    cards = {keys[key]: card for key, card in cached.items()}
+
+    missing = [user_id for key, user_id in keys.items() if key not in cached]
+    if missing:
+        built = build_user_cards(missing)
+        cache.set_many(
+            {user_card_key(user_id): card for user_id, card in built.items()},
+            USER_CARD_TIMEOUT,
+        )
+        cards.update(built)
+    return cards
+
+
+def render_user_card(user_id, card, request=None):
+    """
+    Card -> the user object embedded in leaderboard responses
+    """
+    first_name, last_name, telegram_username, telegram_photo, photo_url = card
+    return {
+        "id": user_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "telegram_username": telegram_username,
+        "telegram_photo": media_url(telegram_photo, request) or photo_url,
+    }
+
+
+def refresh_user_card(user):
+    """
+    Store the user's new card once the current transaction commits
+    """
+    key, card = user_card_key(user.pk), make_user_card(user)
+    transaction.on_commit(lambda: cache.set(key, card, USER_CARD_TIMEOUT))
+
+
+def delete_user_card(user_id):
+    key = user_card_key(user_id)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from apps.common.media import media_url
 from apps.users.models import Timezone, User
 
 User = get_user_model()
@@ -62,9 +63,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     def get_telegram_photo(self, obj):
         request = self.context.get("request")
-        if obj.telegram_photo:
-            return request.build_absolute_uri(obj.telegram_photo.url)
-        return obj.telegram_photo_url
+        return media_url(obj.telegram_photo, request) or obj.telegram_photo_url
 
     class Meta:
         model = User
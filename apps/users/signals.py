@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.common.cache import bump_user_version
+from apps.users.cards import USER_CARD_FIELDS, delete_user_card, refresh_user_card
+from apps.users.models import User
+
+
+@receiver(post_save, sender=User)
+def bump_profile_user_version(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def sync_user_card(sender, instance, update_fields=None, **kwargs):
+    # Saves that only touch other fields (last_login, language) keep the card
+    if update_fields is not None and not set(update_fields) & set(USER_CARD_FIELDS):
+        return
+    refresh_user_card(instance)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_card(sender, instance, **kwargs):
+    delete_user_card(instance.pk)
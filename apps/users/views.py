@@ -7,6 +7,7 @@ from rest_framework.generics import ListAPIView, RetrieveAPIView, UpdateAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.common.mixins import ConditionalGetMixin
 from apps.users.models import Timezone, User
 from apps.users.permissions import IsTelegramUser
 from apps.users.tasks import update_channel_membership_status
@@ -87,9 +88,12 @@ class UserProfileUpdateAPIView(UpdateAPIView):
         )
 
 
-class TimezoneListAPIView(ListAPIView):
+class TimezoneListAPIView(ConditionalGetMixin, ListAPIView):
     serializer_class = TimezoneSerializer
     permission_classes = [IsTelegramUser]
+    # The user's own timezone is listed first, so the list is per-user
+    conditional_models = (Timezone,)
+    conditional_per_user = True
     filter_backends = [SearchFilter]
     search_fields = ["name", "name_en", "name_uz", "name_ru"]
 
@@ -189,6 +189,10 @@ STATICFILES_DIRS = (BASE_DIR / "staticfiles",)
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Public base URL of the media files (CDN or nginx), e.g. https://cdn.example.com/media/
+# When empty, media URLs are built from the request host
+MEDIA_PUBLIC_BASE_URL = env.str("MEDIA_PUBLIC_BASE_URL", "")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -217,6 +221,12 @@ CELERY_TIMEZONE = "Asia/Tashkent"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# Notification chunks go to their own queue, served by the
+# celery-notifications worker, so a large run doesn't hold up other tasks
+CELERY_TASK_ROUTES = {
+    "apps.notification.tasks.send_notification_chunk": {"queue": "notifications"},
+}
+
 # Celery Beat Schedule
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
@@ -230,18 +240,11 @@ CELERY_BEAT_SCHEDULE = {
         "task": "apps.main.tasks.update_all_user_challenge_streaks",
         "schedule": crontab(hour=0, minute=5),
     },
-    # Challenge notifications - run at 05:00, 19:00 and 20:00
-    "send-challenge-notifications-05": {
-        "task": "apps.notification.tasks.send_challenge_notifications",
-        "schedule": crontab(hour=5, minute=0),
-    },
-    "send-challenge-notifications-19": {
-        "task": "apps.notification.tasks.send_challenge_notifications",
-        "schedule": crontab(hour=19, minute=0),
-    },
-    "send-challenge-notifications-20": {
-        "task": "apps.notification.tasks.send_challenge_notifications",
-        "schedule": crontab(hour=20, minute=0),
+    # Challenge notifications - every 5 minutes (CHALLENGE_SLOT_MINUTES), to
+    # the users whose challenges start in their local time
+    "schedule-challenge-notifications": {
+        "task": "apps.notification.tasks.schedule_challenge_notifications",
+        "schedule": crontab(minute="*/5"),
     },
     # Super challenge general notifications - run once a day at 21:00
     "send-super-challenge-general-notifications": {
@@ -268,3 +271,10 @@ sentry_sdk.init(
 TELEGRAM_BOT_TOKEN = "7217412861:AAEq1F5tHwiSLqtDMqccFTNarlFYl4xdzX0"
 TELEGRAM_CHANNEL_ID = "-1002128930156"
 WEB_APP_URL = "https://maqsad30.icc-kimyo.uz/"
+# Requests in flight at once when sending notifications and broadcasts
+TELEGRAM_SEND_CONCURRENCY = env.int("TELEGRAM_SEND_CONCURRENCY", 20)
+# Messages per second the bot sends overall and to a single chat
+TELEGRAM_RATE_LIMIT = env.int("TELEGRAM_RATE_LIMIT", 30)
+TELEGRAM_CHAT_RATE_LIMIT = env.int("TELEGRAM_CHAT_RATE_LIMIT", 1)
+# Retries of a send after flood control or a network error
+TELEGRAM_SEND_RETRIES = env.int("TELEGRAM_SEND_RETRIES", 3)